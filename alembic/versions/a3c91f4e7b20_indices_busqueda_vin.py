@@ -0,0 +1,43 @@
+"""indices para busqueda de VIN (exacta, prefijo y trigramas)
+
+Revision ID: a3c91f4e7b20
+Revises: fde2cfac238f
+Create Date: 2026-10-17 10:12:41.508312
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c91f4e7b20'
+down_revision: Union[str, None] = 'fde2cfac238f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Extensión de trigramas para búsquedas por subcadena (ILIKE '%...%')
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # CONCURRENTLY no bloquea las escrituras en vehicles, pero no puede ir dentro de una transacción
+    with op.get_context().autocommit_block():
+        # Búsqueda exacta y por prefijo sin distinguir mayúsculas: upper(vin) = / LIKE 'ABC%'
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_vehicles_vin_upper_pattern "
+            "ON vehicles (upper(vin) varchar_pattern_ops)"
+        )
+        # Búsqueda por subcadena y sufijo: vin ILIKE '%ABC%' / '%ABC'
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_vehicles_vin_trgm "
+            "ON vehicles USING gin (vin gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_vehicles_vin_trgm")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_vehicles_vin_upper_pattern")
+    # La extensión pg_trgm se mantiene: puede estar en uso por otros objetos
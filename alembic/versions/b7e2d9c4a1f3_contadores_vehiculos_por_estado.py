@@ -0,0 +1,35 @@
+"""contadores de vehiculos por estado para el dashboard
+
+Revision ID: b7e2d9c4a1f3
+Revises: a3c91f4e7b20
+Create Date: 2026-10-17 12:03:19.774105
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2d9c4a1f3'
+down_revision: Union[str, None] = 'a3c91f4e7b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'vehicle_state_counters',
+        sa.Column('state_id', sa.Integer(), sa.ForeignKey('states.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('count', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+    # Carga inicial a partir de los vehículos existentes
+    op.execute(
+        "INSERT INTO vehicle_state_counters (state_id, count) "
+        "SELECT status_id, COUNT(*) FROM vehicles GROUP BY status_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('vehicle_state_counters')
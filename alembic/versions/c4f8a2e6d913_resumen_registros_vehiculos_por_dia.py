@@ -0,0 +1,37 @@
+"""resumen diario de registros de vehiculos para el dashboard
+
+Revision ID: c4f8a2e6d913
+Revises: b7e2d9c4a1f3
+Create Date: 2026-10-17 14:26:51.093417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f8a2e6d913'
+down_revision: Union[str, None] = 'b7e2d9c4a1f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'vehicle_registrations_daily',
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('count', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+    # Carga inicial a partir de los vehículos existentes, por día UTC
+    op.execute(
+        "INSERT INTO vehicle_registrations_daily (day, count) "
+        "SELECT (created_at AT TIME ZONE 'UTC')::date, COUNT(*) FROM vehicles "
+        "WHERE created_at IS NOT NULL "
+        "GROUP BY (created_at AT TIME ZONE 'UTC')::date"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('vehicle_registrations_daily')
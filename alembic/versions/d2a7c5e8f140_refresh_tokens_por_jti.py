@@ -0,0 +1,71 @@
+"""refresh tokens indexados por jti en lugar del token completo
+
+Revision ID: d2a7c5e8f140
+Revises: c4f8a2e6d913
+Create Date: 2026-10-17 16:02:37.518204
+
+"""
+import base64
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a7c5e8f140'
+down_revision: Union[str, None] = 'c4f8a2e6d913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _jti(token: str):
+    # Payload del JWT sin verificar la firma: los tokens los emitió la propia API
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload)).get("jti")
+    except (IndexError, ValueError, AttributeError):
+        return None
+
+
+def upgrade() -> None:
+    # Los tokens caducados o revocados ya no sirven: se eliminan antes de convertir la tabla
+    op.execute("DELETE FROM refresh_tokens WHERE is_revoked IS TRUE OR expires_at <= now()")
+    op.execute("UPDATE refresh_tokens SET is_revoked = false WHERE is_revoked IS NULL")
+
+    op.add_column('refresh_tokens', sa.Column('jti', sa.String(36), nullable=True))
+    op.add_column('refresh_tokens', sa.Column('revoked_at', sa.DateTime(timezone=True), nullable=True))
+
+    # Carga del jti a partir del token guardado; los tokens sin jti se descartan
+    conn = op.get_bind()
+    rows = conn.execute(sa.text("SELECT id, token FROM refresh_tokens")).all()
+    updates = [{"id": row_id, "jti": _jti(token)} for row_id, token in rows]
+    valid = [row for row in updates if row["jti"]]
+    invalid = [{"id": row["id"]} for row in updates if not row["jti"]]
+    if valid:
+        conn.execute(sa.text("UPDATE refresh_tokens SET jti = :jti WHERE id = :id"), valid)
+    if invalid:
+        conn.execute(sa.text("DELETE FROM refresh_tokens WHERE id = :id"), invalid)
+
+    op.alter_column('refresh_tokens', 'jti', nullable=False)
+    op.alter_column('refresh_tokens', 'is_revoked', nullable=False)
+    op.drop_index('ix_refresh_tokens_token', table_name='refresh_tokens')
+    op.drop_column('refresh_tokens', 'token')
+    op.create_index('ix_refresh_tokens_jti', 'refresh_tokens', ['jti'], unique=True)
+    op.create_index('ix_refresh_tokens_expires_at', 'refresh_tokens', ['expires_at'])
+    op.create_index('ix_refresh_tokens_revoked_at', 'refresh_tokens', ['revoked_at'])
+
+
+def downgrade() -> None:
+    # El token completo no se puede reconstruir: las sesiones abiertas se invalidan
+    op.drop_index('ix_refresh_tokens_revoked_at', table_name='refresh_tokens')
+    op.drop_index('ix_refresh_tokens_expires_at', table_name='refresh_tokens')
+    op.drop_index('ix_refresh_tokens_jti', table_name='refresh_tokens')
+    op.execute("DELETE FROM refresh_tokens")
+    op.alter_column('refresh_tokens', 'is_revoked', nullable=True)
+    op.drop_column('refresh_tokens', 'revoked_at')
+    op.drop_column('refresh_tokens', 'jti')
+    op.add_column('refresh_tokens', sa.Column('token', sa.String(), nullable=False))
+    op.create_index('ix_refresh_tokens_token', 'refresh_tokens', ['token'], unique=True)
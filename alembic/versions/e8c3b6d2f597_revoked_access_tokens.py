@@ -0,0 +1,33 @@
+"""tabla de access tokens revocados
+
+Revision ID: e8c3b6d2f597
+Revises: d2a7c5e8f140
+Create Date: 2026-10-17 18:41:09.226731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8c3b6d2f597'
+down_revision: Union[str, None] = 'd2a7c5e8f140'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'revoked_access_tokens',
+        sa.Column('jti', sa.String(36), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('jti'),
+    )
+    op.create_index('ix_revoked_access_tokens_expires_at', 'revoked_access_tokens', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_revoked_access_tokens_expires_at', table_name='revoked_access_tokens')
+    op.drop_table('revoked_access_tokens')
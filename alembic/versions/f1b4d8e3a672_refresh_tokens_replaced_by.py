@@ -0,0 +1,28 @@
+"""jti del refresh token que sustituye a cada token rotado
+
+Revision ID: f1b4d8e3a672
+Revises: e8c3b6d2f597
+Create Date: 2026-10-17 21:12:48.604317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b4d8e3a672'
+down_revision: Union[str, None] = 'e8c3b6d2f597'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Los tokens revocados antes de esta migración quedan sin sustituto: al
+    # volver a presentarlos se rechazan sin tratarlos como reutilizados
+    op.add_column('refresh_tokens', sa.Column('replaced_by', sa.String(36), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('refresh_tokens', 'replaced_by')
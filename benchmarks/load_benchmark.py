@@ -0,0 +1,166 @@
+"""
+Prueba de carga del perfil de producción (gunicorn.conf.py): arranca gunicorn
+con 1, 2, ... workers, lanza peticiones HTTP durante un tiempo fijo con C
+clientes concurrentes y muestra las peticiones por segundo totales y por worker
+(cada worker ocupa como mucho un núcleo).
+
+Los clientes se reparten en varios procesos para que el generador de carga no
+sea el cuello de botella; conviene dejarle núcleos libres (o lanzarlo desde otra
+máquina con --url). Con --url no se arranca gunicorn: se mide el servidor
+indicado y --workers solo se usa para calcular la cifra por worker.
+
+Necesita la base de datos de DATABASE_URL con un usuario para autenticarse.
+
+Uso:
+    python benchmarks/load_benchmark.py --workers 1,2,4 --username admin --password admin
+    python benchmarks/load_benchmark.py --path /api/vehicles?view=compact --concurrency 128 --duration 20
+    python benchmarks/load_benchmark.py --url http://api:8000 --workers 8 --username admin --password admin
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def _load(url: str, headers: dict, concurrency: int, duration: float, warmup: float) -> tuple:
+    """
+    `concurrency` clientes en bucle contra `url`. Las respuestas del periodo de
+    calentamiento no se cuentan.
+    """
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=30) as client:
+        start = time.perf_counter()
+        measure_from = start + warmup
+        deadline = measure_from + duration
+
+        async def worker() -> None:
+            nonlocal errors
+            while True:
+                sent = time.perf_counter()
+                if sent >= deadline:
+                    return
+                try:
+                    response = await client.get(url)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if sent >= measure_from:
+                    if ok:
+                        latencies.append((time.perf_counter() - sent) * 1000)
+                    else:
+                        errors += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+
+def load(url: str, headers: dict, concurrency: int, duration: float, warmup: float) -> tuple:
+    # Punto de entrada de cada proceso cliente
+    return asyncio.run(_load(url, headers, concurrency, duration, warmup))
+
+
+def run(url: str, headers: dict, args) -> dict:
+    processes = max(1, min(args.client_processes, args.concurrency))
+    per_process = [args.concurrency // processes + (i < args.concurrency % processes) for i in range(processes)]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        results = list(pool.map(
+            load, *zip(*[(url, headers, c, args.duration, args.warmup) for c in per_process])
+        ))
+    latencies = [latency for result, _ in results for latency in result]
+    errors = sum(error for _, error in results)
+    return {
+        "req/s": len(latencies) / args.duration,
+        "p50 ms": percentile(latencies, 0.5),
+        "p99 ms": percentile(latencies, 0.99),
+        "errores": errors,
+    }
+
+
+def login(base_url: str, username: str, password: str) -> dict:
+    if not username:
+        return {}
+    response = httpx.post(f"{base_url}/login", data={"username": username, "password": password}, timeout=30)
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_BIND=f"127.0.0.1:{port}")
+    env.pop("GUNICORN_ACCESS_LOG", None)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"], cwd=ROOT, env=env
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit(f"gunicorn terminó con código {server.returncode}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/openapi.json", timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    server.terminate()
+    sys.exit("gunicorn no respondió en 60 s")
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    server.terminate()
+    try:
+        server.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="números de workers separados por comas")
+    parser.add_argument("--url", help="servidor ya arrancado (no se lanza gunicorn)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default="/api/colors")
+    parser.add_argument("--username")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--concurrency", type=int, default=64, help="clientes simultáneos")
+    parser.add_argument("--client-processes", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos medidos por ejecución")
+    parser.add_argument("--warmup", type=float, default=2.0, help="segundos de calentamiento no medidos")
+    args = parser.parse_args()
+    worker_counts = [int(count) for count in args.workers.split(",") if count.strip()]
+
+    print(
+        f"núcleos: {os.cpu_count()}  ruta: {args.path}  concurrencia: {args.concurrency}  "
+        f"procesos cliente: {args.client_processes}  duración: {args.duration:g} s"
+    )
+    columns = ("req/s", "req/s/worker", "p50 ms", "p99 ms", "errores")
+    print(f"{'workers':<10}" + "".join(f"{column:>14}" for column in columns))
+    for workers in worker_counts:
+        server = None
+        base_url = args.url.rstrip("/") if args.url else None
+        if base_url is None:
+            server = start_server(workers, args.port)
+            base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            result = run(base_url + args.path, login(base_url, args.username, args.password), args)
+        finally:
+            if server is not None:
+                stop_server(server)
+        result["req/s/worker"] = result["req/s"] / workers
+        print(f"{workers:<10}" + "".join(f"{result[column]:>14.1f}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark de login en un cambio de turno: lanza N verificaciones de contraseña
+bcrypt con C clientes concurrentes y compara la versión anterior (bcrypt en el
+threadpool compartido de Starlette) con la actual (pool de hashing acotado de
+services/password_service.py).
+
+Mientras dura la ráfaga, una sonda mide la latencia de una tarea trivial en el
+threadpool compartido, que es lo que esperan el resto de endpoints síncronos.
+Con el pool acotado, las peticiones por encima de PASSWORD_HASH_MAX_PENDING se
+rechazan (503 en la API) en lugar de encolarse.
+
+No usa la base de datos: solo mide el coste del hashing.
+
+Uso:
+    python benchmarks/login_benchmark.py --logins 200 --concurrency 100 --rounds 12
+    PASSWORD_HASH_WORKERS=2 python benchmarks/login_benchmark.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.concurrency import run_in_threadpool  # noqa: E402
+from executors import ExecutorSaturated  # noqa: E402
+from services import password_service  # noqa: E402
+
+PASSWORD = "cambio-de-turno"
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def legacy_verify(password: str, hashed_password: str):
+    # Versión anterior: utils.verify_password en el threadpool compartido
+    context = password_service.password_context(password_service.BCRYPT_ROUNDS)
+    return await run_in_threadpool(context.verify, password, hashed_password)
+
+
+async def current_verify(password: str, hashed_password: str):
+    return await password_service.verify_password_service(password, hashed_password)
+
+
+async def probe(latencies: list, stop: asyncio.Event) -> None:
+    """
+    Tarea trivial en el threadpool compartido cada 10 ms.
+    """
+    while not stop.is_set():
+        start = time.perf_counter()
+        await run_in_threadpool(lambda: None)
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+
+
+async def run(verify, hashed_password: str, logins: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, probe_latencies = [], []
+    rejected = 0
+
+    async def login() -> None:
+        nonlocal rejected
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await verify(PASSWORD, hashed_password)
+            except ExecutorSaturated:
+                rejected += 1
+                return
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(probe_latencies, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    return {
+        "logins/s": len(latencies) / elapsed,
+        "p50 ms": percentile(latencies, 0.5),
+        "p95 ms": percentile(latencies, 0.95),
+        "503": rejected,
+        "sonda p95 ms": percentile(probe_latencies, 0.95),
+        "sonda máx ms": max(probe_latencies, default=0.0),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100, help="clientes simultáneos")
+    parser.add_argument("--rounds", type=int, default=password_service.BCRYPT_ROUNDS, help="coste de bcrypt")
+    args = parser.parse_args()
+
+    password_service.BCRYPT_ROUNDS = args.rounds
+    hashed_password = password_service.hash_password(PASSWORD, args.rounds)
+    executor = password_service.hash_executor
+    # Arranca el pool antes de medir
+    await asyncio.gather(*(current_verify(PASSWORD, hashed_password) for _ in range(executor.workers)))
+
+    print(
+        f"rondas bcrypt: {args.rounds}  logins: {args.logins}  concurrencia: {args.concurrency}  "
+        f"pool: {executor.kind} x{executor.workers} (máx. pendientes {executor.max_pending})"
+    )
+    columns = ("logins/s", "p50 ms", "p95 ms", "503", "sonda p95 ms", "sonda máx ms")
+    print(f"{'versión':<12}" + "".join(f"{column:>14}" for column in columns))
+    try:
+        for name, verify in (("anterior", legacy_verify), ("actual", current_verify)):
+            result = await run(verify, hashed_password, args.logins, args.concurrency)
+            print(f"{name:<12}" + "".join(f"{result[column]:>14.1f}" for column in columns))
+    finally:
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""
+Benchmark del preprocesado de escaneo sobre un corpus (ver scan_corpus.py):
+mide latencia y tasa de acierto de cada etapa.
+
+- baseline: imagen a resolución completa directamente a pyzbar (comportamiento anterior).
+- pipeline: orientación EXIF + escala de grises + multiescala con salida temprana.
+- pipeline+roi: igual, probando primero la región sugerida del manifest.
+
+Uso:
+    python benchmarks/scan_corpus.py --out /tmp/scan_corpus --count 50
+    python benchmarks/scan_benchmark.py --corpus /tmp/scan_corpus
+"""
+import argparse
+import collections
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+from pyzbar.pyzbar import decode  # noqa: E402
+from services.barcode_service import SCAN_SCALES, scan_pipeline  # noqa: E402
+
+
+def baseline(image, roi, scales):
+    return decode(image), "original"
+
+
+def pipeline(image, roi, scales):
+    return scan_pipeline(image, None, scales)
+
+
+def pipeline_roi(image, roi, scales):
+    return scan_pipeline(image, roi, scales)
+
+
+STAGES = {"baseline": baseline, "pipeline": pipeline, "pipeline+roi": pipeline_roi}
+
+
+def load_corpus(corpus_dir: str) -> list:
+    with open(os.path.join(corpus_dir, "manifest.json")) as handle:
+        manifest = json.load(handle)
+    for entry in manifest:
+        with open(os.path.join(corpus_dir, entry["file"]), "rb") as image_file:
+            entry["contents"] = image_file.read()
+    return manifest
+
+
+def run_stage(stage, corpus: list, scales) -> dict:
+    timings, hits, found_at = [], 0, collections.Counter()
+    for entry in corpus:
+        # Se incluye la apertura/decodificación del JPEG: es parte del coste por petición
+        start = time.perf_counter()
+        image = Image.open(io.BytesIO(entry["contents"]))
+        image.load()
+        decoded_objects, found = stage(image, entry.get("roi"), scales)
+        timings.append((time.perf_counter() - start) * 1000)
+        data = {obj.data.decode("utf-8") for obj in decoded_objects}
+        if entry.get("data") in data:
+            hits += 1
+            found_at[found] += 1
+    timings.sort()
+    return {
+        "median_ms": statistics.median(timings),
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "mean_ms": statistics.mean(timings),
+        "hit_rate": hits / len(corpus),
+        "found_at": dict(found_at),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", required=True, help="directorio generado por scan_corpus.py")
+    parser.add_argument("--scales", default=",".join(map(str, SCAN_SCALES)), help="lados máximos a probar, p. ej. 800,1600")
+    parser.add_argument("--stages", default=",".join(STAGES), help="etapas a medir")
+    args = parser.parse_args()
+
+    scales = tuple(int(size) for size in args.scales.split(",") if size.strip())
+    corpus = load_corpus(args.corpus)
+    print(f"{len(corpus)} imágenes, escalas {scales}")
+    print(f"{'etapa':<14}{'mediana ms':>12}{'p95 ms':>10}{'media ms':>10}{'aciertos':>10}  encontrado en")
+    for name in args.stages.split(","):
+        result = run_stage(STAGES[name], corpus, scales)
+        print(
+            f"{name:<14}{result['median_ms']:>12.1f}{result['p95_ms']:>10.1f}{result['mean_ms']:>10.1f}"
+            f"{result['hit_rate']:>10.1%}  {result['found_at']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Genera un corpus sintético para el benchmark de escaneo: fotos JPEG de gran
+tamaño con un código de barras Code 39 (el formato de las etiquetas de VIN)
+en una posición aleatoria, ruido de fondo y, en parte de ellas, la imagen
+girada con la orientación indicada en EXIF como hacen las cámaras de móvil.
+
+El manifest.json resultante guarda, por imagen, el VIN esperado y la región
+(en fracciones 0-1) donde está el código, para medir también la ruta con ROI.
+
+Uso:
+    python benchmarks/scan_corpus.py --out /tmp/scan_corpus --count 50 --size 4000x3000
+"""
+import argparse
+import json
+import os
+import random
+
+from PIL import Image, ImageDraw, ImageFilter
+
+VIN_CHARS = "ABCDEFGHJKLMNPRSTUVWXYZ0123456789"
+
+# Code 39: 9 elementos (barra, espacio, barra...); 1 = ancho, 0 = estrecho
+CODE39 = {
+    "0": "000110100", "1": "100100001", "2": "001100001", "3": "101100000",
+    "4": "000110001", "5": "100110000", "6": "001110000", "7": "000100101",
+    "8": "100100100", "9": "001100100", "A": "100001001", "B": "001001001",
+    "C": "101001000", "D": "000011001", "E": "100011000", "F": "001011000",
+    "G": "000001101", "H": "100001100", "I": "001001100", "J": "000011100",
+    "K": "100000011", "L": "001000011", "M": "101000010", "N": "000010011",
+    "O": "100010010", "P": "001010010", "Q": "000000111", "R": "100000110",
+    "S": "001000110", "T": "000010110", "U": "110000001", "V": "011000001",
+    "W": "111000000", "X": "010010001", "Y": "110010000", "Z": "011010000",
+    "*": "010010100",
+}
+
+# Orientación EXIF -> transformación que se aplica a los píxeles para que
+# ImageOps.exif_transpose devuelva la imagen original
+EXIF_ORIENTATIONS = {
+    1: None,
+    3: Image.ROTATE_180,
+    6: Image.ROTATE_90,
+    8: Image.ROTATE_270,
+}
+
+
+def code39_image(data: str, module: int = 3, height: int = 120) -> Image.Image:
+    """
+    Dibuja data como Code 39 (con los '*' de inicio y fin) y zona de silencio.
+    """
+    wide = module * 3
+    widths = []
+    for char in f"*{data}*":
+        widths.extend(wide if bit == "1" else module for bit in CODE39[char])
+        widths.append(module)  # separación entre caracteres
+    quiet = module * 10
+    image = Image.new("L", (sum(widths) + 2 * quiet, height + 2 * quiet), 255)
+    draw = ImageDraw.Draw(image)
+    x = quiet
+    for index, width in enumerate(widths):
+        if index % 10 % 2 == 0:  # barras en posiciones pares; la 9 es la separación
+            draw.rectangle([x, quiet, x + width - 1, quiet + height - 1], fill=0)
+        x += width
+    return image
+
+
+def random_vin(rng: random.Random) -> str:
+    return "".join(rng.choice(VIN_CHARS) for _ in range(17))
+
+
+def photo(rng: random.Random, size: tuple, barcode: Image.Image) -> tuple:
+    """
+    Fondo con ruido y formas, con el código pegado en una posición aleatoria.
+    Devuelve la imagen y la región del código en fracciones (x, y, ancho, alto).
+    """
+    width, height = size
+    background = Image.effect_noise((width // 4, height // 4), 40).resize(size).convert("RGB")
+    draw = ImageDraw.Draw(background)
+    for _ in range(30):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        x1, y1 = x0 + rng.randrange(50, width // 3), y0 + rng.randrange(50, height // 3)
+        draw.rectangle([x0, y0, x1, y1], fill=tuple(rng.randrange(256) for _ in range(3)))
+    x = rng.randrange(0, width - barcode.width)
+    y = rng.randrange(0, height - barcode.height)
+    background.paste(barcode.convert("RGB"), (x, y))
+    background = background.filter(ImageFilter.GaussianBlur(radius=rng.choice([0, 0.6, 1.0])))
+    # La región sugerida es algo mayor que el código, como la marcaría el cliente
+    margin_x, margin_y = barcode.width * 0.25, barcode.height * 0.5
+    left, top = max(0, x - margin_x), max(0, y - margin_y)
+    right, bottom = min(width, x + barcode.width + margin_x), min(height, y + barcode.height + margin_y)
+    roi = [left / width, top / height, (right - left) / width, (bottom - top) / height]
+    return background, roi
+
+
+def generate(out_dir: str, count: int, size: tuple, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = []
+    for index in range(count):
+        vin = random_vin(rng)
+        barcode = code39_image(vin, module=rng.choice([2, 3, 4]))
+        image, roi = photo(rng, size, barcode)
+        orientation = rng.choice(list(EXIF_ORIENTATIONS))
+        transform = EXIF_ORIENTATIONS[orientation]
+        if transform is not None:
+            image = image.transpose(transform)
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        name = f"scan_{index:04d}.jpg"
+        image.save(os.path.join(out_dir, name), "JPEG", quality=88, exif=exif.tobytes())
+        manifest.append({"file": name, "data": vin, "roi": roi, "orientation": orientation})
+    with open(os.path.join(out_dir, "manifest.json"), "w") as handle:
+        json.dump(manifest, handle, indent=2)
+    return manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default="scan_corpus", help="directorio de salida")
+    parser.add_argument("--count", type=int, default=50, help="número de imágenes")
+    parser.add_argument("--size", default="4000x3000", help="tamaño de las fotos (ancho x alto)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    size = tuple(int(value) for value in args.size.lower().split("x"))
+    manifest = generate(args.out, args.count, size, args.seed)
+    print(f"{len(manifest)} imágenes en {args.out}")
+
+
+if __name__ == "__main__":
+    main()
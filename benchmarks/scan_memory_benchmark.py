@@ -0,0 +1,129 @@
+"""
+Memoria por petición de los endpoints de escaneo (/api/scan/v1 multipart,
+/api/scan/v2 base64 en JSON y /api/scan/v3 binario en streaming).
+
+Llama a la aplicación ASGI directamente, entregando el cuerpo en bloques de
+64 KB como lo haría el servidor, y mide con tracemalloc el pico de memoria
+Python asignada durante la petición. La decodificación se sustituye por una
+función vacía: en producción ocurre en el pool de procesos, así que lo que se
+mide es el coste de recibir y bufferizar la imagen en el proceso de la API.
+
+Uso:
+    python benchmarks/scan_memory_benchmark.py --size-mb 8 --repeat 3
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app  # noqa: E402
+from dependencies import get_current_user  # noqa: E402
+from executors import BoundedExecutor  # noqa: E402
+from services import barcode_service  # noqa: E402
+
+CHUNK_SIZE = 64 * 1024
+BOUNDARY = "scanbenchmarkboundary"
+
+
+def fake_decode(source, content_type=None, roi=None):
+    return [{"type": "CODE39", "data": "1HGCM82633A004352"}]
+
+
+def multipart_body(image: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="scan.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + image + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def requests_for(image: bytes) -> dict:
+    """
+    Cuerpos ya codificados fuera de la medición: solo cuenta lo que hace el servidor.
+    """
+    return {
+        "v1 multipart": ("/api/scan/v1", f"multipart/form-data; boundary={BOUNDARY}", multipart_body(image)),
+        "v2 base64": ("/api/scan/v2", "application/json", json.dumps({"image": base64.b64encode(image).decode()}).encode()),
+        "v3 binario": ("/api/scan/v3", "application/octet-stream", image),
+    }
+
+
+async def call(path: str, content_type: str, body: bytes) -> int:
+    view = memoryview(body)
+    offsets = iter(range(0, len(body), CHUNK_SIZE))
+    status = {}
+
+    async def receive():
+        offset = next(offsets, None)
+        if offset is None:
+            return {"type": "http.request", "body": b"", "more_body": False}
+        chunk = bytes(view[offset:offset + CHUNK_SIZE])
+        return {"type": "http.request", "body": chunk, "more_body": offset + CHUNK_SIZE < len(body)}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"benchmark"),
+            (b"content-type", content_type.encode()),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    await app(scope, receive, send)
+    return status.get("code")
+
+
+async def measure(path: str, content_type: str, body: bytes) -> tuple:
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    status = await call(path, content_type, body)
+    _, peak = tracemalloc.get_traced_memory()
+    return status, peak - baseline
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=8, help="tamaño de la imagen simulada")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    app.dependency_overrides[get_current_user] = lambda: None
+    barcode_service.scan_executor = BoundedExecutor("benchmark", workers=1, max_pending=4, kind="thread")
+    barcode_service.decode_image = fake_decode
+    barcode_service.SCAN_MAX_UPLOAD_BYTES = int(args.size_mb * 2 * 1024 * 1024)
+
+    image = os.urandom(int(args.size_mb * 1024 * 1024))
+    tracemalloc.start()
+    print(f"imagen de {len(image) / 2**20:.1f} MB")
+    print(f"{'endpoint':<14}{'cuerpo MB':>10}{'pico MB':>10}{'pico/imagen':>13}  estado")
+    for name, (path, content_type, body) in requests_for(image).items():
+        results = [await measure(path, content_type, body) for _ in range(args.repeat)]
+        peak = max(result[1] for result in results)
+        print(
+            f"{name:<14}{len(body) / 2**20:>10.1f}{peak / 2**20:>10.1f}"
+            f"{peak / len(image):>13.2f}  {results[-1][0]}"
+        )
+    tracemalloc.stop()
+    barcode_service.scan_executor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
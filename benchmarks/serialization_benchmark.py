@@ -0,0 +1,114 @@
+"""
+Benchmark de la serialización de respuestas: parte de una lista grande de
+filas ORM de vehículos (con modelo, marca, color y estado) y compara:
+
+- model_validate por fila y response_model con JSONResponse (versión anterior);
+- model_validate por fila y response_model con ORJSONResponse;
+- model_validate por fila y model_response (sin revalidar en FastAPI);
+- validate_list y model_response: una sola validación y una sola serialización
+  por fila (lo que hacen ahora los listados).
+
+No usa la base de datos: las filas son objetos ORM sin sesión y cada variante
+es una ruta de una aplicación FastAPI propia llamada en proceso.
+
+Uso:
+    python benchmarks/serialization_benchmark.py --vehicles 1000 5000 --repeat 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+import models  # noqa: E402
+import schemas  # noqa: E402
+from responses import model_response, validate_list  # noqa: E402
+
+
+def make_vehicles(count: int) -> List[models.Vehicle]:
+    now = datetime.now(timezone.utc)
+    brand = models.Brand(id=1, name="Benchmark", created_at=now, updated_at=now)
+    model = models.Model(id=1, name="Modelo", brand_id=1, type_id=1, brand=brand, created_at=now, updated_at=now)
+    color = models.Color(id=1, name="Blanco", hex_code="#FFFFFF", rgb_code="255,255,255", created_at=now, updated_at=now)
+    state = models.State(
+        id=1, code="REC", name="Recibido", description="Vehículo recibido", is_initial=True, is_final=False,
+        order=1, active=True, created_at=now, updated_at=now,
+    )
+    return [
+        models.Vehicle(
+            id=i, vin=f"BSER{i:013d}", vehicle_model_id=1, color_id=1, status_id=1, is_urgent=i % 7 == 0,
+            observations="Sin observaciones", model=model, color=color, status=state,
+            created_at=now, updated_at=now,
+        )
+        for i in range(count)
+    ]
+
+
+def build_app(rows: List[models.Vehicle]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/json", response_model=List[schemas.Vehicle], response_class=JSONResponse)
+    async def as_json():
+        return list(map(schemas.Vehicle.model_validate, rows))
+
+    @app.get("/orjson", response_model=List[schemas.Vehicle], response_class=ORJSONResponse)
+    async def as_orjson():
+        return list(map(schemas.Vehicle.model_validate, rows))
+
+    @app.get("/model", response_model=List[schemas.Vehicle])
+    async def as_model():
+        return model_response(List[schemas.Vehicle], list(map(schemas.Vehicle.model_validate, rows)))
+
+    @app.get("/list", response_model=List[schemas.Vehicle])
+    async def as_list():
+        return model_response(List[schemas.Vehicle], validate_list(schemas.Vehicle, rows))
+
+    return app
+
+
+VARIANTS = (
+    ("JSONResponse", "/json"),
+    ("ORJSONResponse", "/orjson"),
+    ("model_response", "/model"),
+    ("validate_list", "/list"),
+)
+
+
+def measure(client: TestClient, path: str, repeat: int) -> float:
+    """
+    Mediana en ms de `repeat` peticiones (tras una de calentamiento).
+    """
+    client.get(path).raise_for_status()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        client.get(path).raise_for_status()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vehicles", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'vehículos':<12}{'respuesta':<18}{'ms/petición':>14}{'vs. json':>10}")
+    for count in args.vehicles:
+        with TestClient(build_app(make_vehicles(count))) as client:
+            baseline = None
+            for name, path in VARIANTS:
+                elapsed = measure(client, path, args.repeat)
+                baseline = baseline or elapsed
+                print(f"{count:<12}{name:<18}{elapsed:>14.2f}{baseline / elapsed:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark del cambio de estado de vehículos: compara la versión anterior
+(varias consultas de validación y dos commits) con la actual (INSERT ... SELECT
+en el historial + UPDATE condicional en una sola transacción) contra la base de
+datos de DATABASE_URL.
+
+Crea un usuario, dos estados propios con transiciones en ambos sentidos y N
+vehículos que van alternando entre ellos; al terminar se eliminan.
+
+Uso:
+    python benchmarks/state_transition_benchmark.py --vehicles 200 --rounds 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, insert, select  # noqa: E402
+import database  # noqa: E402
+import models  # noqa: E402
+from services.states_management_service import change_vehicle_state_service  # noqa: E402
+
+
+async def legacy_change_vehicle_state(vehicle_id, new_state_id, user_id, db, comment_id=None):
+    """
+    Copia del algoritmo anterior: una consulta por validación y dos commits.
+    """
+    vehicle = db.get(models.Vehicle, vehicle_id)
+    if not vehicle:
+        raise ValueError("El vehículo no existe.")
+    if not db.get(models.State, new_state_id):
+        raise ValueError("El nuevo estado no existe.")
+    valid_transition = db.execute(
+        select(models.Transition).where(
+            models.Transition.from_state_id == vehicle.status_id,
+            models.Transition.to_state_id == new_state_id
+        ).limit(1)
+    ).scalars().first()
+    if not valid_transition:
+        raise ValueError("La transición al nuevo estado no es válida.")
+
+    vehicle.status_id = new_state_id
+    vehicle.updated_at = datetime.now(timezone.utc)
+    db.commit()
+
+    entry = models.StateHistory(
+        vehicle_id=vehicle_id,
+        from_state_id=valid_transition.from_state_id,
+        to_state_id=valid_transition.to_state_id,
+        user_id=user_id,
+        timestamp=datetime.now(timezone.utc),
+        comment_id=comment_id
+    )
+    db.add(entry)
+    db.commit()
+    db.refresh(entry, attribute_names=["id", "timestamp", "comment"])
+    return entry
+
+
+def seed(session, vehicles: int) -> dict:
+    suffix = uuid.uuid4().hex[:6].upper()
+    first = models.State(code=f"BA{suffix}", name="Benchmark A", description="Benchmark")
+    second = models.State(code=f"BB{suffix}", name="Benchmark B", description="Benchmark")
+    user = models.User(username=f"benchmark_{suffix.lower()}", is_active=False)
+    session.add_all([first, second, user])
+    session.flush()
+    session.add_all([
+        models.Transition(from_state_id=first.id, to_state_id=second.id),
+        models.Transition(from_state_id=second.id, to_state_id=first.id),
+    ])
+    session.execute(insert(models.Vehicle), [
+        {"vin": f"BST{suffix}{i:08d}", "status_id": first.id} for i in range(vehicles)
+    ])
+    session.commit()
+    vehicle_ids = session.scalars(
+        select(models.Vehicle.id).where(models.Vehicle.status_id == first.id).order_by(models.Vehicle.id)
+    ).all()
+    return {"states": (first.id, second.id), "user_id": user.id, "vehicle_ids": vehicle_ids}
+
+
+def cleanup(session, data: dict) -> None:
+    states = data["states"]
+    session.execute(delete(models.StateHistory).where(models.StateHistory.vehicle_id.in_(data["vehicle_ids"])))
+    session.execute(delete(models.Vehicle).where(models.Vehicle.id.in_(data["vehicle_ids"])))
+    session.execute(delete(models.Transition).where(models.Transition.from_state_id.in_(states)))
+    session.execute(delete(models.State).where(models.State.id.in_(states)))
+    session.execute(delete(models.User).where(models.User.id == data["user_id"]))
+    session.commit()
+
+
+async def run(change, data: dict, rounds: int) -> float:
+    """
+    Alterna cada vehículo entre los dos estados `rounds` veces; devuelve transiciones/s.
+    """
+    first, second = data["states"]
+    total = 0
+    start = time.perf_counter()
+    with database.SessionLocal() as session:
+        for round_number in range(rounds):
+            target = second if round_number % 2 == 0 else first
+            for vehicle_id in data["vehicle_ids"]:
+                await change(vehicle_id, target, data["user_id"], session)
+                total += 1
+    return total / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vehicles", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=4, help="cambios de estado por vehículo (par)")
+    args = parser.parse_args()
+    rounds = args.rounds + args.rounds % 2
+
+    with database.SessionLocal() as session:
+        data = seed(session, args.vehicles)
+    try:
+        print(f"dialecto: {database.engine.dialect.name}  vehículos: {args.vehicles}  rondas: {rounds}")
+        print(f"{'versión':<12}{'transiciones/s':>16}")
+        for name, change in (("anterior", legacy_change_vehicle_state), ("actual", change_vehicle_state_service)):
+            print(f"{name:<12}{await run(change, data, rounds):>16.1f}")
+    finally:
+        with database.SessionLocal() as session:
+            cleanup(session, data)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
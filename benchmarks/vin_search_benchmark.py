@@ -0,0 +1,119 @@
+"""
+Benchmark de la búsqueda por VIN: compara los modos exact, prefix, suffix y
+contains contra la tabla vehicles de DATABASE_URL y, en PostgreSQL, muestra
+el plan de ejecución para comprobar que cada modo usa su índice.
+
+Uso:
+    python benchmarks/vin_search_benchmark.py --seed 200000 --repeat 50
+    python benchmarks/vin_search_benchmark.py --cleanup
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, insert, select, text  # noqa: E402
+import database  # noqa: E402
+import models  # noqa: E402
+from services.vehicles_service import VIN_LENGTH, vin_search_clause  # noqa: E402
+
+SEED_PREFIX = "BENCH"
+MODES = ("exact", "prefix", "suffix", "contains")
+
+
+def seed(session, count: int, batch_size: int = 5000) -> None:
+    """
+    Inserta vehículos sintéticos reutilizando un modelo, color y estado existentes.
+    """
+    model_id = session.scalar(select(models.Model.id).limit(1))
+    color_id = session.scalar(select(models.Color.id).limit(1))
+    status_id = session.scalar(select(models.State.id).limit(1))
+    if None in (model_id, color_id, status_id):
+        sys.exit("Se necesita al menos un modelo, un color y un estado para generar datos.")
+    for start in range(0, count, batch_size):
+        rows = [
+            {
+                "vin": (SEED_PREFIX + uuid.uuid4().hex.upper())[:VIN_LENGTH],
+                "vehicle_model_id": model_id,
+                "color_id": color_id,
+                "status_id": status_id,
+            }
+            for _ in range(min(batch_size, count - start))
+        ]
+        session.execute(insert(models.Vehicle), rows)
+        session.commit()
+    if database.engine.dialect.name == "postgresql":
+        session.execute(text("ANALYZE vehicles"))
+        session.commit()
+
+
+def cleanup(session) -> None:
+    session.execute(delete(models.Vehicle).where(models.Vehicle.vin.like(f"{SEED_PREFIX}%")))
+    session.commit()
+
+
+def sample_terms(session) -> dict:
+    vin = session.scalar(
+        select(models.Vehicle.vin).order_by(models.Vehicle.id.desc()).limit(1)
+    )
+    if vin is None:
+        sys.exit("La tabla vehicles está vacía; usa --seed para generar datos.")
+    return {
+        "exact": vin,
+        "prefix": vin[:8],
+        "suffix": vin[-6:],
+        "contains": vin[6:12],
+    }
+
+
+def run(session, mode: str, term: str, repeat: int) -> list:
+    query = select(models.Vehicle.id).where(vin_search_clause(term, mode)).limit(20)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        session.execute(query).all()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def plan(session, mode: str, term: str) -> str:
+    query = select(models.Vehicle.id).where(vin_search_clause(term, mode)).limit(20)
+    compiled = query.compile(database.engine, compile_kwargs={"literal_binds": True})
+    rows = session.execute(text(f"EXPLAIN {compiled}")).scalars().all()
+    scans = [row.strip() for row in rows if "Scan" in row]
+    return scans[0] if scans else rows[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="vehículos sintéticos a insertar antes de medir")
+    parser.add_argument("--repeat", type=int, default=30, help="repeticiones por modo")
+    parser.add_argument("--cleanup", action="store_true", help="elimina los vehículos sintéticos y termina")
+    args = parser.parse_args()
+
+    with database.SessionLocal() as session:
+        if args.cleanup:
+            cleanup(session)
+            return
+        if args.seed:
+            seed(session, args.seed)
+
+        total = session.scalar(select(models.Vehicle.id).order_by(models.Vehicle.id.desc()).limit(1))
+        print(f"vehículos (id máximo): {total}  dialecto: {database.engine.dialect.name}")
+        print(f"{'modo':<10}{'término':<20}{'media ms':>10}{'p50 ms':>10}{'p95 ms':>10}  plan")
+        for mode, term in sample_terms(session).items():
+            timings = sorted(run(session, mode, term, args.repeat))
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            scan = plan(session, mode, term) if database.engine.dialect.name == "postgresql" else "-"
+            print(
+                f"{mode:<10}{term:<20}{statistics.mean(timings):>10.3f}"
+                f"{statistics.median(timings):>10.3f}{p95:>10.3f}  {scan}"
+            )
+
+
+if __name__ == "__main__":
+    main()
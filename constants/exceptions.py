@@ -5,10 +5,23 @@ VEHICLE_MODEL_NOT_FOUND = "The vehicle model was not found."
 COLOR_NOT_FOUND = "The color ID does not match any existing color in the system."
 INITIAL_STATE_NOT_FOUND = "There is no initial state configured in the system."
 VIN_ALREADY_EXISTS = "A vehicle with this VIN already exists."
+VEHICLE_BATCH_CONFLICT = "Concurrent intakes kept registering the same VINs. Please retry."
 UNEXPECTED_ERROR = "An unexpected error occurred."
 
 VEHICLE_NOT_FOUND = "Vehicle not found."
 INVALID_VIN = "VIN cannot be empty or null."
+INVALID_CURSOR = "The pagination cursor is invalid."
 
 STATE_NOT_FOUND = "State was not found."
-STATE_COMMENT_NOT_FOUND = "State has no comments."
\ No newline at end of file
+STATE_COMMENT_NOT_FOUND = "State has no comments."
+STATE_CHANGE_CONFLICT = "The vehicle state was changed concurrently. Please retry."
+UNSUPPORTED_COUNTERS_DIALECT = "Vehicle counters need PostgreSQL or SQLite (INSERT ... ON CONFLICT), not '{dialect}'."
+
+UNSUPPORTED_FILE_TYPE = "Unsupported file type"
+HEIC_NOT_SUPPORTED = "HEIC format not supported. Please install 'pyheif' library."
+NO_CODE_DETECTED = "No QR or Barcode detected"
+SCANNER_BUSY = "The scanner is busy. Please retry later."
+AUTH_BUSY = "Authentication is busy. Please retry later."
+REFRESH_TOKEN_REUSED = "Refresh token reuse detected. All sessions have been revoked."
+UPLOAD_TOO_LARGE = "The uploaded image exceeds the maximum allowed size."
+INVALID_SCAN_REGION = "The scan region must be 'x,y,width,height' fractions between 0 and 1."
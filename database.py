@@ -1,17 +1,205 @@
 import sqlalchemy as _sql
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from dotenv import load_dotenv
 import os
+import threading
+import time
 
 # Cargar el archivo .env
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = _sql.create_engine(DATABASE_URL)
+# Modo de acceso a datos: "sync" (Session clásica) o "async" (AsyncSession).
+# Permite comparar el rendimiento de ambos caminos cambiando solo la configuración.
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+ASYNC_DB = DB_MODE == "async"
+
+
+def _to_async_url(url: str) -> str:
+    """
+    Traduce la URL síncrona de PostgreSQL al driver asíncrono (asyncpg).
+    """
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or (
+    _to_async_url(DATABASE_URL) if DATABASE_URL else None
+)
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+# region Pool configuration
+
+# Número de workers del servidor (gunicorn exporta WEB_CONCURRENCY). Cada worker
+# tiene su propio pool, así que el total de conexiones es pool x workers.
+WEB_CONCURRENCY = max(1, _env_int("WEB_CONCURRENCY", 1))
+
+# Presupuesto total de conexiones a PostgreSQL para todos los workers (0 = sin límite).
+DB_MAX_CONNECTIONS = _env_int("DB_MAX_CONNECTIONS", 0)
+
+
+def get_pool_settings() -> dict:
+    """
+    Configuración del pool a partir de variables de entorno. Si se define
+    DB_MAX_CONNECTIONS, el tamaño por worker se recorta para no superar el
+    presupuesto global (DB_MAX_CONNECTIONS // WEB_CONCURRENCY).
+    """
+    pool_size = _env_int("DB_POOL_SIZE", 5)
+    max_overflow = _env_int("DB_MAX_OVERFLOW", 10)
+
+    if DB_MAX_CONNECTIONS > 0:
+        per_worker = max(1, DB_MAX_CONNECTIONS // WEB_CONCURRENCY)
+        pool_size = min(pool_size, per_worker)
+        max_overflow = max(0, min(max_overflow, per_worker - pool_size))
+
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", -1),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", False),
+        "pool_use_lifo": _env_bool("DB_POOL_USE_LIFO", False),
+    }
+
+
+class PoolMetrics:
+    """
+    Contadores de checkout del pool: número de checkouts, tiempo de espera
+    acumulado/máximo y timeouts. Permite detectar contención en el pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += waited
+            if waited > self.wait_max:
+                self.wait_max = waited
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_total_ms": round(self.wait_total * 1000, 3),
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+                "wait_avg_ms": round(self.wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+            }
+
+
+sync_pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+
+
+class _InstrumentedPoolMixin:
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except _sql.exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - start)
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    metrics = sync_pool_metrics
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    metrics = async_pool_metrics
+
+
+def _engine_options(url: str, poolclass) -> dict:
+    # SQLite (tests) usa sus propios pools; el pool configurable aplica a PostgreSQL
+    if not url or url.startswith("sqlite"):
+        return {}
+    return {"poolclass": poolclass, **get_pool_settings()}
+
+# endregion
+
+engine = _sql.create_engine(DATABASE_URL, **_engine_options(DATABASE_URL, InstrumentedQueuePool))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# El motor asíncrono solo se crea cuando está activado, así el driver asyncpg
+# no es obligatorio en despliegues que siguen usando el modo síncrono.
+async_engine = None
+AsyncSessionLocal = None
+
+if ASYNC_DB:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL, InstrumentedAsyncQueuePool)
+    )
+    # expire_on_commit=False evita recargas implícitas (lazy IO) tras el commit
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, autoflush=False, expire_on_commit=False
+    )
+
+
+def _pool_status(pool, metrics: PoolMetrics) -> dict:
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "timeout": pool.timeout(),
+        })
+    status.update(metrics.snapshot())
+    return status
+
+
+def get_pool_status() -> dict:
+    """
+    Estado actual de los pools (conexiones en uso, overflow) y métricas de checkout.
+    """
+    pools = {"sync": _pool_status(engine.pool, sync_pool_metrics)}
+    if async_engine is not None:
+        pools["async"] = _pool_status(async_engine.sync_engine.pool, async_pool_metrics)
+    return {
+        "db_mode": DB_MODE,
+        "web_concurrency": WEB_CONCURRENCY,
+        "max_connections": DB_MAX_CONNECTIONS,
+        "settings": get_pool_settings(),
+        "pools": pools,
+    }
+
 Base = declarative_base()
 
-metadata = _sql.MetaData()
\ No newline at end of file
+metadata = _sql.MetaData()
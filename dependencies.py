@@ -1,22 +1,48 @@
 # dependencies.py
+# Única implementación de get_db/get_current_user: FastAPI cachea cada dependencia
+# por petición, así se abre una sola sesión y el usuario se resuelve una sola vez.
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
-from database import SessionLocal
 from models import User
-from utils import SECRET_KEY, ALGORITHM
+import utils
+from utils import SECRET_KEY, ALGORITHM, get_user
+from services.auth_service import AuthenticatedUser, user_cache, configure_user_cache
+from services.database_service import get_db, maybe_await
+from services.token_revocation_service import is_access_token_revoked
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+configure_user_cache(utils.AUTH_USER_CACHE_SIZE, utils.AUTH_USER_CACHE_TTL)
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def _resolve_stateless_user(payload: dict, db: Session):
+    """
+    Resuelve el usuario a partir de los claims firmados (uid, role, active).
+    Solo se consulta la base de datos si el usuario no está en la caché. El
+    token deja de valer si el rol del usuario ya no es el de sus claims.
+    """
+    user_id = payload.get("uid")
+    if not isinstance(user_id, int) or payload.get("active") is False:
+        return None
+    user = user_cache.get(user_id)
+    if user is None:
+        db_user = await maybe_await(db.get(User, user_id))
+        if db_user is None:
+            return None
+        user = AuthenticatedUser.from_user(db_user)
+        user_cache.set(user)
+    if not user.is_active or user.username != payload.get("sub"):
+        return None
+    role = payload.get("role")
+    if role is not None and role != getattr(user.role, "value", user.role):
+        return None
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """
+    Obtiene el usuario autenticado (con su rol) a partir del token de acceso.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudo validar las credenciales",
@@ -29,7 +55,13 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
+    # Lista de revocados en memoria: no añade ninguna consulta a la base de datos
+    if is_access_token_revoked(payload.get("jti")):
+        raise credentials_exception
+    if utils.AUTH_STATELESS and "uid" in payload:
+        user = await _resolve_stateless_user(payload, db)
+    else:
+        user = await get_user(db, username=username)
     if user is None:
         raise credentials_exception
     return user
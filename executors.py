@@ -0,0 +1,117 @@
+# executors.py
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+
+class ExecutorSaturated(Exception):
+    """
+    El ejecutor ya tiene el máximo de tareas pendientes (en curso + en cola).
+    """
+    pass
+
+
+class BoundedExecutor:
+    """
+    Pool de procesos o hilos para trabajo de CPU fuera del event loop, con un
+    límite de tareas pendientes: al superarlo se rechaza la tarea en lugar de
+    encolarla, para que el endpoint pueda responder con backpressure (429/503).
+
+    El pool se crea en el primer uso; así cada worker de gunicorn tiene el suyo
+    aunque la aplicación se precargue antes del fork.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        workers: int,
+        max_pending: int,
+        kind: str = "process",
+        start_method: Optional[str] = "spawn",
+    ):
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Tipo de ejecutor no soportado: {kind}")
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_pending = max(self.workers, max_pending)
+        self.kind = kind
+        self.start_method = start_method
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    context = multiprocessing.get_context(self.start_method) if self.start_method else None
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+            return self._executor
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise ExecutorSaturated(self.name)
+            self._pending += 1
+
+    def _release(self, _future=None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Ejecuta fn(*args) en el pool y espera el resultado sin bloquear el event loop.
+        Lanza ExecutorSaturated si no hay hueco.
+        """
+        self._acquire()
+        executor = None
+        try:
+            executor = self._get_executor()
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._release()
+            self._discard(executor)
+            raise
+        except BaseException:
+            self._release()
+            raise
+        # El hueco se libera cuando termina la tarea, aunque el cliente haya cancelado la petición
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            # Un proceso murió (p. ej. un fallo nativo del decodificador): se descarta
+            # el pool roto para que la siguiente tarea cree uno nuevo.
+            self._discard(executor)
+            raise
+
+    def _discard(self, executor: Executor) -> None:
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "rejected": self._rejected,
+                "started": self._executor is not None,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
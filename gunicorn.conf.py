@@ -0,0 +1,82 @@
+# gunicorn.conf.py
+# Perfil de producción: gunicorn -c gunicorn.conf.py main:app
+# Todos los valores se pueden cambiar con variables de entorno.
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def _cpu_count() -> int:
+    # En un contenedor limitado con cpuset, os.cpu_count() devuelve los núcleos del host
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+CPU_COUNT = _cpu_count()
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Cada worker es un event loop: uno por núcleo basta para ocupar la CPU
+workers = max(1, _env_int("WEB_CONCURRENCY", CPU_COUNT))
+worker_class = "workers.UvicornWorker"
+
+# database.py reparte DB_MAX_CONNECTIONS entre WEB_CONCURRENCY workers. Se exporta
+# antes de cargar la aplicación para que el cálculo use el número real.
+os.environ["WEB_CONCURRENCY"] = str(workers)
+# bcrypt y el escaneo de códigos tienen un pool de procesos por worker; por defecto
+# se reparten los núcleos entre los workers en lugar de crear núcleos x workers procesos.
+os.environ.setdefault("PASSWORD_HASH_WORKERS", str(max(1, CPU_COUNT // workers)))
+os.environ.setdefault("SCAN_WORKERS", str(max(1, CPU_COUNT // workers)))
+# Invalidaciones de caché, revocaciones y cambios del flujo de estados tienen que
+# llegar a todos los workers: el backend local solo avisa al propio proceso.
+os.environ.setdefault("NOTIFICATION_BACKEND", "postgres")
+
+# Conexiones pendientes de aceptar en el socket y segundos que se mantiene abierta
+# una conexión keep-alive inactiva. Detrás de un balanceador, keepalive debe ser
+# mayor que su timeout de inactividad para que no reutilice conexiones ya cerradas.
+backlog = _env_int("GUNICORN_BACKLOG", 2048)
+keepalive = _env_int("GUNICORN_KEEPALIVE", 5)
+
+# Reinicia cada worker tras max_requests peticiones (0 = nunca) para acotar fugas
+# de memoria; el jitter evita que todos se reinicien a la vez.
+max_requests = _env_int("GUNICORN_MAX_REQUESTS", 10000)
+max_requests_jitter = _env_int("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10)
+
+# Un worker sin latido durante `timeout` segundos se reinicia; al parar o reciclar
+# un worker, se esperan `graceful_timeout` segundos a que acaben sus peticiones.
+timeout = _env_int("GUNICORN_TIMEOUT", 60)
+graceful_timeout = _env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+
+# La aplicación se importa una vez en el proceso maestro y los workers comparten
+# esa memoria por copy-on-write. El lifespan (tareas periódicas, LISTEN de
+# revocaciones, pools de procesos) se ejecuta en cada worker después del fork.
+preload_app = _env_bool("GUNICORN_PRELOAD", True)
+
+# El latido de los workers en memoria: en Docker /tmp puede estar en disco
+worker_tmp_dir = os.getenv("GUNICORN_WORKER_TMP_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else None)
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = os.getenv("GUNICORN_ERROR_LOG", "-")
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    # Con preload_app los motores se crean en el maestro: cada worker descarta las
+    # conexiones heredadas (sin cerrarlas, siguen siendo del maestro) y abre las suyas.
+    import database
+
+    database.engine.dispose(close=False)
+    if database.async_engine is not None:
+        database.async_engine.sync_engine.dispose(close=False)
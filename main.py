@@ -1,14 +1,58 @@
+import asyncio
 from typing import TYPE_CHECKING
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.middleware.cors import CORSMiddleware
-from routers import qr_bar_codes_router, vehicle_brands_router, vehicle_models_router, vehicle_states_router, vehicle_types_router, vehicles_router, colors_router, auth_router, dashbaord_routes
+from routers import qr_bar_codes_router, vehicle_brands_router, vehicle_models_router, vehicle_states_router, vehicle_types_router, vehicles_router, colors_router, auth_router, dashbaord_routes, metrics_router
+from sqlalchemy.exc import SQLAlchemyError
+from responses import DefaultResponse
+import database
+from services.barcode_service import scan_executor
+from services.password_service import hash_executor
+from services.database_service import session_scope
+from services.state_machine_service import get_state_machine_service
+from services.vehicle_counters_service import (
+    VEHICLE_COUNTERS_RECONCILE_INTERVAL, check_counters_dialect, run_counters_reconciliation
+)
+from services.refresh_token_service import REFRESH_TOKEN_PURGE_INTERVAL, run_refresh_token_purge
+from services.notification_service import notification_bus
 
 
 if TYPE_CHECKING:
     from sqlalchemy.orm import Session
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Los contadores del dashboard necesitan INSERT ... ON CONFLICT: mejor no
+    # arrancar que fallar en cada alta o cambio de estado
+    check_counters_dialect(database.engine.dialect.name)
+    # Compilar la máquina de estados al arrancar; si la base de datos aún no
+    # está disponible se cargará en la primera petición que la necesite.
+    try:
+        async with session_scope() as db:
+            await get_state_machine_service(db)
+    except SQLAlchemyError:
+        pass
+    # Tareas periódicas: reconciliación de los contadores del dashboard y
+    # purga de refresh tokens y de access tokens revocados ya caducados
+    background_tasks = []
+    if VEHICLE_COUNTERS_RECONCILE_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(run_counters_reconciliation()))
+    if REFRESH_TOKEN_PURGE_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(run_refresh_token_purge()))
+    # Avisos entre workers: invalidación de cachés y access tokens revocados
+    await notification_bus.start()
+    yield
+    await notification_bus.stop()
+    for task in background_tasks:
+        task.cancel()
+    # Cerrar los pools de procesos para no dejar workers huérfanos
+    scan_executor.shutdown(wait=False)
+    hash_executor.shutdown(wait=False)
+
+# Las respuestas se serializan con orjson
+app = FastAPI(lifespan=lifespan, default_response_class=DefaultResponse)
 
 app.include_router(vehicle_types_router.router)
 app.include_router(vehicle_brands_router.router)
@@ -19,9 +63,9 @@ app.include_router(vehicle_states_router.router)
 app.include_router(colors_router.router)
 app.include_router(auth_router.router)
 app.include_router(dashbaord_routes.router)
+app.include_router(metrics_router.router)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
-revoked_tokens = set() # Lista para almacenar tokens revocados
 
 #origins = ['http://localhost:3000','http://192.168.178.23:3000']
 
@@ -33,13 +33,35 @@ class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
     
     id = Column(Integer, primary_key=True, index=True)
-    token = Column(String, unique=True, index=True, nullable=False)
+    # Se guarda el jti (uuid4) del token firmado, no el JWT completo
+    jti = Column(String(36), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"))
-    is_revoked = Column(Boolean, default=False)
+    is_revoked = Column(Boolean, default=False, nullable=False)
+    revoked_at = Column(_sql.DateTime(timezone=True), nullable=True)
+    # jti del token que lo sustituyó al rotarlo; nulo si se revocó de otra forma (logout)
+    replaced_by = Column(String(36), nullable=True)
     expires_at = Column(_sql.DateTime(timezone=True), nullable=False)
     
     user = relationship("User", back_populates="refresh_tokens")
 
+    __table_args__ = (
+        # /refresh y /logout: una sola búsqueda por jti (único)
+        _sql.Index("ix_refresh_tokens_jti", "jti", unique=True),
+        # Purga periódica de tokens caducados o revocados
+        _sql.Index("ix_refresh_tokens_expires_at", "expires_at"),
+        _sql.Index("ix_refresh_tokens_revoked_at", "revoked_at"),
+    )
+
+class RevokedAccessToken(Base):
+    """
+    Access tokens revocados antes de caducar (p. ej. en el logout). Cada worker
+    los mantiene en memoria; la tabla sirve para cargarlos al arrancar.
+    """
+    __tablename__ = "revoked_access_tokens"
+
+    jti = Column(String(36), primary_key=True)
+    expires_at = Column(_sql.DateTime(timezone=True), nullable=False, index=True)
+
 class Brand(Base):
     __tablename__ = 'brands'
     id = Column(Integer, primary_key=True, index=True)
@@ -162,6 +184,26 @@ class StateComment(Base):
     state = relationship('State', back_populates='state_comments')
     state_histories = relationship('StateHistory', back_populates='comment') # ??
 
+class VehicleStateCounter(Base):
+    """
+    Número de vehículos en cada estado, mantenido en la misma transacción que
+    las altas, bajas y cambios de estado (lecturas del dashboard sin COUNT(*)).
+    """
+    __tablename__ = 'vehicle_state_counters'
+
+    state_id = Column(Integer, _sql.ForeignKey('states.id', ondelete='CASCADE'), primary_key=True)
+    count = Column(_sql.BigInteger, nullable=False, default=0, server_default='0')
+
+class VehicleRegistrationDaily(Base):
+    """
+    Vehículos registrados por día (fecha UTC de created_at), mantenido en la
+    misma transacción que las altas y bajas de vehículos.
+    """
+    __tablename__ = 'vehicle_registrations_daily'
+
+    day = Column(_sql.Date, primary_key=True)
+    count = Column(_sql.BigInteger, nullable=False, default=0, server_default='0')
+
 class Color(Base):
     __tablename__ = 'colors'
 
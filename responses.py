@@ -0,0 +1,44 @@
+# responses.py
+from functools import lru_cache
+from typing import Any, List, Mapping, Optional
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+
+# Clase de respuesta por defecto de la aplicación (main.py): orjson en lugar de json
+DefaultResponse = ORJSONResponse
+
+
+@lru_cache(maxsize=None)
+def type_adapter(response_type: Any) -> TypeAdapter:
+    """
+    TypeAdapter por tipo de respuesta. Construirlo es costoso, así que se reutiliza.
+    """
+    return TypeAdapter(response_type)
+
+
+def validate_list(item_type: Any, rows: Any) -> List[Any]:
+    """
+    Valida una lista de filas ORM en una sola pasada de pydantic-core, en lugar
+    de llamar a model_validate fila a fila desde Python.
+    """
+    return type_adapter(List[item_type]).validate_python(rows, from_attributes=True)
+
+
+def model_response(
+    response_type: Any,
+    content: Any,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    """
+    Serializa modelos Pydantic ya validados directamente a JSON (pydantic-core),
+    sin la validación y el paso intermedio a dict que hace FastAPI con response_model.
+    El endpoint debe seguir declarando response_model para la documentación OpenAPI.
+    """
+    return Response(
+        content=type_adapter(response_type).dump_json(content),
+        status_code=status_code,
+        media_type="application/json",
+        headers=headers,
+    )
@@ -1,78 +1,98 @@
 # routers/auth_router.py
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordRequestForm
+from typing import Optional
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from jose import jwt, JWTError
-from datetime import datetime, timedelta
-import uuid
 import models
 import schemas
 import services
-from dependencies import get_db
+from dependencies import get_db, get_current_user
+from executors import ExecutorSaturated
+from constants.exceptions import AUTH_BUSY
+from services.database_service import maybe_await
+from services.password_service import hash_password_service, PASSWORD_HASH_RETRY_AFTER
+from services.refresh_token_service import (
+    get_active_refresh_token_service,
+    issue_refresh_token_service,
+    revoke_refresh_token,
+    rotate_refresh_token_service,
+)
+from services.token_revocation_service import revoke_access_token_service
+from services.exceptions import RefreshTokenReused
 from utils import (
     authenticate_user,
     create_access_token,
-    create_refresh_token,
-    get_password_hash,
-    get_current_user,
+    access_token_claims,
+    get_user,
     SECRET_KEY,
     ALGORITHM,
-    REFRESH_TOKEN_EXPIRE_DAYS,
 )
 
+# En el logout el access token es opcional: si se envía, se revoca también
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
+
 router = APIRouter(
     tags=["Authorization"],
     responses={404: {"description": "Not Found"}},
 )
 
 
+def _auth_busy() -> HTTPException:
+    # El pool de hashing está lleno: el cliente debe reintentar más tarde
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=AUTH_BUSY,
+        headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+    )
+
+
 @router.post("/register", response_model=schemas.UserOut, summary="Registrar un nuevo usuario")
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     """
     Endpoint para registrar un nuevo usuario.
     """
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+    db_user = await get_user(db, user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await hash_password_service(user.password)
+    except ExecutorSaturated:
+        raise _auth_busy()
     new_user = models.User(username=user.username, hashed_password=hashed_password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await maybe_await(db.commit())
+    await maybe_await(db.refresh(new_user))
     return new_user
 
 
 @router.post("/login", response_model=schemas.Token, summary="Iniciar sesión")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """
     Endpoint de login que devuelve Access y Refresh Tokens.
     """
-    user = authenticate_user(db, form_data.username, form_data.password)
+    try:
+        user = await authenticate_user(db, form_data.username, form_data.password)
+    except ExecutorSaturated:
+        raise _auth_busy()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token(data={"sub": user.username})
-    refresh_token = create_refresh_token(data={"sub": user.username, "jti": str(uuid.uuid4())})
-
-    # Almacenar el Refresh Token en la base de datos
-    new_refresh_token = models.RefreshToken(
-        token=refresh_token,
-        user_id=user.id,
-        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
-    )
-    db.add(new_refresh_token)
-    db.commit()
+    access_token = create_access_token(data=access_token_claims(user))
+    # Almacenar el jti del Refresh Token en la base de datos
+    refresh_token = await issue_refresh_token_service(db, user)
+    await maybe_await(db.commit())
 
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
 
 @router.post("/refresh", response_model=schemas.Token, summary="Refrescar el token de acceso")
-def refresh_token(token_refresh: schemas.TokenRefresh, db: Session = Depends(get_db)):
+async def refresh_token(token_refresh: schemas.TokenRefresh, db: Session = Depends(get_db)):
     """
     Endpoint para renovar el Access Token utilizando un Refresh Token válido.
     """
@@ -91,45 +111,35 @@ def refresh_token(token_refresh: schemas.TokenRefresh, db: Session = Depends(get
     except JWTError:
         raise credentials_exception
 
-    # Obtener el usuario desde la base de datos
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if user is None:
-        raise credentials_exception
-
-    # Verificar si el Refresh Token está en la base de datos y no está revocado
-    stored_refresh_token = db.query(models.RefreshToken).filter(
-        models.RefreshToken.token == token_refresh.refresh_token,
-        models.RefreshToken.is_revoked == False,
-        models.RefreshToken.expires_at > datetime.utcnow(),
-    ).first()
-    if stored_refresh_token is None:
+    # Revocar el Refresh Token actual y emitir el nuevo en una sola transacción
+    try:
+        rotated = await rotate_refresh_token_service(db, jti, username)
+    except RefreshTokenReused as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if rotated is None:
         raise credentials_exception
-
-    # Revocar el Refresh Token actual
-    stored_refresh_token.is_revoked = True
-    db.commit()
-
-    # Crear un nuevo Refresh Token
-    new_refresh_token_str = create_refresh_token(data={"sub": user.username, "jti": str(uuid.uuid4())})
-    new_refresh_token = models.RefreshToken(
-        token=new_refresh_token_str,
-        user_id=user.id,
-        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
-    )
-    db.add(new_refresh_token)
-    db.commit()
+    user, new_refresh_token_str = rotated
 
     # Crear un nuevo Access Token
-    access_token = create_access_token(data={"sub": user.username})
+    access_token = create_access_token(data=access_token_claims(user))
 
     return {"access_token": access_token, "refresh_token": new_refresh_token_str, "token_type": "bearer"}
 
 
 
 @router.post("/logout", status_code=200, summary="Cerrar sesión")
-def logout(token_refresh: schemas.TokenRefresh, db: Session = Depends(get_db)):
+async def logout(
+    token_refresh: schemas.TokenRefresh,
+    access_token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: Session = Depends(get_db),
+):
     """
-    Endpoint para cerrar sesión revocando el Refresh Token proporcionado.
+    Endpoint para cerrar sesión revocando el Refresh Token proporcionado y, si
+    se envía en la cabecera Authorization, el Access Token hasta que caduque.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -140,38 +150,43 @@ def logout(token_refresh: schemas.TokenRefresh, db: Session = Depends(get_db)):
         # Decodificar el Refresh Token
         payload = jwt.decode(token_refresh.refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        jti: str = payload.get("jti")
+        if username is None or jti is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
     # Obtener el usuario desde la base de datos
-    user = db.query(models.User).filter(models.User.username == username).first()
+    user = await get_user(db, username)
     if user is None:
         raise credentials_exception
 
     # Buscar el Refresh Token en la base de datos
-    stored_refresh_token = db.query(models.RefreshToken).filter(
-        models.RefreshToken.token == token_refresh.refresh_token,
-        models.RefreshToken.is_revoked == False,
-        models.RefreshToken.expires_at > datetime.utcnow(),
-    ).first()
+    stored_refresh_token = await get_active_refresh_token_service(db, jti)
 
-    if stored_refresh_token is None:
+    if stored_refresh_token is None or stored_refresh_token.user_id != user.id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Refresh token not found or already revoked",
         )
 
     # Revocar el Refresh Token
-    stored_refresh_token.is_revoked = True
-    db.commit()
+    revoke_refresh_token(stored_refresh_token)
+    if access_token:
+        try:
+            access_payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            # Caducado o inválido: ya no da acceso, no hace falta revocarlo
+            access_payload = {}
+        if access_payload.get("jti") and access_payload.get("sub") == username:
+            await revoke_access_token_service(db, access_payload["jti"], access_payload["exp"])
+    await maybe_await(db.commit())
 
     return {"message": "Logged out successfully"}
 
 
 @router.get("/protected", response_model=schemas.UserOut, summary="Endpoint protegido")
-def read_protected(current_user: models.User = Depends(get_current_user)):
+async def read_protected(current_user: models.User = Depends(get_current_user)):
     """
     Endpoint de ejemplo que requiere autenticación.
     """
@@ -179,7 +194,7 @@ def read_protected(current_user: models.User = Depends(get_current_user)):
 
 
 @router.get("/users/me", response_model=schemas.UserOut, summary="Obtener datos del usuario autenticado")
-def get_current_user_data(current_user: models.User = Depends(get_current_user)):
+async def get_current_user_data(current_user: models.User = Depends(get_current_user)):
     """
     Devuelve la información del usuario autenticado, incluyendo su rol.
     """
@@ -1,11 +1,12 @@
 # routers/colors.py
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
 from typing import List
 from sqlalchemy.orm import Session
 import schemas
 from services.colors_service import get_color, add_color, update_color, delete_color, fetch_all_colors, get_color_id_by_name_service
 from dependencies import get_current_user
+from services.response_cache_service import cached_response
 from services.database_service import get_db
 
 
@@ -38,13 +39,17 @@ async def create_color(
     description="Obtiene un color específico por su ID.",
 )
 async def read_color(
+    request: Request,
     color_id: int,
     db: Session = Depends(get_db),
 ):
-    color = await get_color(db=db, color_id=color_id)
-    if color is None:
-        raise HTTPException(status_code=404, detail="Color not found.")
-    return color
+    async def load():
+        color = await get_color(db=db, color_id=color_id)
+        if color is None:
+            raise HTTPException(status_code=404, detail="Color not found.")
+        return color
+
+    return await cached_response(request, "colors", schemas.Color, load)
 
 
 @router.put(
@@ -87,12 +92,16 @@ async def remove_color(
     description="Devuelve una lista de todos los colores disponibles.",
 )
 async def get_all_colors(
+    request: Request,
     skip: int = 0,
     limit: int = 10,    
     db: Session = Depends(get_db),
 ):
     try:
-        return await fetch_all_colors(db=db, skip=skip, limit=limit)  # Llama a la función de servicio renombrada
+        return await cached_response(
+            request, "colors", List[schemas.Color],
+            lambda: fetch_all_colors(db=db, skip=skip, limit=limit),  # Llama a la función de servicio renombrada
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
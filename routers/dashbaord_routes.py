@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import List, Optional, Dict
+from datetime import date
+from typing import List, Literal, Optional, Dict
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 import models
@@ -7,7 +8,7 @@ import schemas
 import services
 from dependencies import get_current_user
 from services.database_service import get_db
-from services.dashboard_service import count_vehicles_service, get_vehicles_with_non_final_status_count_service, get_vehicle_registrations_by_date_service
+from services.dashboard_service import count_vehicles_service, get_vehicles_with_non_final_status_count_service, get_vehicle_counts_by_state_service, get_vehicle_registrations_by_date_service
 
 from services.exceptions import (
     VehicleNotFound,
@@ -71,6 +72,24 @@ async def get_vehicles_in_process_count(
 
 
 
+@router.get(
+    "/vehicles/count-by-state",
+    response_model=List[Dict[str, int]],
+    summary="Obtener el número de vehículos por estado",
+    description="Devuelve el número de vehículos en cada estado del flujo.",
+)
+async def get_vehicle_counts_by_state(
+    db: Session = Depends(get_db),
+):
+    try:
+        return await get_vehicle_counts_by_state_service(db=db)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=UNEXPECTED_ERROR
+        )
+
+
 @router.get(
     "/vehicles/registrations-by-date",
     response_model=List[Dict[str, int]],
@@ -78,11 +97,18 @@ async def get_vehicles_in_process_count(
     description="Devuelve el número de vehículos registrados por fecha.",
 )
 async def get_vehicle_registrations_by_date(
+    granularity: Literal["day", "week", "month"] = Query(
+        "month", description="Agrupación: día, semana ISO o mes"
+    ),
+    date_from: Optional[date] = Query(None, description="Fecha inicial (incluida)"),
+    date_to: Optional[date] = Query(None, description="Fecha final (incluida)"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
     try:
-        registrations = await get_vehicle_registrations_by_date_service(db=db)
+        registrations = await get_vehicle_registrations_by_date_service(
+            db=db, granularity=granularity, date_from=date_from, date_to=date_to
+        )
         return registrations
     except Exception:
         raise HTTPException(
@@ -0,0 +1,33 @@
+# routers/metrics_router.py
+
+from fastapi import APIRouter, Depends
+import database
+from dependencies import get_current_user
+from services.barcode_service import scan_executor
+from services.password_service import hash_executor
+
+
+router = APIRouter(
+    prefix="/api/metrics",
+    tags=["Metrics"],
+    dependencies=[Depends(get_current_user)],
+    responses={404: {"description": "Not Found"}},
+)
+
+
+@router.get(
+    "/db-pool",
+    summary="Estado del pool de conexiones",
+    description="Devuelve el tamaño del pool, las conexiones en uso y las métricas de espera en el checkout.",
+)
+async def get_db_pool_metrics():
+    return database.get_pool_status()
+
+
+@router.get(
+    "/executors",
+    summary="Estado de los pools de trabajo",
+    description="Devuelve, por pool, los workers, las tareas pendientes y las rechazadas por saturación.",
+)
+async def get_executor_metrics():
+    return {"scan": scan_executor.stats(), "password_hash": hash_executor.stats()}
@@ -1,121 +1,216 @@
 # routers/qr_codes.py
 
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Query, Request, Response, HTTPException, status
+from fastapi import params
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from typing import List
-import io
-from PIL import Image
-from pyzbar.pyzbar import decode
-import models
-import schemas
-import services
-from schemas import ImageBase64Request
+from fastapi.routing import APIRoute
+from typing import Awaitable, Callable, Optional
+from pydantic import ValidationError
+from schemas import ImageBase64Request, ScanRegion
 from dependencies import get_current_user
-from services.database_service import get_db
+from executors import ExecutorSaturated
+from services import barcode_service
+from services.barcode_service import (
+    scan_file_service,
+    scan_image_service,
+    scan_upload_service,
+    SCAN_RETRY_AFTER,
+)
+from services.exceptions import InvalidImage, ImageProcessingError, UploadTooLarge
+from constants.exceptions import (
+    UNSUPPORTED_FILE_TYPE,
+    NO_CODE_DETECTED,
+    SCANNER_BUSY,
+    INVALID_SCAN_REGION,
+    UPLOAD_TOO_LARGE,
+)
 from base64 import b64decode
 
+# Margen sobre el tamaño de la imagen para las cabeceras multipart, el campo roi
+# o el JSON que envuelve la imagen en base64
+SCAN_BODY_OVERHEAD = 64 * 1024
+
+
+def _check_size(size: Optional[int], max_bytes: Optional[int] = None) -> None:
+    max_bytes = barcode_service.SCAN_MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    if size is not None and size > max_bytes:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=UPLOAD_TOO_LARGE)
+
+
+def _limited_receive(receive: Callable, max_bytes: int) -> Callable:
+    # Corta la lectura del cuerpo en cuanto supera max_bytes (cuerpos sin Content-Length)
+    received = 0
+
+    async def limited_receive():
+        nonlocal received
+        message = await receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            _check_size(received, max_bytes)
+        return message
+
+    return limited_receive
+
+
+class ScanBodyLimitRoute(APIRoute):
+    """
+    Aplica el límite de tamaño antes de que FastAPI lea el cuerpo: el formulario
+    multipart (v1) y el JSON (v2) se procesan antes de ejecutar el endpoint, así
+    que comprobarlo dentro llega tarde. Se rechaza por Content-Length y, si no
+    viene, al superar el límite durante la lectura. /scan/v3 no declara cuerpo:
+    lee el stream y aplica el límite él mismo.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        if self.body_field is None:
+            return handler
+        is_form = isinstance(self.body_field.field_info, params.Form)
+
+        async def limited_handler(request: Request) -> Response:
+            max_bytes = barcode_service.SCAN_MAX_UPLOAD_BYTES
+            # En base64 cada 3 bytes de imagen ocupan 4
+            max_bytes = (max_bytes if is_form else max_bytes * 4 // 3) + SCAN_BODY_OVERHEAD
+            content_length = request.headers.get("content-length")
+            _check_size(int(content_length) if content_length and content_length.isdigit() else None, max_bytes)
+            return await handler(Request(request.scope, _limited_receive(request.receive, max_bytes)))
+
+        return limited_handler
+
+
 router = APIRouter(
     prefix="/api",
     tags=["QR & Barcodes"],
     dependencies=[Depends(get_current_user)],
     responses={404: {"description": "Not Found"}},
+    route_class=ScanBodyLimitRoute,
 )
 
 # Definir los tipos de imagen permitidos
 ALLOWED_EXTENSIONS = {"image/jpeg", "image/jpg", "image/png", "image/heic"}
 
+# Tipos aceptados por el endpoint binario (/scan/v3)
+ALLOWED_RAW_TYPES = ALLOWED_EXTENSIONS | {"application/octet-stream"}
+
+ROI_DESCRIPTION = "Región sugerida 'x,y,ancho,alto' en fracciones (0-1) de la imagen."
+
+
+def _parse_roi(roi: Optional[str]) -> Optional[ScanRegion]:
+    """
+    Convierte "x,y,ancho,alto" (fracciones 0-1) en una ScanRegion.
+    """
+    if not roi:
+        return None
+    try:
+        x, y, width, height = (float(value) for value in roi.split(","))
+        return ScanRegion(x=x, y=y, width=width, height=height)
+    except (ValueError, ValidationError):
+        raise HTTPException(status_code=400, detail=INVALID_SCAN_REGION)
+
+
+async def _scan(scan: Awaitable):
+    """
+    Espera el escaneo en el pool de procesos y construye la respuesta.
+    """
+    try:
+        result_data = await scan
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except ExecutorSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=SCANNER_BUSY,
+            headers={"Retry-After": str(SCAN_RETRY_AFTER)},
+        )
+    except InvalidImage as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ImageProcessingError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not result_data:
+        return JSONResponse(content={"error": NO_CODE_DETECTED}, status_code=400)
+
+    # Devolver la lista de códigos detectados junto con su tipo
+    return {"detected_codes": result_data}
+
+
 @router.post(
     "/scan/v1",
     summary="Escanear códigos QR y códigos de barras",
     description="Endpoint para subir una imagen y escanear códigos QR y códigos de barras.",
+    responses={
+        413: {"description": "La imagen supera SCAN_MAX_UPLOAD_BYTES"},
+        429: {"description": "Escáner saturado, reintentar tras Retry-After"},
+    },
 )
 async def scan_qr_barcode(
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    roi: Optional[str] = Form(None, description=ROI_DESCRIPTION),
 ):
     # Verificar el tipo de archivo
     if file.content_type not in ALLOWED_EXTENSIONS:
-        raise HTTPException(status_code=400, detail="Unsupported file type")
-
-    contents = await file.read()
-
-    # Manejo de imágenes HEIC
-    if file.content_type == "image/heic":
-        try:
-            import pyheif
-            heif_file = pyheif.read_heif(contents)
-            image = Image.frombytes(
-                heif_file.mode,
-                heif_file.size,
-                heif_file.data,
-                "raw",
-                heif_file.mode,
-                heif_file.stride,
-            )
-        except ImportError:
-            raise HTTPException(
-                status_code=500,
-                detail="HEIC format not supported. Please install 'pyheif' library.",
-            )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error processing HEIC image: {str(e)}")
-    else:
-        try:
-            # Intentar abrir la imagen con PIL
-            image = Image.open(io.BytesIO(contents))
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Invalid image file: {str(e)}")
-
-    # Decodificar el código QR o de barras usando pyzbar
-    decoded_objects = decode(image)
-
-    if not decoded_objects:
-        return JSONResponse(content={"error": "No QR or Barcode detected"}, status_code=400)
-
-    # Procesar los códigos detectados
-    result_data = []
-    for obj in decoded_objects:
-        code_type = "QR Code" if obj.type == "QRCODE" else obj.type
-        result_data.append({
-            "type": code_type,
-            "data": obj.data.decode("utf-8")
-        })
+        raise HTTPException(status_code=400, detail=UNSUPPORTED_FILE_TYPE)
 
-    # Devolver la lista de códigos detectados junto con su tipo
-    return {"detected_codes": result_data}
+    _check_size(file.size)
+    region = _parse_roi(roi)
+    # Starlette ya guardó la subida en un fichero temporal: se escanea sin volver a copiarla
+    return await _scan(scan_file_service(file.file, file.content_type, region.as_box() if region else None))
 
 
-from base64 import b64decode
-
 @router.post(
     "/scan/v2",
     summary="Escanear códigos QR y códigos de barras desde una imagen en base64",
     description="Endpoint para recibir una imagen en base64 y escanear códigos QR y códigos de barras.",
+    responses={
+        413: {"description": "La imagen supera SCAN_MAX_UPLOAD_BYTES"},
+        429: {"description": "Escáner saturado, reintentar tras Retry-After"},
+    },
 )
 async def scan_qr_barcode_base64(
     request: ImageBase64Request,
 ):
+    # Cada 4 caracteres base64 son 3 bytes de imagen
+    _check_size(len(request.image) * 3 // 4)
+
     # Decodificar la imagen base64
     try:
         image_data = b64decode(request.image)
-        image = Image.open(io.BytesIO(image_data))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid image file: {str(e)}")
 
-    # Decodificar el código QR o de barras usando pyzbar
-    decoded_objects = decode(image)
+    return await _scan(scan_image_service(image_data, None, request.roi.as_box() if request.roi else None))
 
-    if not decoded_objects:
-        return JSONResponse(content={"error": "No QR or Barcode detected"}, status_code=400)
 
-    # Procesar los códigos detectados
-    result_data = []
-    for obj in decoded_objects:
-        code_type = "QR Code" if obj.type == "QRCODE" else obj.type
-        result_data.append({
-            "type": code_type,
-            "data": obj.data.decode("utf-8")
-        })
-
-    # Devolver la lista de códigos detectados junto con su tipo
-    return {"detected_codes": result_data}
+@router.post(
+    "/scan/v3",
+    summary="Escanear códigos QR y códigos de barras desde el cuerpo binario",
+    description=(
+        "Recibe la imagen como cuerpo binario (application/octet-stream o el tipo de la imagen), "
+        "sin multipart ni base64. El cuerpo se procesa en streaming con límite de tamaño."
+    ),
+    responses={
+        413: {"description": "La imagen supera SCAN_MAX_UPLOAD_BYTES"},
+        429: {"description": "Escáner saturado, reintentar tras Retry-After"},
+    },
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                content_type: {"schema": {"type": "string", "format": "binary"}}
+                for content_type in sorted(ALLOWED_RAW_TYPES)
+            },
+        }
+    },
+)
+async def scan_qr_barcode_raw(
+    request: Request,
+    roi: Optional[str] = Query(None, description=ROI_DESCRIPTION),
+):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in ALLOWED_RAW_TYPES:
+        raise HTTPException(status_code=400, detail=UNSUPPORTED_FILE_TYPE)
+
+    content_length = request.headers.get("content-length")
+    _check_size(int(content_length) if content_length and content_length.isdigit() else None)
+    region = _parse_roi(roi)
+    return await _scan(scan_upload_service(request.stream(), content_type, region.as_box() if region else None))
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from typing import List
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 import models
 import schemas
 from dependencies import get_current_user
-from services.database_service import get_db
-from services.brands_service import create_new_brand_service, get_all_brands_service, get_brand_service, delete_brand_service, update_brand_service
+from services.database_service import get_db, maybe_await
+from services.response_cache_service import cached_response
+from services.brands_service import create_new_brand_service, get_all_brands_service, get_brand_service, get_brand_by_name_service, delete_brand_service, update_brand_service
 
 
 router = APIRouter(
@@ -22,7 +23,7 @@ async def create_brand(
     db: Session = Depends(get_db)
 ):
     # Comprobar si la marca ya existe
-    existing_brand = db.query(models.Brand).filter(models.Brand.name == brand.name).first()
+    existing_brand = await get_brand_by_name_service(brand.name, db)
     
     if existing_brand:
         raise HTTPException(status_code=409, detail="Brand already exists")
@@ -30,27 +31,34 @@ async def create_brand(
     try:
         return await create_new_brand_service(brand=brand, db=db)
     except IntegrityError:
-        db.rollback()
+        await maybe_await(db.rollback())
         raise HTTPException(status_code=409, detail="Brand already exists")
 
 @router.get("", response_model=List[schemas.Brand], summary="Obtener todas las marcas")
 async def get_brands(
+    request: Request,
     skip: int = 0,
     limit: int = 10,
     db: Session = Depends(get_db)
 ):
-    return await get_all_brands_service(db=db, skip=skip, limit=limit)
+    return await cached_response(
+        request, "brands", List[schemas.Brand],
+        lambda: get_all_brands_service(db=db, skip=skip, limit=limit),
+    )
 
 @router.get("/{brand_id}", response_model=schemas.Brand, summary="Obtener una marca por ID")
 async def get_brand(
+    request: Request,
     brand_id: int, 
     db: Session = Depends(get_db)
 ):
-    brand = await get_brand_service(db=db, brand_id=brand_id)
-    if brand is None:
-        raise HTTPException(status_code=404, detail="Brand does not exist")
+    async def load():
+        brand = await get_brand_service(db=db, brand_id=brand_id)
+        if brand is None:
+            raise HTTPException(status_code=404, detail="Brand does not exist")
+        return brand
 
-    return brand
+    return await cached_response(request, "brands", schemas.Brand, load)
 
 @router.delete("/{brand_id}", status_code=204, summary="Eliminar una marca")
 async def delete_brand(
@@ -76,10 +84,7 @@ async def update_brand(
         raise HTTPException(status_code=404, detail="Brand does not exist")
 
     # Verificar si el nuevo nombre ya existe en otra marca
-    existing_brand = db.query(models.Brand).filter(
-        models.Brand.name == brand_data.name,
-        models.Brand.id != brand_id
-    ).first()
+    existing_brand = await get_brand_by_name_service(brand_data.name, db, exclude_id=brand_id)
     if existing_brand:
         raise HTTPException(status_code=409, detail="Brand name already in use")
 
@@ -1,5 +1,5 @@
 # endpoints/models.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
 from typing import List, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
@@ -7,9 +7,11 @@ import models
 import schemas
 import services
 from dependencies import get_current_user
-from services.database_service import get_db
+from services.database_service import get_db, maybe_await
+from services.response_cache_service import cached_response
 from services.models_service import (
     create_model_service,
+    get_existing_model_service,
     get_all_models_service,
     get_model_service,
     delete_model_service,
@@ -49,11 +51,9 @@ async def create_model(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid type_id")
     
     # Comprobar si el modelo ya existe para la marca y tipo especificados
-    existing_model = db.query(models.Model).filter(
-        models.Model.name == model.name.strip(),
-        models.Model.brand_id == model.brand_id,
-        models.Model.type_id == model.type_id
-    ).first()
+    existing_model = await get_existing_model_service(
+        model.name.strip(), model.brand_id, model.type_id, db
+    )
     
     if existing_model:
         raise HTTPException(status_code=409, detail="Model already exists for this brand and type")
@@ -64,7 +64,7 @@ async def create_model(
     except HTTPException as e:
         raise e
     except IntegrityError:
-        db.rollback()
+        await maybe_await(db.rollback())
         raise HTTPException(status_code=409, detail="Model already exists for this brand and type")
 
 @router.get(
@@ -74,11 +74,15 @@ async def create_model(
     description="Recupera una lista de todos los modelos disponibles."
 )
 async def get_models(
+    request: Request,
     skip: int = 0,
     limit: int = 10,    
     db: Session = Depends(get_db)              
 ):
-    return await get_all_models_service(db=db, skip=skip, limit=limit)
+    return await cached_response(
+        request, "models", List[schemas.Model],
+        lambda: get_all_models_service(db=db, skip=skip, limit=limit),
+    )
 
 @router.get(
     "/{model_id}",
@@ -87,6 +91,7 @@ async def get_models(
     description="Recupera un modelo específico utilizando su ID."
 )
 async def get_model(
+    request: Request,
     model_id: int, 
     db: Session = Depends(get_db)
 ):
@@ -94,11 +99,13 @@ async def get_model(
     if not isinstance(model_id, int) or model_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid model_id")
     
-    model = await get_model_service(db=db, model_id=model_id)
-    if model is None:
-        raise HTTPException(status_code=404, detail="Model does not exist")
-    
-    return model
+    async def load():
+        model = await get_model_service(db=db, model_id=model_id)
+        if model is None:
+            raise HTTPException(status_code=404, detail="Model does not exist")
+        return model
+
+    return await cached_response(request, "models", schemas.Model, load)
 
 @router.delete(
     "/{model_id}",
@@ -126,7 +133,7 @@ async def delete_model(
     except HTTPException as e:
         raise e
     except Exception:
-        db.rollback()
+        await maybe_await(db.rollback())
         raise HTTPException(status_code=500, detail="Failed to delete model")
     
     return
@@ -165,7 +172,7 @@ async def update_model(
     except HTTPException as e:
         raise e
     except IntegrityError:
-        db.rollback()
+        await maybe_await(db.rollback())
         raise HTTPException(status_code=409, detail="Another model with the same name, brand, and type already exists")
 
 @router.get(
@@ -1,24 +1,28 @@
 # routers/vehicle_states.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from typing import List
 from sqlalchemy.orm import Session
 import models
 import schemas
 import services
 from dependencies import get_current_user
+from responses import model_response
 from services.database_service import get_db
+from services.response_cache_service import cached_response
 from services.states_management_service import (
 get_allowed_transitions_for_vehicle_service, 
 get_all_states_service, 
 get_vehicle_state_history_service, 
 get_vehicle_current_state_service, 
 change_vehicle_state_service, 
+change_vehicles_state_batch_service,
 get_state_comments_service)
 
 from services.exceptions import (
     StateNotFoundException,
-    StateCommentsNotFoundException
+    StateCommentsNotFoundException,
+    StateChangeConflict
 )
 from constants.exceptions import (
     STATE_COMMENT_NOT_FOUND,
@@ -55,9 +59,10 @@ async def get_allowed_transitions(
     description="Devuelve una lista de todos los estados disponibles para los vehículos.",
 )
 async def get_all_states(
+    request: Request,
     db: Session = Depends(get_db),
 ):
-    return await get_all_states_service(db=db)
+    return await cached_response(request, "states", List[schemas.State], lambda: get_all_states_service(db=db))
 
 @router.get(
     "/vehicles/{vehicle_id}/state_history",
@@ -72,7 +77,7 @@ async def get_vehicle_state_history(
     state_history = await get_vehicle_state_history_service(vehicle_id=vehicle_id, db=db)
     if not state_history:
         raise HTTPException(status_code=404, detail="Vehicle state history not found.")
-    return state_history
+    return model_response(List[schemas.StateHistory], state_history)
 
 @router.get(
     "/vehicles/{vehicle_id}/state",
@@ -115,12 +120,45 @@ async def change_vehicle_state(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
         )
+    except StateChangeConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
+        )
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al cambiar el estado del vehículo.",
         )
 
+@router.post(
+    "/vehicles/state/batch",
+    response_model=schemas.StateChangeBatchResult,
+    summary="Cambiar el estado de varios vehículos",
+    description=(
+        "Cambia el estado de una lista de vehículos al mismo estado destino en una sola transacción. "
+        "Devuelve el resultado de cada vehículo: changed o error."
+    ),
+)
+async def change_vehicles_state_batch(
+    state_change: schemas.StateChangeBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    try:
+        return await change_vehicles_state_batch_service(
+            vehicle_ids=state_change.vehicle_ids,
+            new_state_id=state_change.new_state_id,
+            user_id=current_user.id,
+            db=db,
+            comment_id=state_change.comment_id,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
 @router.get(
     "/states/{state_id}/comments",
     response_model=List[schemas.StateCommentRead],
@@ -133,7 +171,7 @@ async def get_state_comments(
 ):
     try:
         comments = await get_state_comments_service(state_id=state_id, db=db)
-        return comments
+        return model_response(List[schemas.StateCommentRead], comments)
     except StateNotFoundException as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     #except StateCommentsNotFoundException as e:
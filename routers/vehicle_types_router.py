@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from typing import List
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
@@ -7,7 +7,8 @@ import schemas
 import services
 from dependencies import get_current_user
 from services.database_service import get_db
-from services.vehicle_types_service import create_vehicle_type_service, get_all_vehicle_types_service, get_vehicle_type_service, update_vehicle_type_service, delete_vehicle_type_service
+from services.response_cache_service import cached_response
+from services.vehicle_types_service import create_vehicle_type_service, get_all_vehicle_types_service, get_vehicle_type_service, get_vehicle_type_by_name_service, update_vehicle_type_service, delete_vehicle_type_service
 
 
 router = APIRouter(
@@ -24,7 +25,7 @@ async def create_vehicle_type(
     db: Session = Depends(get_db)
 ):
     # Comprobar si el tipo de vehículo ya existe
-    existing_type = db.query(models.VehicleType).filter(models.VehicleType.type_name == vehicle_type.type_name).first()
+    existing_type = await get_vehicle_type_by_name_service(vehicle_type.type_name, db)
     
     if existing_type:
         raise HTTPException(status_code=409, detail="Vehicle type already exists")
@@ -36,23 +37,29 @@ async def create_vehicle_type(
 
 @router.get("", response_model=List[schemas.VehicleType], summary="Obtener todos los tipos de vehículos")
 async def get_vehicle_types(
+    request: Request,
     skip: int = 0,
     limit: int = 10,
     db: Session = Depends(get_db)
 ):
-    vehicle_types = await get_all_vehicle_types_service(db=db, skip=skip, limit=limit)
-    return vehicle_types
+    return await cached_response(
+        request, "vehicle_types", List[schemas.VehicleType],
+        lambda: get_all_vehicle_types_service(db=db, skip=skip, limit=limit),
+    )
 
 @router.get("/{vehicle_type_id}", response_model=schemas.VehicleType, summary="Obtener un tipo de vehículo por ID")
 async def get_vehicle_type(
+    request: Request,
     vehicle_type_id: int, 
     db: Session = Depends(get_db)
 ):
-    vehicle_type = await get_vehicle_type_service(db=db, vehicle_type_id=vehicle_type_id)
-    if vehicle_type is None:
-        raise HTTPException(status_code=404, detail="Vehicle type does not exist")
+    async def load():
+        vehicle_type = await get_vehicle_type_service(db=db, vehicle_type_id=vehicle_type_id)
+        if vehicle_type is None:
+            raise HTTPException(status_code=404, detail="Vehicle type does not exist")
+        return vehicle_type
 
-    return vehicle_type
+    return await cached_response(request, "vehicle_types", schemas.VehicleType, load)
 
 @router.delete("/{vehicle_type_id}", status_code=204, summary="Eliminar un tipo de vehículo")
 async def delete_vehicle_type(
@@ -74,10 +81,9 @@ async def update_vehicle_type(
     db: Session = Depends(get_db)
 ):
     # Verificar si el nuevo nombre ya existe en otro registro
-    existing_type = db.query(models.VehicleType).filter(
-        models.VehicleType.type_name == vehicle_type_data.type_name,
-        models.VehicleType.id != vehicle_type_id
-    ).first()
+    existing_type = await get_vehicle_type_by_name_service(
+        vehicle_type_data.type_name, db, exclude_id=vehicle_type_id
+    )
     if existing_type:
         raise HTTPException(status_code=409, detail="Vehicle type already exists")
     
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import List, Optional
+from typing import List, Literal, Optional
 from sqlalchemy.orm import Session
 from typing import Union
 from sqlalchemy.exc import IntegrityError
@@ -7,8 +7,9 @@ import models
 import schemas
 import services
 from dependencies import get_current_user
-from services.database_service import get_db
-from services.vehicles_service import create_vehicle_service, get_vehicles_service, update_vehicle_service, delete_vehicle_service, get_vehicle_by_id_service
+from responses import model_response
+from services.database_service import get_db, maybe_await
+from services.vehicles_service import create_vehicle_service, create_vehicles_batch_service, get_vehicles_service, get_vehicles_page_service, update_vehicle_service, delete_vehicle_service, get_vehicle_by_id_service, get_vehicle_by_vin_service
 
 from services.exceptions import (
     VehicleNotFound,
@@ -16,7 +17,8 @@ from services.exceptions import (
     VINAlreadyExists,
     InvalidVIN,
     ColorNotFound,
-    InitialStateNotFound
+    InitialStateNotFound,
+    InvalidCursor
 )
 from constants.exceptions import (
     VEHICLE_MODEL_NOT_FOUND,
@@ -61,9 +63,9 @@ async def create_vehicle(
     except InitialStateNotFound as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     except IntegrityError:
-        db.rollback()
+        await maybe_await(db.rollback())
         # Buscar el vehículo existente por el VIN
-        existing_vehicle = db.query(models.Vehicle).filter(models.Vehicle.vin == vehicle.vin).first()
+        existing_vehicle = await get_vehicle_by_vin_service(db, vehicle.vin)
         if existing_vehicle:
             return {"id": existing_vehicle.id, "created": "false"}  # Indica que el vehículo ya existía
         else:
@@ -73,6 +75,28 @@ async def create_vehicle(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Ocurrió un error inesperado.")
     
 
+@router.post(
+    "/batch",
+    response_model=schemas.VehicleBatchResult,
+    summary="Alta masiva de vehículos",
+    description=(
+        "Da de alta una lista de vehículos (p. ej. la descarga de un camión) en una sola transacción. "
+        "Devuelve el resultado de cada elemento: created, exists o error."
+    ),
+)
+async def create_vehicles_batch(
+    batch: schemas.VehicleBatchCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    try:
+        return await create_vehicles_batch_service(vehicles=batch.vehicles, db=db, user_id=current_user.id)
+    except InitialStateNotFound as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    except VINAlreadyExists as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
 @router.get(
     "/{vehicle_id}",
     response_model=schemas.Vehicle,
@@ -90,19 +114,42 @@ async def read_vehicle(
 
 @router.get(
     "",
-    response_model=List[schemas.Vehicle],
+    response_model=Union[List[schemas.Vehicle], schemas.VehiclePage, List[schemas.VehicleListItem], schemas.VehicleListItemPage],
     summary="Obtener lista de vehículos",
-    description="Recupera una lista de vehículos con filtros opcionales.",
+    description=(
+        "Recupera una lista de vehículos con filtros opcionales. Con pagination=cursor "
+        "devuelve una página con `items` y `next_cursor`, que se envía como `cursor` "
+        "para obtener la página siguiente. vin_match indica cómo se busca el VIN: "
+        "auto (igualdad si tiene 17 caracteres, si no contiene), exact, prefix, suffix o contains. "
+        "Con view=compact cada vehículo se devuelve como VehicleListItem (vin, marca, modelo, "
+        "color, código de estado y urgencia) en lugar del objeto completo."
+    ),
 )
 async def get_vehicles(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1),
     in_progress: bool = None,
     vin: str = None,
+    vin_match: Literal["auto", "exact", "prefix", "suffix", "contains"] = "auto",
+    pagination: Literal["offset", "cursor"] = "offset",
+    cursor: Optional[str] = None,
+    view: Literal["full", "compact"] = "full",
     db: Session = Depends(get_db)
 ):
-    vehicles = await get_vehicles_service(db=db, skip=skip, limit=limit, in_progress=in_progress, vin=vin)
-    return vehicles
+    item_schema = schemas.VehicleListItem if view == "compact" else schemas.Vehicle
+    if pagination == "cursor" or cursor:
+        try:
+            page = await get_vehicles_page_service(
+                db=db, limit=limit, cursor=cursor, in_progress=in_progress, vin=vin, vin_match=vin_match, view=view
+            )
+        except InvalidCursor as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return model_response(type(page), page)
+    vehicles = await get_vehicles_service(
+        db=db, skip=skip, limit=limit, in_progress=in_progress, vin=vin, vin_match=vin_match, view=view
+    )
+    # Los servicios ya devuelven los esquemas validados: se serializan directamente
+    return model_response(List[item_schema], vehicles)
 
 @router.put(
     "/{vehicle_id}",
@@ -130,7 +177,7 @@ async def update_vehicle(
     except InvalidVIN as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except IntegrityError:
-        db.rollback()
+        await maybe_await(db.rollback())
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=VIN_ALREADY_EXISTS)
     except Exception:
         # Handle unexpected errors
@@ -220,6 +220,29 @@ class State(StateBase):
 class StateChangeRequest(BaseModel):
     new_state_id: int
     comment_id: Optional[int] = None
+
+# Máximo de vehículos por petición de cambio de estado masivo
+STATE_CHANGE_BATCH_MAX_SIZE = 500
+
+class StateChangeBatchRequest(StateChangeRequest):
+    vehicle_ids: List[int] = Field(..., min_length=1, max_length=STATE_CHANGE_BATCH_MAX_SIZE)
+
+class StateChangeBatchItemStatus(str, Enum):
+    changed = "changed"
+    error = "error"
+
+class StateChangeBatchItemResult(BaseModel):
+    vehicle_id: int
+    status: StateChangeBatchItemStatus
+    from_state_id: Optional[int] = None
+    history_id: Optional[int] = None
+    error: Optional[str] = None
+
+class StateChangeBatchResult(BaseModel):
+    to_state_id: int
+    changed: int
+    errors: int
+    items: List[StateChangeBatchItemResult]
     
 # endregion
 
@@ -274,6 +297,57 @@ class Vehicle(VehicleBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+class VehiclePage(BaseModel):
+    items: List[Vehicle]
+    next_cursor: Optional[str] = None  # None cuando no hay más páginas
+
+class VehicleListItem(BaseModel):
+    """
+    Vista compacta de un vehículo para los listados (view=compact).
+    """
+    id: int
+    vin: str
+    brand_name: Optional[str] = None
+    model_name: Optional[str] = None
+    color_hex: Optional[str] = None
+    state_code: str
+    is_urgent: bool
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_validator('color_hex')
+    def color_hex_upper(cls, v):
+        # Igual que Color.hex_code en la vista completa
+        return v.upper() if v else v
+
+class VehicleListItemPage(BaseModel):
+    items: List[VehicleListItem]
+    next_cursor: Optional[str] = None
+
+# Máximo de vehículos por petición de alta masiva
+VEHICLE_BATCH_MAX_SIZE = 500
+
+class VehicleBatchCreate(BaseModel):
+    vehicles: List[VehicleCreate] = Field(..., min_length=1, max_length=VEHICLE_BATCH_MAX_SIZE)
+
+class VehicleBatchItemStatus(str, Enum):
+    created = "created"
+    exists = "exists"
+    error = "error"
+
+class VehicleBatchItemResult(BaseModel):
+    index: int  # Posición en la lista recibida
+    vin: str
+    status: VehicleBatchItemStatus
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class VehicleBatchResult(BaseModel):
+    created: int
+    existing: int
+    errors: int
+    items: List[VehicleBatchItemResult]
+
 # endregion
 
 # region Transition definition
@@ -338,7 +412,32 @@ class StateHistory(StateHistoryBase):
 
 
 # region imagen en base64 definition
+class ScanRegion(BaseModel):
+    """
+    Región de interés sugerida por el cliente, en fracciones (0-1) del ancho y alto de la imagen.
+    """
+    x: float = Field(..., ge=0, lt=1)
+    y: float = Field(..., ge=0, lt=1)
+    width: float = Field(..., gt=0, le=1)
+    height: float = Field(..., gt=0, le=1)
+
+    @field_validator('width')
+    def region_fits_horizontally(cls, v, info):
+        if info.data.get('x', 0) + v > 1:
+            raise ValueError("x + width must not exceed 1.")
+        return v
+
+    @field_validator('height')
+    def region_fits_vertically(cls, v, info):
+        if info.data.get('y', 0) + v > 1:
+            raise ValueError("y + height must not exceed 1.")
+        return v
+
+    def as_box(self) -> tuple:
+        return (self.x, self.y, self.width, self.height)
+
 class ImageBase64Request(BaseModel):
     image: str
+    roi: Optional[ScanRegion] = None
 # endregion
 
@@ -0,0 +1,119 @@
+# services/auth_service.py
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+import models as _models
+from services.notification_service import notification_bus
+
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """
+    Identidad del usuario autenticado, desacoplada de la sesión de base de datos
+    para poder guardarla en caché entre peticiones.
+    """
+    id: int
+    username: str
+    role: _models.UserRole
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: _models.User) -> "AuthenticatedUser":
+        return cls(id=user.id, username=user.username, role=user.role, is_active=user.is_active)
+
+
+class UserCache:
+    """
+    Caché LRU acotada con TTL, indexada por id de usuario.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[AuthenticatedUser]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def set(self, user: AuthenticatedUser) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[user.id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+user_cache = UserCache()
+
+
+def configure_user_cache(maxsize: int, ttl: float) -> None:
+    user_cache.maxsize = maxsize
+    user_cache.ttl = ttl
+    user_cache.clear()
+
+
+# region Invalidation on role/active changes
+
+# Tema del bus de notificaciones: el mensaje es el id del usuario
+USER_TOPIC = "user"
+
+
+def _track_user_change(target, value, oldvalue, initiator):
+    # Se avisa tras el commit, a este worker y al resto, para no volver a
+    # cachear el valor antiguo mientras la transacción sigue abierta.
+    session = object_session(target)
+    if target.id is None:
+        return
+    if session is None:
+        user_cache.invalidate(target.id)
+        return
+    notification_bus.publish(session, USER_TOPIC, str(target.id))
+
+
+def invalidate_user(payload: str, cache: Optional[UserCache] = None) -> None:
+    try:
+        user_id = int(payload)
+    except ValueError:
+        return
+    (cache or user_cache).invalidate(user_id)
+
+
+async def _clear_user_cache() -> None:
+    # Al (re)conectar el bus se pueden haber perdido avisos
+    user_cache.clear()
+
+
+notification_bus.subscribe(USER_TOPIC, invalidate_user)
+notification_bus.on_connect(_clear_user_cache)
+
+event.listen(_models.User.role, "set", _track_user_change)
+event.listen(_models.User.is_active, "set", _track_user_change)
+
+# endregion
@@ -0,0 +1,212 @@
+# services/barcode_service.py
+import io
+import os
+import tempfile
+from typing import AsyncIterator, BinaryIO, List, Optional, Sequence, Tuple, Union
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image, ImageOps
+from pyzbar.pyzbar import decode
+from executors import BoundedExecutor
+from services.exceptions import InvalidImage, ImageProcessingError, UploadTooLarge
+from constants.exceptions import HEIC_NOT_SUPPORTED, UPLOAD_TOO_LARGE
+
+load_dotenv()
+
+# Decodificación en un pool de procesos: PIL + pyzbar son CPU intensivos y
+# bloquearían el event loop. SCAN_MAX_PENDING limita las tareas en curso + en cola;
+# por encima se responde 429 con Retry-After.
+SCAN_EXECUTOR = os.getenv("SCAN_EXECUTOR", "process").lower()
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS") or os.cpu_count() or 1)
+SCAN_MAX_PENDING = int(os.getenv("SCAN_MAX_PENDING") or SCAN_WORKERS * 4)
+SCAN_RETRY_AFTER = int(os.getenv("SCAN_RETRY_AFTER", "1"))
+SCAN_START_METHOD = os.getenv("SCAN_START_METHOD", "spawn")
+
+# Tamaño máximo de la imagen subida; por encima se responde 413
+SCAN_MAX_UPLOAD_BYTES = int(os.getenv("SCAN_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+SCAN_CHUNK_SIZE = 64 * 1024
+
+# Lado mayor (px) de cada escala probada antes de la imagen original, de menor a
+# mayor: un código de VIN ocupa poco de la foto y suele leerse ya a baja resolución.
+SCAN_SCALES = tuple(
+    int(size) for size in os.getenv("SCAN_SCALES", "800,1600").split(",") if size.strip()
+)
+
+scan_executor = BoundedExecutor(
+    "scan", SCAN_WORKERS, SCAN_MAX_PENDING, kind=SCAN_EXECUTOR, start_method=SCAN_START_METHOD
+)
+
+
+def _open_heic(source: Union[bytes, str, BinaryIO]) -> Image.Image:
+    try:
+        import pyheif
+    except ImportError:
+        raise ImageProcessingError(HEIC_NOT_SUPPORTED)
+    try:
+        heif_file = pyheif.read_heif(source)
+        return Image.frombytes(
+            heif_file.mode,
+            heif_file.size,
+            heif_file.data,
+            "raw",
+            heif_file.mode,
+            heif_file.stride,
+        )
+    except Exception as e:
+        raise ImageProcessingError(f"Error processing HEIC image: {str(e)}")
+
+
+def _open_image(source: Union[bytes, str, BinaryIO], content_type: Optional[str] = None) -> Image.Image:
+    # source son los bytes de la imagen, la ruta del fichero temporal de la subida
+    # o el propio fichero (solo con el pool de hilos)
+    if content_type == "image/heic":
+        return _open_heic(source)
+    try:
+        image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+        image.load()
+    except Exception as e:
+        # No se expone el fichero temporal en el mensaje
+        message = str(e) if isinstance(source, bytes) else str(e).replace(f" {source!r}", "")
+        raise InvalidImage(f"Invalid image file: {message}")
+    return image
+
+
+def _crop_region(image: Image.Image, roi: Tuple[float, float, float, float]) -> Image.Image:
+    x, y, width, height = roi
+    left, top = int(x * image.width), int(y * image.height)
+    right = max(left + 1, int((x + width) * image.width))
+    bottom = max(top + 1, int((y + height) * image.height))
+    return image.crop((left, top, right, bottom))
+
+
+def _downscale(image: Image.Image, max_side: int) -> Image.Image:
+    ratio = max_side / max(image.width, image.height)
+    size = (max(1, round(image.width * ratio)), max(1, round(image.height * ratio)))
+    return image.resize(size, Image.BILINEAR)
+
+
+def _candidates(image: Image.Image, scales: Sequence[int]):
+    # Escalas menores que la imagen, de menor a mayor, y por último la original
+    for max_side in sorted(scales):
+        if max_side < max(image.width, image.height):
+            yield str(max_side), _downscale(image, max_side)
+    yield "original", image
+
+
+def scan_pipeline(
+    image: Image.Image,
+    roi: Optional[Tuple[float, float, float, float]] = None,
+    scales: Sequence[int] = SCAN_SCALES,
+) -> Tuple[list, Optional[str]]:
+    """
+    Preprocesado previo a pyzbar: orientación EXIF, escala de grises y búsqueda
+    multiescala (primero la región sugerida, si la hay, y después la imagen
+    completa) que termina en el primer intento con resultados.
+    Devuelve los códigos y la etapa que los encontró (p. ej. "roi@800").
+    """
+    image = ImageOps.exif_transpose(image).convert("L")
+    regions = [("roi", _crop_region(image, roi))] if roi else []
+    regions.append(("full", image))
+    for region_name, region in regions:
+        for scale_name, candidate in _candidates(region, scales):
+            decoded_objects = decode(candidate)
+            if decoded_objects:
+                return decoded_objects, f"{region_name}@{scale_name}"
+    return [], None
+
+
+def decode_image(
+    source: Union[bytes, str, BinaryIO],
+    content_type: Optional[str] = None,
+    roi: Optional[Tuple[float, float, float, float]] = None,
+) -> List[dict]:
+    """
+    Abre la imagen (bytes, ruta o fichero) y devuelve los códigos QR/de barras
+    detectados. Se ejecuta dentro del pool: con un pool de procesos solo recibe y
+    devuelve tipos serializables (bytes o ruta, nunca el fichero).
+    """
+    image = _open_image(source, content_type)
+    decoded_objects, _stage = scan_pipeline(image, roi)
+    result_data = []
+    for obj in decoded_objects:
+        code_type = "QR Code" if obj.type == "QRCODE" else obj.type
+        result_data.append({
+            "type": code_type,
+            "data": obj.data.decode("utf-8")
+        })
+    return result_data
+
+
+async def scan_image_service(
+    contents: bytes,
+    content_type: Optional[str] = None,
+    roi: Optional[Tuple[float, float, float, float]] = None,
+) -> List[dict]:
+    """
+    Decodifica la imagen en el pool de escaneo. Lanza ExecutorSaturated si está lleno.
+    """
+    return await scan_executor.run(decode_image, contents, content_type, roi)
+
+
+async def scan_file_service(
+    file: BinaryIO,
+    content_type: Optional[str] = None,
+    roi: Optional[Tuple[float, float, float, float]] = None,
+) -> List[dict]:
+    """
+    Escanea un fichero ya recibido (UploadFile.file de una subida multipart) sin
+    copiarlo a otro. Con el pool de hilos el decodificador lee el propio fichero;
+    a un pool de procesos no se le puede pasar, así que se lee en el threadpool y
+    se envían los bytes.
+    """
+    if scan_executor.kind == "thread":
+        return await scan_executor.run(decode_image, file, content_type, roi)
+    contents = await run_in_threadpool(file.read)
+    return await scan_executor.run(decode_image, contents, content_type, roi)
+
+
+async def spool_upload(chunks: AsyncIterator[bytes], max_bytes: Optional[int] = None) -> str:
+    """
+    Vuelca la subida por bloques a un fichero temporal con nombre y devuelve su
+    ruta: el pool de escaneo abre el fichero directamente, sin copiar la imagen
+    en memoria ni serializarla hacia el proceso. Lanza UploadTooLarge al superar max_bytes.
+    """
+    max_bytes = SCAN_MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    spool = await run_in_threadpool(tempfile.NamedTemporaryFile, prefix="scan_", delete=False)
+    try:
+        size = 0
+        buffer = bytearray()
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(UPLOAD_TOO_LARGE)
+            # Se escribe en el threadpool, en bloques de SCAN_CHUNK_SIZE
+            buffer += chunk
+            if len(buffer) >= SCAN_CHUNK_SIZE:
+                await run_in_threadpool(spool.write, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(spool.write, bytes(buffer))
+        await run_in_threadpool(spool.close)
+    except BaseException:
+        # Sin await: también debe ejecutarse si la petición se cancela
+        spool.close()
+        os.unlink(spool.name)
+        raise
+    return spool.name
+
+
+async def scan_upload_service(
+    chunks: AsyncIterator[bytes],
+    content_type: Optional[str] = None,
+    roi: Optional[Tuple[float, float, float, float]] = None,
+) -> List[dict]:
+    """
+    Escanea una subida en streaming: se guarda en disco con límite de tamaño y
+    el pool decodifica desde el fichero.
+    """
+    path = await spool_upload(chunks)
+    try:
+        return await scan_executor.run(decode_image, path, content_type, roi)
+    finally:
+        os.unlink(path)
@@ -1,9 +1,12 @@
 from typing import List
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 import models as _models
 import schemas as _schemas
 from datetime import datetime, timezone
 from fastapi import HTTPException, status
+from responses import validate_list
+from services.database_service import maybe_await
 
 
 
@@ -16,25 +19,33 @@ async def create_new_brand_service(
         updated_at=datetime.now(timezone.utc)
         )
     db.add(brand_model)
-    db.commit()
-    db.refresh(brand_model)
+    await maybe_await(db.commit())
+    await maybe_await(db.refresh(brand_model))
     return _schemas.Brand.model_validate(brand_model)
 
 async def get_all_brands_service(db: "Session", skip: int = 0, limit: int = 10) -> List[_schemas.Brand]:
-    brands = db.query(_models.Brand).offset(skip).limit(limit).all()
-    return list(map(_schemas.Brand.model_validate, brands))
+    result = await maybe_await(db.execute(select(_models.Brand).offset(skip).limit(limit)))
+    brands = result.scalars().all()
+    return validate_list(_schemas.Brand, brands)
 
 async def get_brand_service(brand_id: int, db: "Session") -> _schemas.Brand:
-    brand = db.query(_models.Brand).filter(_models.Brand.id == brand_id).first()
+    brand = await maybe_await(db.get(_models.Brand, brand_id))
     if brand:
         return _schemas.Brand.model_validate(brand)
     return None
 
+async def get_brand_by_name_service(name: str, db: "Session", exclude_id: int = None):
+    query = select(_models.Brand).where(_models.Brand.name == name)
+    if exclude_id is not None:
+        query = query.where(_models.Brand.id != exclude_id)
+    result = await maybe_await(db.execute(query.limit(1)))
+    return result.scalars().first()
+
 async def delete_brand_service(brand_id: int, db: "Session") -> bool:
-    brand = db.query(_models.Brand).filter(_models.Brand.id == brand_id).first()
+    brand = await maybe_await(db.get(_models.Brand, brand_id))
     if brand:
-        db.delete(brand)
-        db.commit()
+        await maybe_await(db.delete(brand))
+        await maybe_await(db.commit())
         return True
     return False
 
@@ -51,22 +62,18 @@ async def update_brand_service(
         )
     
     # Verificar si la marca existe
-    brand = db.query(_models.Brand).filter(_models.Brand.id == brand_id).first()
+    brand = await maybe_await(db.get(_models.Brand, brand_id))
     if not brand:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Brand does not exist")
     
     # Verificar si el nuevo nombre ya existe en otra marca
-    existing_brand = db.query(_models.Brand).filter(
-        _models.Brand.name == brand_data.name.strip(),
-        _models.Brand.id != brand_id
-    ).first()
+    existing_brand = await get_brand_by_name_service(brand_data.name.strip(), db, exclude_id=brand_id)
     if existing_brand:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Brand name already in use")
     
     # Actualizar el nombre de la marca
     brand.name = brand_data.name.strip()
-    db.commit()
-    db.refresh(brand)
+    await maybe_await(db.commit())
+    await maybe_await(db.refresh(brand))
     
     return _schemas.Brand.model_validate(brand)
-
@@ -1,10 +1,13 @@
 from typing import List
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 import models as _models
 import schemas as _schemas
 from fastapi import HTTPException, status
 from datetime import datetime, timezone
 from sqlalchemy.exc import IntegrityError
+from responses import validate_list
+from services.database_service import maybe_await
 
 
 async def add_color(color: _schemas.ColorCreate, db: "Session") -> _schemas.Color:
@@ -17,10 +20,10 @@ async def add_color(color: _schemas.ColorCreate, db: "Session") -> _schemas.Colo
 
     try:
         db.add(color_model)
-        db.commit()
-        db.refresh(color_model)
+        await maybe_await(db.commit())
+        await maybe_await(db.refresh(color_model))
     except IntegrityError as e:
-        db.rollback()
+        await maybe_await(db.rollback())
         # Inspeccionar el objeto de excepción para determinar qué restricción falló
         if hasattr(e.orig, 'args') and len(e.orig.args) > 0:
             error_message = e.orig.args[0]
@@ -43,13 +46,13 @@ async def add_color(color: _schemas.ColorCreate, db: "Session") -> _schemas.Colo
     return _schemas.Color.model_validate(color_model)
 
 async def get_color(db: "Session", color_id: int) -> _schemas.Color:
-    color = db.query(_models.Color).filter(_models.Color.id == color_id).first()
+    color = await maybe_await(db.get(_models.Color, color_id))
     if not color:
         raise HTTPException(status_code=404, detail="Color not found")
     return _schemas.Color.model_validate(color)
 
 async def update_color(db: Session, color_id: int, color_data: _schemas.ColorCreate) -> _schemas.Color:
-    db_color = db.query(_models.Color).filter(_models.Color.id == color_id).first()
+    db_color = await maybe_await(db.get(_models.Color, color_id))
     if not db_color:
         raise HTTPException(status_code=404, detail="Color not found.")
 
@@ -59,10 +62,10 @@ async def update_color(db: Session, color_id: int, color_data: _schemas.ColorCre
     db_color.updated_at = datetime.now(timezone.utc)
 
     try:
-        db.commit()
-        db.refresh(db_color)
+        await maybe_await(db.commit())
+        await maybe_await(db.refresh(db_color))
     except IntegrityError as e:
-        db.rollback()
+        await maybe_await(db.rollback())
         if hasattr(e.orig, 'args') and len(e.orig.args) > 0:
             error_message = e.orig.args[0]
             if 'uq_colors_name' in error_message:
@@ -83,23 +86,27 @@ async def update_color(db: Session, color_id: int, color_data: _schemas.ColorCre
     return _schemas.Color.model_validate(db_color)
 
 async def delete_color(db: "Session", color_id: int) -> bool:
-    db_color = db.query(_models.Color).filter(_models.Color.id == color_id).first()
+    db_color = await maybe_await(db.get(_models.Color, color_id))
     if not db_color:
         raise HTTPException(status_code=404, detail="Color not found")
 
-    db.delete(db_color)
-    db.commit()
+    await maybe_await(db.delete(db_color))
+    await maybe_await(db.commit())
     return True
 
 async def fetch_all_colors(db: "Session", skip: int = 0, limit: int = 10) -> List[_models.Color]:
-    colors = db.query(_models.Color).offset(skip).limit(limit).all()
-    return list(map(_schemas.Color.model_validate, colors))
+    result = await maybe_await(db.execute(select(_models.Color).offset(skip).limit(limit)))
+    colors = result.scalars().all()
+    return validate_list(_schemas.Color, colors)
 
 async def get_color_id_by_name_service(db: Session, color_name: str) -> int:
-    color = db.query(_models.Color).filter(_models.Color.name == color_name).first()
-    if not color:
+    result = await maybe_await(db.execute(
+        select(_models.Color.id).where(_models.Color.name == color_name).limit(1)
+    ))
+    color_id = result.scalar()
+    if color_id is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Color not found")
-    return color.id
+    return color_id
 
 
 
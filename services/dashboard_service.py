@@ -1,54 +1,66 @@
 # dashboard_service.py
-from sqlalchemy import func, Integer
+from datetime import date
 from sqlalchemy.orm import Session
-import models as _models
-from typing import List, Dict
+from typing import List, Dict, Optional
+from services.state_machine_service import get_state_machine_service
+from services.vehicle_counters_service import get_state_counts_service, get_registrations_by_day_service
 
 
 async def count_vehicles_service(db: Session) -> int:
-    return db.query(_models.Vehicle).count()
+    # Suma de los contadores por estado (una fila por estado, no un COUNT(*) de vehicles)
+    counts = await get_state_counts_service(db)
+    return sum(counts.values())
 
 
 async def get_vehicles_with_non_final_status_count_service(db: Session):
     try:
-        count = db.query(_models.Vehicle)\
-            .join(_models.State, _models.Vehicle.status_id == _models.State.id)\
-            .filter(_models.State.is_final == False)\
-            .count()
-        return count
+        counts = await get_state_counts_service(db)
+        machine = await get_state_machine_service(db)
+        return sum(count for state_id, count in counts.items() if state_id not in machine.final_state_ids)
     except Exception as e:
         # Manejo de excepciones específicas si es necesario
         raise e
-    
 
 
+async def get_vehicle_counts_by_state_service(db: Session) -> List[Dict[str, int]]:
+    counts = await get_state_counts_service(db)
+    machine = await get_state_machine_service(db)
+    return [
+        {"state_id": state_id, "count": counts.get(state_id, 0)}
+        for state_id in machine.states
+    ]
 
 
+def _registration_bucket(day: date, granularity: str) -> Dict[str, int]:
+    if granularity == "day":
+        return {'year': day.year, 'month': day.month, 'day': day.day}
+    if granularity == "week":
+        iso = day.isocalendar()
+        return {'year': iso.year, 'week': iso.week}
+    return {'year': day.year, 'month': day.month}
 
-async def get_vehicle_registrations_by_date_service(db: Session) -> List[Dict[str, int]]:
+
+async def get_vehicle_registrations_by_date_service(
+    db: Session,
+    granularity: str = "month",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> List[Dict[str, int]]:
     try:
-        # Definir las expresiones para extraer año y mes
-        year = func.extract('year', _models.Vehicle.created_at).cast(Integer).label('year')
-        month = func.extract('month', _models.Vehicle.created_at).cast(Integer).label('month')
-        
-        # Realizar la consulta agrupando por año y mes
-        registrations = (
-            db.query(
-                year,
-                month,
-                func.count(_models.Vehicle.id).label('count')
-            )
-            .group_by(year, month)
-            .order_by(year, month)
-            .all()
-        )
-        
+        # Se leen los totales diarios del resumen y se agrupan por día, semana (ISO) o mes
+        rows = await get_registrations_by_day_service(db, date_from=date_from, date_to=date_to)
+
+        buckets = {}
+        for day, count in rows:
+            key = tuple(_registration_bucket(day, granularity).items())
+            buckets[key] = buckets.get(key, 0) + count
+
         # Convertir el resultado en una lista de diccionarios con el formato deseado
         result = [
-            {'year': r.year, 'month': r.month, 'value': r.count}
-            for r in registrations
+            {**dict(key), 'value': count}
+            for key, count in buckets.items()
         ]
-        
+
         return result
     except Exception as e:
         # Aquí puedes agregar más lógica de manejo de errores si es necesario
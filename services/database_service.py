@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING, List
+from typing import TYPE_CHECKING, Any, List
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 import database as _database
@@ -8,6 +8,8 @@ from fastapi import HTTPException, status
 from datetime import datetime
 from sqlalchemy.orm import joinedload
 import datetime as _dt
+import inspect
+from contextlib import asynccontextmanager
 from typing import Optional
 
 if TYPE_CHECKING:
@@ -16,9 +18,36 @@ if TYPE_CHECKING:
 def _add_tables():
     return _database.Base.metadata.create_all(bind=_database.engine)
 
-def get_db():
-    db = _database.SessionLocal()
-    try:
+async def get_db():
+    """
+    Dependencia de sesión. Según DB_MODE entrega una AsyncSession (modo async)
+    o una Session síncrona (modo sync).
+    """
+    async with session_scope() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+@asynccontextmanager
+async def session_scope():
+    """
+    Sesión fuera de una petición (arranque, tareas en segundo plano), con el
+    mismo tipo de sesión que get_db.
+    """
+    if _database.ASYNC_DB:
+        async with _database.AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = _database.SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+async def maybe_await(result: Any) -> Any:
+    """
+    Permite que los servicios funcionen con Session y AsyncSession: los métodos
+    de AsyncSession (execute, commit, refresh, delete...) devuelven corrutinas,
+    los de Session devuelven el resultado directamente.
+    """
+    if inspect.isawaitable(result):
+        return await result
+    return result
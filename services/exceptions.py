@@ -21,6 +21,18 @@ class InvalidVIN(Exception):
 class InitialStateNotFound(Exception):
     pass
 
+class InvalidCursor(Exception):
+    pass
+
+class InvalidImage(Exception):
+    pass
+
+class ImageProcessingError(Exception):
+    pass
+
+class UploadTooLarge(Exception):
+    pass
+
 
 
 
@@ -29,4 +41,13 @@ class StateNotFoundException(Exception):
     pass
 
 class StateCommentsNotFoundException(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class StateChangeConflict(Exception):
+    pass
+
+class RefreshTokenReused(Exception):
+    pass
+
+class UnsupportedDatabaseDialect(Exception):
+    pass
@@ -1,5 +1,6 @@
 # services.py
 from typing import List
+from sqlalchemy import select
 from sqlalchemy.orm import Session, joinedload
 import models as _models
 import schemas as _schemas
@@ -11,6 +12,37 @@ from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 import models as _models
 import schemas as _schemas
+from responses import validate_list
+from services.database_service import maybe_await
+
+
+def _select_model_with_relations():
+    return select(_models.Model).options(
+        joinedload(_models.Model.brand),
+        joinedload(_models.Model.vehicle_type)
+    )
+
+async def _reload_model(model_id: int, db: "Session") -> _models.Model:
+    # Recarga el modelo con sus relaciones (necesario con AsyncSession, sin lazy loading)
+    result = await maybe_await(db.execute(
+        _select_model_with_relations()
+        .where(_models.Model.id == model_id)
+        .execution_options(populate_existing=True)
+    ))
+    return result.scalars().first()
+
+async def get_existing_model_service(
+    name: str, brand_id: int, type_id: int, db: "Session", exclude_id: int = None
+):
+    query = select(_models.Model).where(
+        _models.Model.name == name,
+        _models.Model.brand_id == brand_id,
+        _models.Model.type_id == type_id
+    )
+    if exclude_id is not None:
+        query = query.where(_models.Model.id != exclude_id)
+    result = await maybe_await(db.execute(query.limit(1)))
+    return result.scalars().first()
 
 
 async def create_model_service(
@@ -24,7 +56,7 @@ async def create_model_service(
         )
     
     # Verificar si la marca existe
-    brand = db.query(_models.Brand).filter(_models.Brand.id == model.brand_id).first()
+    brand = await maybe_await(db.get(_models.Brand, model.brand_id))
     if not brand:
         raise HTTPException(
             status_code=404,
@@ -32,7 +64,7 @@ async def create_model_service(
         )
     
     # Verificar si el tipo de vehículo existe
-    vehicle_type = db.query(_models.VehicleType).filter(_models.VehicleType.id == model.type_id).first()
+    vehicle_type = await maybe_await(db.get(_models.VehicleType, model.type_id))
     if not vehicle_type:
         raise HTTPException(
             status_code=404,
@@ -40,11 +72,9 @@ async def create_model_service(
         )
     
     # Verificar si el modelo ya existe para la marca y tipo especificados
-    existing_model = db.query(_models.Model).filter(
-        _models.Model.name == model.name,
-        _models.Model.brand_id == model.brand_id,
-        _models.Model.type_id == model.type_id
-    ).first()
+    existing_model = await get_existing_model_service(
+        model.name, model.brand_id, model.type_id, db
+    )
     
     if existing_model:
         raise HTTPException(
@@ -62,31 +92,30 @@ async def create_model_service(
     )
     
     db.add(model_obj)
-    db.commit()
-    db.refresh(model_obj)
+    await maybe_await(db.commit())
     
     # Cargar relaciones para retornar el modelo completo
-    db.refresh(model_obj, attribute_names=["brand", "vehicle_type"])
+    model_obj = await _reload_model(model_obj.id, db)
     
     # Convertir el objeto ORM a un schema de Pydantic utilizando Pydantic v2
     return _schemas.Model.model_validate(model_obj)
 
 async def get_all_models_service(db: "Session", skip: int = 0, limit: int = 10) -> List[_schemas.Model]:
-    models = db.query(_models.Model).options(
-        joinedload(_models.Model.brand),
-        joinedload(_models.Model.vehicle_type)
-    ).offset(skip).limit(limit).all()
-    return list(map(_schemas.Model.model_validate, models))
+    result = await maybe_await(db.execute(
+        _select_model_with_relations().offset(skip).limit(limit)
+    ))
+    models = result.scalars().all()
+    return validate_list(_schemas.Model, models)
 
 async def get_model_service(model_id: int, db: "Session") -> _schemas.Model:
     # Validar que model_id sea un entero positivo
     if not isinstance(model_id, int) or model_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid model_id")
     
-    model = db.query(_models.Model).options(
-        joinedload(_models.Model.brand),
-        joinedload(_models.Model.vehicle_type)
-    ).filter(_models.Model.id == model_id).first()
+    result = await maybe_await(db.execute(
+        _select_model_with_relations().where(_models.Model.id == model_id)
+    ))
+    model = result.scalars().first()
     if model:
         return _schemas.Model.model_validate(model)
     return None
@@ -96,10 +125,10 @@ async def delete_model_service(model_id: int, db: "Session") -> bool:
     if not isinstance(model_id, int) or model_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid model_id")
     
-    model = db.query(_models.Model).filter(_models.Model.id == model_id).first()
+    model = await maybe_await(db.get(_models.Model, model_id))
     if model:
-        db.delete(model)
-        db.commit()
+        await maybe_await(db.delete(model))
+        await maybe_await(db.commit())
         return True
     return False
 
@@ -120,28 +149,25 @@ async def update_model_service(model_id: int, model: _schemas.ModelCreate, db: "
     if not isinstance(model.type_id, int) or model.type_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid type_id")
     
-    existing_model = db.query(_models.Model).filter(_models.Model.id == model_id).first()
+    existing_model = await maybe_await(db.get(_models.Model, model_id))
     
     if not existing_model:
         raise HTTPException(status_code=404, detail="Model not found")
     
     # Verificar si la nueva marca existe
-    brand = db.query(_models.Brand).filter(_models.Brand.id == model.brand_id).first()
+    brand = await maybe_await(db.get(_models.Brand, model.brand_id))
     if not brand:
         raise HTTPException(status_code=404, detail=f"Brand with ID {model.brand_id} does not exist.")
     
     # Verificar si el nuevo tipo de vehículo existe
-    vehicle_type = db.query(_models.VehicleType).filter(_models.VehicleType.id == model.type_id).first()
+    vehicle_type = await maybe_await(db.get(_models.VehicleType, model.type_id))
     if not vehicle_type:
         raise HTTPException(status_code=404, detail=f"Vehicle type with ID {model.type_id} does not exist.")
     
     # Verificar si otro modelo con el mismo nombre, marca y tipo ya existe
-    duplicate_model = db.query(_models.Model).filter(
-        _models.Model.name == model.name.strip(),
-        _models.Model.brand_id == model.brand_id,
-        _models.Model.type_id == model.type_id,
-        _models.Model.id != model_id
-    ).first()
+    duplicate_model = await get_existing_model_service(
+        model.name.strip(), model.brand_id, model.type_id, db, exclude_id=model_id
+    )
     
     if duplicate_model:
         raise HTTPException(status_code=409, detail="Another model with the same name, brand, and type already exists")
@@ -152,15 +178,18 @@ async def update_model_service(model_id: int, model: _schemas.ModelCreate, db: "
     existing_model.type_id = model.type_id
     existing_model.updated_at = datetime.now(timezone.utc)
     
-    db.commit()
-    db.refresh(existing_model)
+    await maybe_await(db.commit())
+    existing_model = await _reload_model(model_id, db)
     return _schemas.Model.model_validate(existing_model)
 
 async def get_model_id_by_name_service(db: Session, model_name: str) -> int:
-    model = db.query(_models.Model).filter(_models.Model.name == model_name).first()
-    if not model:
+    result = await maybe_await(db.execute(
+        select(_models.Model.id).where(_models.Model.name == model_name).limit(1)
+    ))
+    model_id = result.scalar()
+    if model_id is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Model not found")
-    return model.id
+    return model_id
 
 
 
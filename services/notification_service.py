@@ -0,0 +1,225 @@
+# services/notification_service.py
+import asyncio
+import logging
+import os
+import uuid
+import weakref
+from typing import Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+import database as _database
+
+# Avisos entre workers (invalidaciones de caché, revocaciones...):
+# - local: solo llegan al propio proceso (un único worker, desarrollo, pruebas).
+# - postgres: pg_notify en la transacción que hace el cambio + LISTEN en cada worker.
+NOTIFICATION_BACKEND = os.getenv("NOTIFICATION_BACKEND", "local").lower()
+NOTIFICATION_CHANNEL = os.getenv("NOTIFICATION_CHANNEL", "api_notifications")
+# Segundos de espera antes de reconectar el LISTEN tras perder la conexión
+NOTIFICATION_RECONNECT_DELAY = float(os.getenv("NOTIFICATION_RECONNECT_DELAY", "5"))
+
+_PENDING_MESSAGES_KEY = "notifications"
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationBus:
+    """
+    Reparte mensajes (tema + texto) a los manejadores suscritos en todos los
+    workers. Un mensaje publicado en una sesión solo se entrega si su transacción
+    hace commit: en este worker justo después del commit y en el resto a través
+    del backend.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        # Identifica al worker para no procesar dos veces sus propios mensajes; se
+        # renueva en start() porque con preload_app el bus se crea antes del fork
+        self.origin = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Callable[[str], None]]] = {}
+        self._on_connect: List[Callable[[], Awaitable[None]]] = []
+        backend.attach(self)
+
+    def subscribe(self, topic: str, handler: Callable[[str], None]) -> None:
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def on_connect(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """
+        `callback` se ejecuta al arrancar el bus y cada vez que el backend
+        reconecta: los mensajes enviados mientras estaba desconectado se han perdido.
+        """
+        self._on_connect.append(callback)
+
+    def publish(self, session: Session, topic: str, payload: str) -> None:
+        # Un dict conserva el orden y descarta los mensajes repetidos
+        session.info.setdefault(_PENDING_MESSAGES_KEY, {})[f"{self.origin} {topic} {payload}"] = None
+
+    def dispatch(self, topic: str, payload: str) -> None:
+        for handler in self._handlers.get(topic, ()):
+            handler(payload)
+
+    def receive(self, message: str) -> None:
+        try:
+            origin, topic, payload = message.split(" ", 2)
+        except ValueError:
+            return
+        if origin != self.origin:
+            self.dispatch(topic, payload)
+
+    async def connected(self) -> None:
+        for callback in self._on_connect:
+            await callback()
+
+    async def start(self) -> None:
+        self.origin = uuid.uuid4().hex
+        await self.backend.start()
+        # Sin conexión que se pueda perder, los manejadores se ejecutan una vez aquí
+        if not self.backend.reconnects:
+            await self.connected()
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+
+
+class LocalNotificationBackend:
+    """
+    Sin comunicación entre procesos: tras el commit, el mensaje se entrega a los
+    demás buses del mismo proceso.
+    """
+    transactional = False
+    reconnects = False
+
+    def __init__(self):
+        self._buses = weakref.WeakSet()
+
+    def attach(self, bus: NotificationBus) -> None:
+        self._buses.add(bus)
+
+    def send(self, session: Session, messages: List[str]) -> None:
+        pass
+
+    def sent(self, messages: List[str]) -> None:
+        for bus in list(self._buses):
+            for message in messages:
+                bus.receive(message)
+
+    async def start(self) -> None:
+        # Con varios workers, una revocación o una invalidación solo se aplicaría en uno
+        if _database.WEB_CONCURRENCY > 1:
+            logger.warning(
+                "NOTIFICATION_BACKEND=local con WEB_CONCURRENCY=%d: los avisos no llegan "
+                "al resto de workers; usa NOTIFICATION_BACKEND=postgres",
+                _database.WEB_CONCURRENCY,
+            )
+
+    async def stop(self) -> None:
+        pass
+
+
+class PostgresNotificationBackend:
+    """
+    Los mensajes se envían con pg_notify dentro de la transacción (PostgreSQL solo
+    los entrega si hace commit). Cada worker mantiene una conexión asyncpg con
+    LISTEN y reconecta si se pierde.
+    """
+    transactional = True
+    reconnects = True
+
+    def __init__(self, dsn: str, channel: str = NOTIFICATION_CHANNEL):
+        self.dsn = dsn
+        self.channel = channel
+        self._bus: Optional[NotificationBus] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def attach(self, bus: NotificationBus) -> None:
+        self._bus = bus
+
+    def send(self, session: Session, messages: List[str]) -> None:
+        for message in messages:
+            session.execute(select(func.pg_notify(self.channel, message)))
+
+    def sent(self, messages: List[str]) -> None:
+        pass
+
+    def _on_notification(self, connection, pid, channel, payload: str) -> None:
+        self._bus.receive(payload)
+
+    async def _listen(self) -> None:
+        import asyncpg
+
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _connection: closed.set())
+                # Primero LISTEN y después la recarga: no se pierde ningún mensaje intermedio
+                await connection.add_listener(self.channel, self._on_notification)
+                await self._bus.connected()
+                await closed.wait()
+            except asyncio.CancelledError:
+                raise
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                pass
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(NOTIFICATION_RECONNECT_DELAY)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def _listen_dsn() -> str:
+    # asyncpg acepta la URL de PostgreSQL sin el sufijo del driver de SQLAlchemy
+    url = make_url(_database.DATABASE_URL).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+def create_notification_backend(name: str):
+    if name == "local":
+        return LocalNotificationBackend()
+    if name == "postgres":
+        return PostgresNotificationBackend(_listen_dsn())
+    raise ValueError(f"Backend de notificaciones no soportado: {name}")
+
+
+notification_bus = NotificationBus(create_notification_backend(NOTIFICATION_BACKEND))
+
+
+# region Delivery on commit
+
+@event.listens_for(Session, "before_commit")
+def _send_notifications(session):
+    if not notification_bus.backend.transactional:
+        return
+    # Los cambios sin volcar pueden publicar mensajes al hacer flush
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    messages = session.info.get(_PENDING_MESSAGES_KEY)
+    if messages:
+        notification_bus.backend.send(session, list(messages))
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_notifications(session):
+    messages = session.info.pop(_PENDING_MESSAGES_KEY, None)
+    if not messages:
+        return
+    for message in messages:
+        _origin, topic, payload = message.split(" ", 2)
+        notification_bus.dispatch(topic, payload)
+    notification_bus.backend.sent(list(messages))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_notifications(session):
+    session.info.pop(_PENDING_MESSAGES_KEY, None)
+
+# endregion
@@ -0,0 +1,71 @@
+# services/password_service.py
+import os
+from functools import lru_cache
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+from passlib.context import CryptContext
+from executors import BoundedExecutor
+
+load_dotenv()
+
+# Coste de bcrypt (log2 de las iteraciones). Si se cambia, cada hash con otro
+# coste se recalcula en el siguiente login correcto de su usuario.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# bcrypt consume ~250 ms de CPU por hash: se ejecuta en un pool propio y acotado
+# para que un pico de logins no ocupe el threadpool compartido de Starlette.
+# PASSWORD_HASH_MAX_PENDING limita las tareas en curso + en cola; por encima se
+# responde 503 con Retry-After.
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "process").lower()
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS") or os.cpu_count() or 1)
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING") or PASSWORD_HASH_WORKERS * 8)
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "1"))
+PASSWORD_HASH_START_METHOD = os.getenv("PASSWORD_HASH_START_METHOD", "spawn")
+
+hash_executor = BoundedExecutor(
+    "password_hash",
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_MAX_PENDING,
+    kind=PASSWORD_HASH_EXECUTOR,
+    start_method=PASSWORD_HASH_START_METHOD,
+)
+
+
+@lru_cache(maxsize=None)
+def password_context(rounds: int = BCRYPT_ROUNDS) -> CryptContext:
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+
+# Las dos funciones siguientes se ejecutan en el pool: reciben el coste como
+# argumento para no depender de la configuración del proceso hijo.
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    return password_context(rounds).hash(password)
+
+
+def verify_and_update_password(
+    password: str, hashed_password: str, rounds: int = BCRYPT_ROUNDS
+) -> Tuple[bool, Optional[str]]:
+    """
+    Devuelve (válida, nuevo_hash). nuevo_hash solo se informa si la contraseña es
+    válida y el hash guardado usa otro coste o esquema.
+    """
+    try:
+        return password_context(rounds).verify_and_update(password, hashed_password)
+    except (TypeError, ValueError):
+        # Hash vacío o con un formato no reconocido
+        return False, None
+
+
+async def hash_password_service(password: str) -> str:
+    """
+    Lanza ExecutorSaturated si el pool de hashing está lleno.
+    """
+    return await hash_executor.run(hash_password, password, BCRYPT_ROUNDS)
+
+
+async def verify_password_service(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Lanza ExecutorSaturated si el pool de hashing está lleno.
+    """
+    return await hash_executor.run(verify_and_update_password, password, hashed_password, BCRYPT_ROUNDS)
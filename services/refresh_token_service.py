@@ -0,0 +1,158 @@
+# services/refresh_token_service.py
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+import models as _models
+from services.database_service import maybe_await, session_scope
+from services.exceptions import RefreshTokenReused
+from services.token_revocation_service import purge_revoked_access_tokens_service
+from constants.exceptions import REFRESH_TOKEN_REUSED
+from utils import create_refresh_token, REFRESH_TOKEN_EXPIRE_DAYS
+
+# Cada cuántos segundos se purgan los refresh tokens caducados o revocados (0 = nunca)
+REFRESH_TOKEN_PURGE_INTERVAL = float(os.getenv("REFRESH_TOKEN_PURGE_INTERVAL", "3600"))
+# Filas borradas por sentencia, para no bloquear la tabla con un DELETE enorme
+REFRESH_TOKEN_PURGE_BATCH_SIZE = int(os.getenv("REFRESH_TOKEN_PURGE_BATCH_SIZE", "1000"))
+# Segundos que se conserva un token revocado antes de purgarlo
+REFRESH_TOKEN_REVOKED_RETENTION = float(os.getenv("REFRESH_TOKEN_REVOKED_RETENTION", "86400"))
+
+_RefreshToken = _models.RefreshToken
+
+
+async def issue_refresh_token_service(db: Session, user: _models.User, jti: Optional[str] = None) -> str:
+    """
+    Firma un refresh token nuevo y registra su jti. No hace commit.
+    """
+    jti = jti or str(uuid.uuid4())
+    token = create_refresh_token(data={"sub": user.username, "jti": jti})
+    db.add(_RefreshToken(
+        jti=jti,
+        user_id=user.id,
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+
+async def get_active_refresh_token_service(db: Session, jti: str) -> Optional[_models.RefreshToken]:
+    """
+    Refresh token vigente (no revocado ni caducado) con ese jti.
+    """
+    result = await maybe_await(db.execute(
+        select(_RefreshToken).where(
+            _RefreshToken.jti == jti,
+            _RefreshToken.is_revoked == False,
+            _RefreshToken.expires_at > datetime.utcnow(),
+        ).limit(1)
+    ))
+    return result.scalars().first()
+
+
+def revoke_refresh_token(refresh_token: _models.RefreshToken) -> None:
+    refresh_token.is_revoked = True
+    refresh_token.revoked_at = datetime.utcnow()
+
+
+async def rotate_refresh_token_service(
+    db: Session, jti: str, username: str
+) -> Optional[Tuple[_models.User, str]]:
+    """
+    Revoca el refresh token `jti` y emite uno nuevo en una sola transacción.
+    El UPDATE condicional hace de cerrojo: de dos rotaciones simultáneas del
+    mismo token solo una lo encuentra sin revocar.
+    Devuelve (usuario, nuevo token), o None si el token no existe, caducó, no es
+    de `username` o se revocó en un logout. Si ya se había rotado lanza RefreshTokenReused.
+    """
+    now = datetime.utcnow()
+    new_jti = str(uuid.uuid4())
+    result = await maybe_await(db.execute(
+        update(_RefreshToken)
+        .where(
+            _RefreshToken.jti == jti,
+            _RefreshToken.is_revoked == False,
+            _RefreshToken.expires_at > now,
+        )
+        .values(is_revoked=True, revoked_at=now, replaced_by=new_jti)
+        .returning(_RefreshToken.user_id)
+        .execution_options(synchronize_session=False)
+    ))
+    user_id = result.scalar_one_or_none()
+    user = await maybe_await(db.get(_models.User, user_id)) if user_id is not None else None
+    if user is None or user.username != username:
+        await maybe_await(db.rollback())
+        if user_id is None and await _revoke_user_tokens_on_reuse(db, jti, now):
+            raise RefreshTokenReused(REFRESH_TOKEN_REUSED)
+        return None
+
+    token = await issue_refresh_token_service(db, user, jti=new_jti)
+    await maybe_await(db.commit())
+    return user, token
+
+
+async def _revoke_user_tokens_on_reuse(db: Session, jti: str, now: datetime) -> bool:
+    """
+    Un token ya rotado que se vuelve a presentar indica que se ha filtrado: se
+    revocan todos los tokens vigentes de su usuario. Un token revocado en un
+    logout no cuenta (puede ser un reintento del cliente).
+    """
+    result = await maybe_await(db.execute(
+        select(_RefreshToken.user_id).where(_RefreshToken.jti == jti, _RefreshToken.replaced_by.is_not(None)).limit(1)
+    ))
+    user_id = result.scalar_one_or_none()
+    if user_id is None:
+        return False
+    await maybe_await(db.execute(
+        update(_RefreshToken)
+        .where(_RefreshToken.user_id == user_id, _RefreshToken.is_revoked == False)
+        .values(is_revoked=True, revoked_at=now)
+        .execution_options(synchronize_session=False)
+    ))
+    await maybe_await(db.commit())
+    return True
+
+
+async def purge_refresh_tokens_service(db: Session, batch_size: int = REFRESH_TOKEN_PURGE_BATCH_SIZE) -> int:
+    """
+    Borra por lotes los refresh tokens caducados y los revocados hace más de
+    REFRESH_TOKEN_REVOKED_RETENTION segundos. Devuelve el número de filas borradas.
+    """
+    now = datetime.utcnow()
+    expired = or_(
+        _RefreshToken.expires_at <= now,
+        _RefreshToken.revoked_at <= now - timedelta(seconds=REFRESH_TOKEN_REVOKED_RETENTION),
+    )
+    purged = 0
+    while True:
+        result = await maybe_await(db.execute(select(_RefreshToken.id).where(expired).limit(batch_size)))
+        ids = result.scalars().all()
+        if not ids:
+            break
+        await maybe_await(db.execute(
+            delete(_RefreshToken).where(_RefreshToken.id.in_(ids)).execution_options(synchronize_session=False)
+        ))
+        # Un commit por lote: los bloqueos se liberan entre lotes
+        await maybe_await(db.commit())
+        purged += len(ids)
+        if len(ids) < batch_size:
+            break
+    return purged
+
+
+async def run_refresh_token_purge(interval: float = REFRESH_TOKEN_PURGE_INTERVAL) -> None:
+    """
+    Tarea periódica de purga, lanzada desde el lifespan de la aplicación. Borra
+    también las revocaciones de access tokens ya caducados.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_scope() as db:
+                await purge_refresh_tokens_service(db)
+                await purge_revoked_access_tokens_service(db)
+        except SQLAlchemyError:
+            # Se reintenta en la siguiente vuelta
+            pass
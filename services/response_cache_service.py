@@ -0,0 +1,190 @@
+# services/response_cache_service.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Optional
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from responses import type_adapter
+from services.notification_service import notification_bus
+
+# Segundos que una respuesta cacheada sigue siendo válida en el worker: cubre los
+# cambios hechos fuera de la aplicación (0 = sin caducidad). Los cambios hechos
+# desde cualquier worker se avisan al resto con el bus de notificaciones.
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "300"))
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "1000"))
+# max-age de Cache-Control: con 0 el cliente revalida siempre con If-None-Match (304)
+CATALOG_CACHE_MAX_AGE = int(os.getenv("CATALOG_CACHE_MAX_AGE", "0"))
+
+# Tablas de las que depende cada catálogo: un cambio en cualquiera lo invalida
+CATALOG_TABLES: Dict[str, FrozenSet[str]] = {
+    "brands": frozenset({"brands"}),
+    "vehicle_types": frozenset({"vehicle_types"}),
+    "models": frozenset({"models", "brands", "vehicle_types"}),
+    "colors": frozenset({"colors"}),
+    "states": frozenset({"states"}),
+}
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    version: int
+    expires_at: float
+
+
+class ResponseCache:
+    """
+    Caché LRU de respuestas JSON ya serializadas, por catálogo. Cada catálogo
+    tiene un número de versión que sube al invalidarlo; las entradas de una
+    versión anterior se descartan.
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, CachedResponse]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def version(self, namespace: str) -> int:
+        with self._lock:
+            return self._versions.get(namespace, 0)
+
+    def get(self, key: tuple) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.version != self._versions.get(key[0], 0) or (self.ttl > 0 and entry.expires_at <= time.monotonic()):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: tuple, entry: CachedResponse) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            # Si el catálogo se invalidó mientras se generaba la respuesta, no se guarda
+            if entry.version != self._versions.get(key[0], 0):
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, namespace: str) -> None:
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            for key in [key for key in self._entries if key[0] == namespace]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+response_cache = ResponseCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+
+
+def invalidate_tables(tables, cache: Optional[ResponseCache] = None) -> None:
+    """
+    Invalida los catálogos que dependen de alguna de las tablas indicadas.
+    """
+    cache = response_cache if cache is None else cache
+    for namespace, dependencies in CATALOG_TABLES.items():
+        if dependencies & set(tables):
+            cache.invalidate(namespace)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Comparación débil (RFC 9110): se ignora el prefijo W/
+    candidates = (value.strip().removeprefix("W/") for value in if_none_match.split(","))
+    return etag in candidates
+
+
+async def cached_response(
+    request: Request,
+    namespace: str,
+    response_model: Any,
+    load: Callable[[], Awaitable[Any]],
+) -> Response:
+    """
+    Devuelve la respuesta de un endpoint de catálogo desde la caché, o la genera
+    con `load()` y la guarda ya serializada. Añade ETag y Cache-Control y
+    responde 304 si el cliente ya tiene esa versión (If-None-Match).
+    """
+    key = (namespace, request.url.path, tuple(sorted(request.query_params.multi_items())))
+    entry = response_cache.get(key)
+    if entry is None:
+        version = response_cache.version(namespace)
+        adapter = type_adapter(response_model)
+        body = adapter.dump_json(adapter.validate_python(await load(), from_attributes=True))
+        entry = CachedResponse(
+            body=body,
+            etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+            version=version,
+            expires_at=time.monotonic() + response_cache.ttl,
+        )
+        response_cache.set(key, entry)
+
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": f"private, max-age={CATALOG_CACHE_MAX_AGE}, must-revalidate",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+# region Invalidation on catalog changes
+
+# Tema del bus de notificaciones: el mensaje es el nombre de la tabla modificada
+CATALOG_TOPIC = "catalog"
+_CACHED_TABLES = frozenset().union(*CATALOG_TABLES.values())
+
+
+def _mark_tables(session, tables) -> None:
+    # El bus entrega el aviso tras el commit a este worker y al resto
+    for table in _CACHED_TABLES.intersection(tables):
+        notification_bus.publish(session, CATALOG_TOPIC, table)
+
+
+async def _invalidate_all_catalogs() -> None:
+    # Al (re)conectar el bus se pueden haber perdido avisos
+    invalidate_tables(_CACHED_TABLES)
+
+
+notification_bus.subscribe(CATALOG_TOPIC, lambda table: invalidate_tables({table}))
+notification_bus.on_connect(_invalidate_all_catalogs)
+
+
+@event.listens_for(Session, "before_flush")
+def _track_catalog_changes(session, flush_context, instances):
+    _mark_tables(session, {
+        getattr(instance, "__tablename__", None)
+        for instance in (*session.new, *session.dirty, *session.deleted)
+    })
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_catalog_statements(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        _mark_tables(orm_execute_state.session, {getattr(table, "name", None)})
+
+
+# endregion
@@ -0,0 +1,183 @@
+# services/state_machine_service.py
+import os
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import List, Mapping, Optional, FrozenSet, Tuple
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+import models as _models
+import schemas as _schemas
+from services.database_service import maybe_await
+from services.notification_service import notification_bus
+
+# Segundos tras los que se recompila aunque no haya avisos de cambios: cubre las
+# ediciones hechas directamente en la base de datos (0 = nunca).
+STATE_MACHINE_TTL = float(os.getenv("STATE_MACHINE_TTL", "300"))
+
+# Tema del bus de notificaciones: el mensaje es la tabla del flujo modificada
+WORKFLOW_TOPIC = "workflow"
+
+_WORKFLOW_MODELS = (_models.State, _models.Transition, _models.StateComment)
+_WORKFLOW_TABLES = frozenset(model.__tablename__ for model in _WORKFLOW_MODELS)
+
+
+@dataclass(frozen=True)
+class StateMachine:
+    """
+    Flujo de estados compilado e inmutable: se sustituye entero al recargarlo,
+    así que las peticiones en curso siguen usando una versión coherente.
+    """
+    version: int
+    loaded_at: float
+    states: Mapping[int, _schemas.State]
+    transitions: Mapping[int, Tuple[_schemas.Transition, ...]]
+    targets: Mapping[int, FrozenSet[int]]
+    sources: Mapping[int, FrozenSet[int]]
+    initial_state_id: Optional[int]
+    final_state_ids: FrozenSet[int]
+    comment_ids: Mapping[int, FrozenSet[int]]
+
+    def can_transition(self, from_state_id: Optional[int], to_state_id: int) -> bool:
+        return to_state_id in self.targets.get(from_state_id, ())
+
+    def allowed_transitions(self, from_state_id: Optional[int]) -> List[_schemas.Transition]:
+        return list(self.transitions.get(from_state_id, ()))
+
+    def sources_for(self, to_state_id: int) -> FrozenSet[int]:
+        """
+        Estados desde los que se puede llegar a to_state_id.
+        """
+        return self.sources.get(to_state_id, frozenset())
+
+    def is_valid_comment(self, state_id: int, comment_id: int) -> bool:
+        return comment_id in self.comment_ids.get(state_id, ())
+
+    @property
+    def initial_state(self) -> Optional[_schemas.State]:
+        return self.states.get(self.initial_state_id)
+
+
+def _freeze(groups: dict) -> Mapping:
+    return MappingProxyType({key: frozenset(values) for key, values in groups.items()})
+
+
+async def load_state_machine_service(db: Session, version: int) -> StateMachine:
+    """
+    Compila el flujo de estados con tres consultas (estados, transiciones y comentarios).
+    """
+    result = await maybe_await(db.execute(select(_models.State).order_by(_models.State.id)))
+    states = {state.id: _schemas.State.model_validate(state) for state in result.scalars().all()}
+
+    result = await maybe_await(db.execute(select(_models.Transition).order_by(_models.Transition.id)))
+    transitions, targets, sources = {}, {}, {}
+    for transition in result.scalars().all():
+        if transition.from_state_id not in states or transition.to_state_id not in states:
+            continue
+        compiled = _schemas.Transition.model_validate({
+            "id": transition.id,
+            "from_state_id": transition.from_state_id,
+            "to_state_id": transition.to_state_id,
+            "condition": transition.condition,
+            "action": transition.action,
+            "active": transition.active,
+            "from_state": states[transition.from_state_id],
+            "to_state": states[transition.to_state_id],
+            "created_at": transition.created_at,
+            "updated_at": transition.updated_at,
+        })
+        transitions.setdefault(transition.from_state_id, []).append(compiled)
+        targets.setdefault(transition.from_state_id, set()).add(transition.to_state_id)
+        sources.setdefault(transition.to_state_id, set()).add(transition.from_state_id)
+
+    result = await maybe_await(db.execute(select(_models.StateComment.id, _models.StateComment.state_id)))
+    comment_ids = {}
+    for comment_id, state_id in result.all():
+        comment_ids.setdefault(state_id, set()).add(comment_id)
+
+    initial = [state_id for state_id, state in states.items() if state.is_initial]
+    return StateMachine(
+        version=version,
+        loaded_at=time.monotonic(),
+        states=MappingProxyType(states),
+        transitions=MappingProxyType({key: tuple(values) for key, values in transitions.items()}),
+        targets=_freeze(targets),
+        sources=_freeze(sources),
+        initial_state_id=initial[0] if initial else None,
+        final_state_ids=frozenset(state_id for state_id, state in states.items() if state.is_final),
+        comment_ids=_freeze(comment_ids),
+    )
+
+
+# region Cache
+
+_lock = threading.Lock()
+_version = 0
+_current: Optional[StateMachine] = None
+
+
+def invalidate_state_machine() -> None:
+    """
+    Sube la versión del flujo: la siguiente consulta recompila la máquina de estados.
+    """
+    global _version
+    with _lock:
+        _version += 1
+
+
+def _is_fresh(machine: Optional[StateMachine]) -> bool:
+    if machine is None or machine.version != _version:
+        return False
+    return STATE_MACHINE_TTL <= 0 or time.monotonic() - machine.loaded_at < STATE_MACHINE_TTL
+
+
+async def get_state_machine_service(db: Session) -> StateMachine:
+    """
+    Devuelve la máquina de estados en memoria, recompilándola si cambió la versión
+    o venció el TTL.
+    """
+    global _current
+    machine = _current
+    if _is_fresh(machine):
+        return machine
+
+    version = _version
+    machine = await load_state_machine_service(db, version)
+    with _lock:
+        # Si otra petición ya cargó una versión igual o más reciente, se conserva
+        if _current is None or _current.version < version or not _is_fresh(_current):
+            _current = machine
+    return machine
+
+# endregion
+
+# region Invalidation on workflow changes
+
+@event.listens_for(Session, "before_flush")
+def _track_workflow_changes(session, flush_context, instances):
+    # El bus entrega el aviso tras el commit, en este worker y en el resto
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, _WORKFLOW_MODELS):
+            notification_bus.publish(session, WORKFLOW_TOPIC, instance.__tablename__)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_workflow_statements(orm_execute_state):
+    # INSERT/UPDATE/DELETE masivos (session.execute(insert(State)...)) no pasan por el flush
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if getattr(table, "name", None) in _WORKFLOW_TABLES:
+        notification_bus.publish(orm_execute_state.session, WORKFLOW_TOPIC, table.name)
+
+
+async def _invalidate_after_reconnect() -> None:
+    # Al (re)conectar el bus se pueden haber perdido avisos
+    invalidate_state_machine()
+
+
+notification_bus.subscribe(WORKFLOW_TOPIC, lambda table: invalidate_state_machine())
+notification_bus.on_connect(_invalidate_after_reconnect)
+
+# endregion
@@ -1,12 +1,17 @@
 from typing import List
-from sqlalchemy.orm import Session
+from sqlalchemy import DateTime, Integer, insert, literal, select, update
+from sqlalchemy.orm import Session, selectinload
 import models as _models
 import schemas as _schemas
 from fastapi import HTTPException
 from datetime import datetime, timezone
 from typing import Optional
-from services.exceptions import StateNotFoundException, StateCommentsNotFoundException
-from constants.exceptions import STATE_NOT_FOUND, STATE_COMMENT_NOT_FOUND
+from services.exceptions import StateNotFoundException, StateCommentsNotFoundException, StateChangeConflict
+from constants.exceptions import STATE_NOT_FOUND, STATE_COMMENT_NOT_FOUND, STATE_CHANGE_CONFLICT
+from responses import validate_list
+from services.database_service import maybe_await
+from services.state_machine_service import StateMachine, get_state_machine_service
+from services.vehicle_counters_service import apply_state_count_deltas
 
 
 
@@ -30,51 +35,81 @@ async def register_state_history_service(
     )
 
     db.add(state_history_entry)
-    db.commit()
-    db.refresh(state_history_entry)
+    await maybe_await(db.commit())
+    await maybe_await(db.refresh(state_history_entry))
 
 async def get_allowed_transitions_for_vehicle_service(vehicle_id: int, db: Session) -> List[_schemas.Transition]:
-    # Obtener el vehículo
-    vehicle = db.query(_models.Vehicle).filter(_models.Vehicle.id == vehicle_id).first()
+    # Obtener el estado actual del vehículo
+    result = await maybe_await(db.execute(
+        select(_models.Vehicle.status_id).where(_models.Vehicle.id == vehicle_id)
+    ))
+    vehicle = result.first()
     if not vehicle:
         raise HTTPException(status_code=404, detail="Vehicle not found.")
 
-    # Obtener las transiciones permitidas desde el estado actual del vehículo
-    allowed_transitions = db.query(_models.Transition).filter(
-        _models.Transition.from_state_id == vehicle.status_id
-    ).all()
-
-    return [_schemas.Transition.model_validate(transition) for transition in allowed_transitions]
+    # Las transiciones permitidas salen de la máquina de estados en memoria
+    machine = await get_state_machine_service(db)
+    return machine.allowed_transitions(vehicle.status_id)
 
 async def get_all_states_service(db: Session) -> List[_schemas.State]:
-    states = db.query(_models.State).all()
-    return [ _schemas.State.model_validate(state) for state in states ]
+    machine = await get_state_machine_service(db)
+    return list(machine.states.values())
 
 async def get_vehicle_state_history_service(vehicle_id: int, db: Session) -> List[_schemas.StateHistory]:
     # Obtener el vehículo
-    vehicle = db.query(_models.Vehicle).filter(_models.Vehicle.id == vehicle_id).first()
+    vehicle = await maybe_await(db.get(_models.Vehicle, vehicle_id))
     if not vehicle:
         raise ValueError("El vehículo no existe.")
 
     # Obtener el historial de estados del vehículo
-    state_history = db.query(_models.StateHistory).filter(
-        _models.StateHistory.vehicle_id == vehicle_id
-    ).order_by(_models.StateHistory.timestamp).all()
+    result = await maybe_await(db.execute(
+        select(_models.StateHistory)
+        .options(selectinload(_models.StateHistory.comment))
+        .where(_models.StateHistory.vehicle_id == vehicle_id)
+        .order_by(_models.StateHistory.timestamp)
+    ))
+    state_history = result.scalars().all()
 
-    return [_schemas.StateHistory.model_validate(entry) for entry in state_history]
+    return validate_list(_schemas.StateHistory, state_history)
 
 async def get_vehicle_current_state_service(db: Session, vehicle_id: int) -> _schemas.State:
-    # Obtener el vehículo de la base de datos
-    vehicle = db.query(_models.Vehicle).filter(_models.Vehicle.id == vehicle_id).first()
+    # Obtener el estado del vehículo de la base de datos
+    result = await maybe_await(db.execute(
+        select(_models.Vehicle.status_id).where(_models.Vehicle.id == vehicle_id)
+    ))
+    vehicle = result.first()
     if not vehicle:
         raise HTTPException(status_code=404, detail="El vehículo no existe.")
 
     # Obtener el estado actual del vehículo
-    state = db.query(_models.State).filter(_models.State.id == vehicle.status_id).first()
+    machine = await get_state_machine_service(db)
+    state = machine.states.get(vehicle.status_id)
     if not state:
         raise HTTPException(status_code=500, detail="El estado del vehículo no está configurado.")
 
-    return _schemas.State.model_validate(state)
+    return state
+
+async def _raise_state_change_error(
+    vehicle_id: int,
+    new_state_id: int,
+    comment_id: Optional[int],
+    machine: StateMachine,
+    db: Session
+):
+    """
+    Solo se ejecuta si el cambio de estado no se aplicó: determina el motivo
+    para devolver el mismo error que la validación paso a paso.
+    """
+    result = await maybe_await(db.execute(
+        select(_models.Vehicle.id).where(_models.Vehicle.id == vehicle_id)
+    ))
+    if result.first() is None:
+        raise ValueError("El vehículo no existe.")
+    if new_state_id not in machine.states:
+        raise ValueError("El nuevo estado no existe.")
+    if comment_id is not None and not machine.is_valid_comment(new_state_id, comment_id):
+        raise ValueError("El comentario proporcionado no es válido para el estado seleccionado.")
+    raise ValueError("La transición al nuevo estado no es válida.")
 
 async def change_vehicle_state_service(
     vehicle_id: int,
@@ -83,76 +118,196 @@ async def change_vehicle_state_service(
     db: Session,
     comment_id: Optional[int] = None
 ) -> _schemas.StateHistory:
-    
-    # Obtener el vehículo
-    vehicle = db.query(_models.Vehicle).filter(_models.Vehicle.id == vehicle_id).first()
-    if not vehicle:
-        raise ValueError("El vehículo no existe.")
+    """
+    Cambia el estado del vehículo en una sola transacción y dos sentencias:
+    1. INSERT ... SELECT en state_history que solo inserta si el vehículo existe
+       y su estado actual es uno de los orígenes válidos hacia el nuevo estado
+       (RETURNING devuelve el estado de origen). El nuevo estado y el comentario
+       se validan antes en la máquina de estados en memoria.
+    2. UPDATE condicional del vehículo (status_id = estado de origen). El UPDATE
+       bloquea la fila; si otro escáner cambió el estado entre medias no se
+       actualiza nada y se deshace la transacción (StateChangeConflict).
+    """
+    machine = await get_state_machine_service(db)
+    sources = machine.sources_for(new_state_id)
+    if not sources or (comment_id is not None and not machine.is_valid_comment(new_state_id, comment_id)):
+        await _raise_state_change_error(vehicle_id, new_state_id, comment_id, machine, db)
 
-    # Obtener el nuevo estado
-    new_state = db.query(_models.State).filter(_models.State.id == new_state_id).first()
-    if not new_state:
-        raise ValueError("El nuevo estado no existe.")
+    now = datetime.now(timezone.utc)
+    conditions = [
+        _models.Vehicle.id == vehicle_id,
+        _models.Vehicle.status_id.in_(sources),
+    ]
 
-    # Verificar si la transición es válida
-    valid_transition = db.query(_models.Transition).filter(
-        _models.Transition.from_state_id == vehicle.status_id,
-        _models.Transition.to_state_id == new_state_id
-    ).first()
-
-    if not valid_transition:
-        raise ValueError("La transición al nuevo estado no es válida.")
-
-    # Si se proporciona un comment_id, validar que existe y está asociado al nuevo estado
-    if comment_id is not None:
-        comment = db.query(_models.StateComment).filter(
-            _models.StateComment.id == comment_id,
-            _models.StateComment.state_id == new_state_id
-        ).first()
-
-        print(comment) 
-        if not comment:
-            raise ValueError("El comentario proporcionado no es válido para el estado seleccionado.")
-    else:
-        comment = None
-
-    # Actualizar el estado del vehículo
-    vehicle.status_id = new_state_id
-    vehicle.updated_at = datetime.now(timezone.utc)
-    db.commit()
-    db.refresh(vehicle)
-
-    # Crear una nueva entrada en el historial de estados
-    state_history_entry = _models.StateHistory(
+    history_row = select(
+        _models.Vehicle.id,
+        _models.Vehicle.status_id,
+        literal(new_state_id, Integer),
+        literal(user_id, Integer),
+        literal(now, DateTime(timezone=True)),
+        literal(comment_id, Integer),
+    ).where(*conditions)
+
+    result = await maybe_await(db.execute(
+        insert(_models.StateHistory)
+        .from_select(
+            ["vehicle_id", "from_state_id", "to_state_id", "user_id", "timestamp", "comment_id"],
+            history_row
+        )
+        .returning(_models.StateHistory.id, _models.StateHistory.from_state_id, _models.StateHistory.timestamp)
+    ))
+    inserted = result.first()
+    if inserted is None:
+        await maybe_await(db.rollback())
+        await _raise_state_change_error(vehicle_id, new_state_id, comment_id, machine, db)
+
+    result = await maybe_await(db.execute(
+        update(_models.Vehicle)
+        .where(
+            _models.Vehicle.id == vehicle_id,
+            _models.Vehicle.status_id == inserted.from_state_id
+        )
+        .values(status_id=new_state_id, updated_at=now)
+        .execution_options(synchronize_session=False)
+    ))
+    if result.rowcount != 1:
+        await maybe_await(db.rollback())
+        raise StateChangeConflict(STATE_CHANGE_CONFLICT)
+
+    await apply_state_count_deltas(db, {inserted.from_state_id: -1, new_state_id: 1})
+    await maybe_await(db.commit())
+
+    return _schemas.StateHistory(
+        id=inserted.id,
         vehicle_id=vehicle_id,
-        from_state_id=valid_transition.from_state_id,
-        to_state_id=valid_transition.to_state_id,
+        from_state_id=inserted.from_state_id,
+        to_state_id=new_state_id,
         user_id=user_id,
-        timestamp=datetime.now(timezone.utc),
-        comment_id=comment.id if comment else None
+        timestamp=inserted.timestamp,
+        comment=_schemas.StateComment(id=comment_id, state_id=new_state_id) if comment_id is not None else None,
     )
-    db.add(state_history_entry)
-    db.commit()
-    db.refresh(state_history_entry)
 
-    return _schemas.StateHistory.model_validate(state_history_entry)
+async def change_vehicles_state_batch_service(
+    vehicle_ids: List[int],
+    new_state_id: int,
+    user_id: int,
+    db: Session,
+    comment_id: Optional[int] = None
+) -> _schemas.StateChangeBatchResult:
+    """
+    Cambia el estado de varios vehículos en una sola transacción:
+    1. Un SELECT con el estado actual de todos los vehículos, validado contra
+       la máquina de estados en memoria.
+    2. Un UPDATE por estado de origen (normalmente uno), condicionado a que el
+       vehículo siga en ese estado; RETURNING indica cuáles se cambiaron.
+    3. Un INSERT multi-fila en state_history para los vehículos cambiados.
+    Devuelve el resultado de cada vehículo.
+    """
+    machine = await get_state_machine_service(db)
+    if new_state_id not in machine.states:
+        raise ValueError("El nuevo estado no existe.")
+    if comment_id is not None and not machine.is_valid_comment(new_state_id, comment_id):
+        raise ValueError("El comentario proporcionado no es válido para el estado seleccionado.")
+
+    vehicle_ids = list(dict.fromkeys(vehicle_ids))
+    result = await maybe_await(db.execute(
+        select(_models.Vehicle.id, _models.Vehicle.status_id).where(_models.Vehicle.id.in_(vehicle_ids))
+    ))
+    current_states = dict(result.all())
+
+    items = {}
+    by_source = {}
+    for vehicle_id in vehicle_ids:
+        from_state_id = current_states.get(vehicle_id)
+        if vehicle_id not in current_states:
+            error = "El vehículo no existe."
+        elif not machine.can_transition(from_state_id, new_state_id):
+            error = "La transición al nuevo estado no es válida."
+        else:
+            by_source.setdefault(from_state_id, []).append(vehicle_id)
+            continue
+        items[vehicle_id] = _schemas.StateChangeBatchItemResult(
+            vehicle_id=vehicle_id,
+            status=_schemas.StateChangeBatchItemStatus.error,
+            from_state_id=from_state_id,
+            error=error,
+        )
+
+    now = datetime.now(timezone.utc)
+    changed = {}
+    for from_state_id, ids in by_source.items():
+        result = await maybe_await(db.execute(
+            update(_models.Vehicle)
+            .where(_models.Vehicle.id.in_(ids), _models.Vehicle.status_id == from_state_id)
+            .values(status_id=new_state_id, updated_at=now)
+            .returning(_models.Vehicle.id)
+            .execution_options(synchronize_session=False)
+        ))
+        changed.update((vehicle_id, from_state_id) for vehicle_id in result.scalars().all())
+        # Los que no devuelve el UPDATE cambiaron de estado desde el SELECT
+        for vehicle_id in ids:
+            if vehicle_id not in changed:
+                items[vehicle_id] = _schemas.StateChangeBatchItemResult(
+                    vehicle_id=vehicle_id,
+                    status=_schemas.StateChangeBatchItemStatus.error,
+                    from_state_id=from_state_id,
+                    error=STATE_CHANGE_CONFLICT,
+                )
+
+    if changed:
+        deltas = {new_state_id: len(changed)}
+        for from_state_id in changed.values():
+            deltas[from_state_id] = deltas.get(from_state_id, 0) - 1
+        await apply_state_count_deltas(db, deltas)
+        result = await maybe_await(db.execute(
+            insert(_models.StateHistory).returning(_models.StateHistory.id, _models.StateHistory.vehicle_id),
+            [
+                {
+                    "vehicle_id": vehicle_id,
+                    "from_state_id": from_state_id,
+                    "to_state_id": new_state_id,
+                    "user_id": user_id,
+                    "timestamp": now,
+                    "comment_id": comment_id,
+                }
+                for vehicle_id, from_state_id in changed.items()
+            ]
+        ))
+        for history_id, vehicle_id in result.all():
+            items[vehicle_id] = _schemas.StateChangeBatchItemResult(
+                vehicle_id=vehicle_id,
+                status=_schemas.StateChangeBatchItemStatus.changed,
+                from_state_id=changed[vehicle_id],
+                history_id=history_id,
+            )
+    await maybe_await(db.commit())
+
+    return _schemas.StateChangeBatchResult(
+        to_state_id=new_state_id,
+        changed=len(changed),
+        errors=len(vehicle_ids) - len(changed),
+        items=[items[vehicle_id] for vehicle_id in vehicle_ids],
+    )
 
 async def get_state_comments_service(state_id: int, db: Session) -> List[_schemas.StateCommentRead]:
     """
     Obtiene los comentarios predefinidos para un estado específico.
     """
     # Verificar si el estado existe
-    state = db.query(_models.State).filter(_models.State.id == state_id).first()
+    state = await maybe_await(db.get(_models.State, state_id))
     if not state:
         raise StateNotFoundException(STATE_NOT_FOUND)
     
     # Obtener los comentarios asociados al estado
-    comments = db.query(_models.StateComment).filter(_models.StateComment.state_id == state_id).all()
+    result = await maybe_await(db.execute(
+        select(_models.StateComment).where(_models.StateComment.state_id == state_id)
+    ))
+    comments = result.scalars().all()
     
     #if not comments:
     #    raise StateCommentsNotFoundException(STATE_COMMENT_NOT_FOUND)
     
-    return [_schemas.StateCommentRead.model_validate(comment) for comment in comments]
+    return validate_list(_schemas.StateCommentRead, comments)
 
 
 
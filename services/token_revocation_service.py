@@ -0,0 +1,122 @@
+# services/token_revocation_service.py
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from sqlalchemy import delete, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+import models as _models
+from services.database_service import maybe_await, session_scope
+from services.notification_service import notification_bus
+
+# Tema del bus de notificaciones: el mensaje es "<jti> <caducidad epoch>"
+REVOCATION_TOPIC = "access_token_revoked"
+
+_RevokedAccessToken = _models.RevokedAccessToken
+
+class RevocationList:
+    """
+    jti de los access tokens revocados con su caducidad (epoch). Una entrada solo
+    hace falta hasta que el token caduca, así que el tamaño está acotado por las
+    revocaciones hechas durante ACCESS_TOKEN_EXPIRE_MINUTES.
+    """
+
+    def __init__(self, purge_interval: float = 60.0):
+        self.purge_interval = purge_interval
+        self._entries: Dict[str, float] = {}
+        self._next_purge = time.time() + purge_interval
+        self._lock = threading.Lock()
+
+    def add(self, jti: str, expires_at: float) -> None:
+        now = time.time()
+        if expires_at <= now:
+            return
+        with self._lock:
+            self._entries[jti] = max(expires_at, self._entries.get(jti, 0))
+            if now >= self._next_purge:
+                self._purge(now)
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        # Lectura sin lock: un dict admite consultas concurrentes
+        expires_at = self._entries.get(jti) if jti else None
+        return expires_at is not None and expires_at > time.time()
+
+    def _purge(self, now: float) -> None:
+        self._entries = {jti: expires_at for jti, expires_at in self._entries.items() if expires_at > now}
+        self._next_purge = now + self.purge_interval
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+revocation_list = RevocationList()
+
+
+def _epoch(value: datetime) -> float:
+    # SQLite devuelve la fecha sin zona horaria: se guarda siempre en UTC
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def _on_revocation(payload: str) -> None:
+    try:
+        jti, expires_at = payload.split(" ", 1)
+        revocation_list.add(jti, float(expires_at))
+    except ValueError:
+        pass
+
+
+async def load_revoked_access_tokens() -> None:
+    """
+    Carga las revocaciones vigentes de la tabla. El bus la ejecuta al arrancar y
+    tras cada reconexión, porque los avisos de ese intervalo se han perdido.
+    """
+    try:
+        async with session_scope() as db:
+            result = await maybe_await(db.execute(
+                select(_RevokedAccessToken.jti, _RevokedAccessToken.expires_at)
+                .where(_RevokedAccessToken.expires_at > datetime.now(timezone.utc))
+            ))
+            for jti, expires_at in result.all():
+                revocation_list.add(jti, _epoch(expires_at))
+    except SQLAlchemyError:
+        pass
+
+
+notification_bus.subscribe(REVOCATION_TOPIC, _on_revocation)
+notification_bus.on_connect(load_revoked_access_tokens)
+
+
+def is_access_token_revoked(jti: Optional[str]) -> bool:
+    """
+    Consulta en memoria, sin acceso a la base de datos.
+    """
+    return revocation_list.is_revoked(jti)
+
+
+async def revoke_access_token_service(db: Session, jti: str, expires_at: float) -> None:
+    """
+    Revoca un access token hasta su caducidad. No hace commit: la revocación se
+    guarda y se aplica en todos los workers solo si la transacción de `db` se confirma.
+    """
+    await maybe_await(db.merge(_RevokedAccessToken(
+        jti=jti, expires_at=datetime.fromtimestamp(expires_at, timezone.utc)
+    )))
+    notification_bus.publish(db, REVOCATION_TOPIC, f"{jti} {expires_at}")
+
+
+async def purge_revoked_access_tokens_service(db: Session) -> int:
+    """
+    Borra las revocaciones de tokens ya caducados. Devuelve el número de filas borradas.
+    """
+    result = await maybe_await(db.execute(
+        delete(_RevokedAccessToken)
+        .where(_RevokedAccessToken.expires_at <= datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    ))
+    await maybe_await(db.commit())
+    return result.rowcount
@@ -0,0 +1,181 @@
+# services/vehicle_counters_service.py
+import asyncio
+import datetime as _dt
+import os
+from typing import Dict, List, Optional
+from sqlalchemy import func, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+import models as _models
+from constants.exceptions import UNSUPPORTED_COUNTERS_DIALECT
+from services.database_service import maybe_await, session_scope
+from services.exceptions import UnsupportedDatabaseDialect
+
+# Cada cuántos segundos se recalculan los contadores a partir de vehicles (0 = nunca)
+VEHICLE_COUNTERS_RECONCILE_INTERVAL = float(os.getenv("VEHICLE_COUNTERS_RECONCILE_INTERVAL", "3600"))
+# Clave del advisory lock de PostgreSQL que evita reconciliaciones simultáneas
+VEHICLE_COUNTERS_RECONCILE_LOCK_KEY = int(os.getenv("VEHICLE_COUNTERS_RECONCILE_LOCK_KEY", "7305"))
+
+_counters = _models.VehicleStateCounter.__table__
+_registrations = _models.VehicleRegistrationDaily.__table__
+
+
+# INSERT ... ON CONFLICT existe en PostgreSQL y SQLite, pero cada dialecto tiene su constructor
+_INSERT_BY_DIALECT = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def check_counters_dialect(dialect: str) -> None:
+    """
+    Se comprueba al arrancar: con otro motor, cada alta o cambio de estado fallaría.
+    """
+    if dialect not in _INSERT_BY_DIALECT:
+        raise UnsupportedDatabaseDialect(UNSUPPORTED_COUNTERS_DIALECT.format(dialect=dialect))
+
+
+def _upsert(db: Session, table):
+    dialect = db.get_bind().dialect.name
+    check_counters_dialect(dialect)
+    return _INSERT_BY_DIALECT[dialect](table)
+
+
+async def _add_deltas(db: Session, table, key, deltas: dict) -> None:
+    """
+    Suma los incrementos a los contadores de `table` con un único upsert multi-fila
+    (ordenado por clave para que dos transacciones no se bloqueen en orden inverso).
+    """
+    rows = [{key.name: value, "count": delta} for value, delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+    statement = _upsert(db, table)
+    await maybe_await(db.execute(
+        statement.values(rows).on_conflict_do_update(
+            index_elements=[key],
+            set_={"count": table.c.count + statement.excluded.count},
+        )
+    ))
+
+
+async def apply_state_count_deltas(db: Session, deltas: Dict[int, int]) -> None:
+    """
+    Suma los incrementos por estado a los contadores.
+    No hace commit: se confirma junto con la escritura que lo provoca.
+    """
+    await _add_deltas(db, _counters, _counters.c.state_id, deltas)
+
+
+async def apply_registration_deltas(db: Session, deltas: Dict[_dt.date, int]) -> None:
+    """
+    Suma los incrementos por día al resumen de registros. No hace commit.
+    """
+    await _add_deltas(db, _registrations, _registrations.c.day, deltas)
+
+
+def registration_day(created_at: Optional[_dt.datetime]) -> Optional[_dt.date]:
+    """
+    Día (UTC) en el que se contabiliza un vehículo.
+    """
+    if created_at is None:
+        return None
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(_dt.timezone.utc)
+    return created_at.date()
+
+
+async def get_state_counts_service(db: Session) -> Dict[int, int]:
+    """
+    Vehículos por estado, leídos de los contadores (una fila por estado).
+    """
+    result = await maybe_await(db.execute(
+        select(_counters.c.state_id, _counters.c.count).where(_counters.c.count != 0)
+    ))
+    return dict(result.all())
+
+
+async def get_registrations_by_day_service(
+    db: Session, date_from: Optional[_dt.date] = None, date_to: Optional[_dt.date] = None
+) -> List[tuple]:
+    """
+    Registros por día del resumen, ordenados por fecha: [(día, número), ...].
+    """
+    query = select(_registrations.c.day, _registrations.c.count).where(_registrations.c.count != 0)
+    if date_from is not None:
+        query = query.where(_registrations.c.day >= date_from)
+    if date_to is not None:
+        query = query.where(_registrations.c.day <= date_to)
+    result = await maybe_await(db.execute(query.order_by(_registrations.c.day)))
+    return result.all()
+
+
+async def _measure_drift(db: Session, table, key, actual_key, where=None) -> dict:
+    """
+    Desviación por clave (valor real - contador) medida en una sola sentencia, así
+    el recuento y los contadores se leen de la misma instantánea sin bloquear nada.
+    """
+    actual = select(actual_key.label("key"), func.count(_models.Vehicle.id).label("count"))
+    if where is not None:
+        actual = actual.where(where)
+    stored = select(key.label("key"), (-table.c.count).label("count"))
+    both = union_all(actual.group_by(actual_key), stored).subquery()
+    difference = func.sum(both.c.count)
+    result = await maybe_await(db.execute(
+        select(both.c.key, difference).group_by(both.c.key).having(difference != 0)
+    ))
+    # SUM devuelve numeric en PostgreSQL
+    return {value: int(delta) for value, delta in result.all()}
+
+
+async def reconcile_vehicle_counters_service(db: Session) -> Optional[Dict[int, int]]:
+    """
+    Recalcula los contadores por estado y el resumen de registros por día desde
+    vehicles y corrige las diferencias. Devuelve la desviación encontrada por
+    estado, o None si otro proceso ya está reconciliando.
+
+    La desviación se mide sobre una instantánea y se suma como incremento: las
+    altas y cambios de estado concurrentes aplican los suyos sin esperar a la
+    reconciliación, que no bloquea las tablas.
+    """
+    postgres = db.get_bind().dialect.name == "postgresql"
+    if postgres:
+        # Cada worker tiene su propia tarea periódica: solo una ejecución a la vez
+        result = await maybe_await(db.execute(
+            select(func.pg_try_advisory_xact_lock(VEHICLE_COUNTERS_RECONCILE_LOCK_KEY))
+        ))
+        if not result.scalar():
+            await maybe_await(db.rollback())
+            return None
+
+    drift = await _measure_drift(
+        db, _counters, _counters.c.state_id, _models.Vehicle.status_id, _models.Vehicle.status_id.is_not(None)
+    )
+    await _add_deltas(db, _counters, _counters.c.state_id, drift)
+
+    # Día UTC, igual que registration_day. func.date devuelve una fecha en
+    # PostgreSQL y una cadena 'AAAA-MM-DD' en SQLite (que ya guarda UTC).
+    created_at = _models.Vehicle.created_at
+    if postgres:
+        created_at = func.timezone("UTC", created_at)
+    registrations = await _measure_drift(
+        db, _registrations, _registrations.c.day, func.date(created_at), _models.Vehicle.created_at.is_not(None)
+    )
+    await _add_deltas(db, _registrations, _registrations.c.day, {
+        _dt.date.fromisoformat(value) if isinstance(value, str) else value: delta
+        for value, delta in registrations.items()
+    })
+
+    await maybe_await(db.commit())
+    return drift
+
+
+async def run_counters_reconciliation(interval: float = VEHICLE_COUNTERS_RECONCILE_INTERVAL) -> None:
+    """
+    Tarea periódica de reconciliación, lanzada desde el lifespan de la aplicación.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_scope() as db:
+                await reconcile_vehicle_counters_service(db)
+        except SQLAlchemyError:
+            # Se reintenta en la siguiente vuelta
+            pass
@@ -1,9 +1,12 @@
 from typing import List
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 import models as _models
 import schemas as _schemas
 from datetime import datetime, timezone
 from fastapi import HTTPException
+from responses import validate_list
+from services.database_service import maybe_await
 
 
 
@@ -23,26 +26,34 @@ async def create_vehicle_type_service(
         )
     
     db.add(vehicle_type_model)
-    db.commit()
-    db.refresh(vehicle_type_model)
+    await maybe_await(db.commit())
+    await maybe_await(db.refresh(vehicle_type_model))
     return _schemas.VehicleType.model_validate(vehicle_type_model)
 
 async def get_all_vehicle_types_service(db: "Session", skip: int = 0, limit: int = 10) -> List[_schemas.VehicleType]:
-    vehicle_types = db.query(_models.VehicleType).offset(skip).limit(limit).all()
-    return list(map(_schemas.VehicleType.model_validate, vehicle_types))
+    result = await maybe_await(db.execute(select(_models.VehicleType).offset(skip).limit(limit)))
+    vehicle_types = result.scalars().all()
+    return validate_list(_schemas.VehicleType, vehicle_types)
 
 
+async def get_vehicle_type_by_name_service(type_name: str, db: "Session", exclude_id: int = None):
+    query = select(_models.VehicleType).where(_models.VehicleType.type_name == type_name)
+    if exclude_id is not None:
+        query = query.where(_models.VehicleType.id != exclude_id)
+    result = await maybe_await(db.execute(query.limit(1)))
+    return result.scalars().first()
+
 async def get_vehicle_type_service(vehicle_type_id: int, db: "Session") -> _schemas.VehicleType:
-    vehicle_type = db.query(_models.VehicleType).filter(_models.VehicleType.id == vehicle_type_id).first()
+    vehicle_type = await maybe_await(db.get(_models.VehicleType, vehicle_type_id))
     if vehicle_type:
         return _schemas.VehicleType.model_validate(vehicle_type)
     return None
 
 async def delete_vehicle_type_service(vehicle_type_id: int, db: "Session") -> bool:
-    vehicle_type = db.query(_models.VehicleType).filter(_models.VehicleType.id == vehicle_type_id).first()
+    vehicle_type = await maybe_await(db.get(_models.VehicleType, vehicle_type_id))
     if vehicle_type:
-        db.delete(vehicle_type)
-        db.commit()
+        await maybe_await(db.delete(vehicle_type))
+        await maybe_await(db.commit())
         return True
     return False
 
@@ -54,11 +65,11 @@ async def update_vehicle_type_service(
     if not vehicle_type_data.type_name.strip():
         raise HTTPException(status_code=400, detail="Name cannot be empty")
     
-    vehicle_type = db.query(_models.VehicleType).filter(_models.VehicleType.id == vehicle_type_id).first()
+    vehicle_type = await maybe_await(db.get(_models.VehicleType, vehicle_type_id))
     if vehicle_type:
         vehicle_type.type_name = vehicle_type_data.type_name
-        db.commit()
-        db.refresh(vehicle_type)
+        await maybe_await(db.commit())
+        await maybe_await(db.refresh(vehicle_type))
         return _schemas.VehicleType.model_validate(vehicle_type)
     return None
 
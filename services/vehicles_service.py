@@ -1,18 +1,27 @@
+from sqlalchemy import select, delete, func, insert
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager, joinedload, selectinload
 import models as _models
 import schemas as _schemas
 from fastapi import HTTPException, status
 from datetime import datetime, timezone
-from typing import Optional, Union
+from typing import List, Optional, Union
+import base64
+import binascii
+import json
 from services.states_management_service import register_state_history_service
+from responses import validate_list
+from services.database_service import maybe_await
+from services.state_machine_service import get_state_machine_service
+from services.vehicle_counters_service import apply_state_count_deltas, apply_registration_deltas, registration_day
 from services.exceptions import (
     VehicleNotFound,
     VehicleModelNotFound,
     VINAlreadyExists,
     InvalidVIN,
     ColorNotFound,
-    InitialStateNotFound
+    InitialStateNotFound,
+    InvalidCursor
 )
 from constants.exceptions import (
     VEHICLE_MODEL_NOT_FOUND,
@@ -20,10 +29,59 @@ from constants.exceptions import (
     INITIAL_STATE_NOT_FOUND,
     VEHICLE_NOT_FOUND,
     VIN_ALREADY_EXISTS,
-    INVALID_VIN
+    VEHICLE_BATCH_CONFLICT,
+    INVALID_VIN,
+    INVALID_CURSOR
 )
 
 
+# Relaciones que necesita schemas.Vehicle; se cargan de forma explícita porque
+# AsyncSession no admite lazy loading y para evitar N+1 consultas al serializar.
+
+# Listados: el estado sale del join con State y modelo/marca y color se cargan
+# con un SELECT ... IN por relación (3 sentencias sin importar el tamaño de la página).
+VEHICLE_LIST_LOAD_OPTIONS = (
+    contains_eager(_models.Vehicle.status),
+    selectinload(_models.Vehicle.model).joinedload(_models.Model.brand, innerjoin=True),
+    selectinload(_models.Vehicle.color),
+)
+
+# Vista compacta de los listados: columnas de schemas.VehicleListItem, sin entidades ORM.
+VEHICLE_LIST_ITEM_COLUMNS = (
+    _models.Vehicle.id,
+    _models.Vehicle.vin,
+    _models.Brand.name.label("brand_name"),
+    _models.Model.name.label("model_name"),
+    _models.Color.hex_code.label("color_hex"),
+    _models.State.code.label("state_code"),
+    _models.Vehicle.is_urgent,
+)
+
+# Detalle: un único vehículo, todo el grafo en una sola sentencia con JOINs.
+VEHICLE_DETAIL_LOAD_OPTIONS = (
+    joinedload(_models.Vehicle.model).joinedload(_models.Model.brand, innerjoin=True),
+    joinedload(_models.Vehicle.color),
+    joinedload(_models.Vehicle.status, innerjoin=True),
+)
+
+
+async def _reload_vehicle(vehicle_id: int, db: Session) -> _models.Vehicle:
+    result = await maybe_await(db.execute(
+        select(_models.Vehicle)
+        .options(*VEHICLE_DETAIL_LOAD_OPTIONS)
+        .where(_models.Vehicle.id == vehicle_id)
+        .execution_options(populate_existing=True)
+    ))
+    return result.scalars().first()
+
+
+async def get_vehicle_by_vin_service(db: Session, vin: str):
+    result = await maybe_await(db.execute(
+        select(_models.Vehicle).where(_models.Vehicle.vin == vin).limit(1)
+    ))
+    return result.scalars().first()
+
+
 async def create_vehicle_service(
     vehicle: _schemas.VehicleCreate, db: Session, user_id: int
 ) -> _schemas.Vehicle:
@@ -33,17 +91,17 @@ async def create_vehicle_service(
     """
 
     # Verificar si el modelo de vehículo existe
-    existing_model = db.query(_models.Model).filter(_models.Model.id == vehicle.vehicle_model_id).first()
+    existing_model = await maybe_await(db.get(_models.Model, vehicle.vehicle_model_id))
     if not existing_model:
         raise VehicleModelNotFound(VEHICLE_MODEL_NOT_FOUND)
 
     # Verificar si existe el color en el sistema
-    color = db.query(_models.Color).filter(_models.Color.id == vehicle.color_id).first()
+    color = await maybe_await(db.get(_models.Color, vehicle.color_id))
     if not color:
         raise ColorNotFound(COLOR_NOT_FOUND)
 
-    # Obtener el estado inicial desde la base de datos
-    initial_state = db.query(_models.State).filter_by(is_initial=True).first()
+    # Obtener el estado inicial de la máquina de estados en memoria
+    initial_state = (await get_state_machine_service(db)).initial_state
     if not initial_state:
         raise InitialStateNotFound(INITIAL_STATE_NOT_FOUND)
 
@@ -58,16 +116,16 @@ async def create_vehicle_service(
         updated_at=datetime.now(timezone.utc)
     )
 
-    # Agregar y confirmar la transacción
+    # Agregar y confirmar la transacción (junto con los contadores del dashboard)
     db.add(vehicle_model)
+    await apply_state_count_deltas(db, {initial_state.id: 1})
+    await apply_registration_deltas(db, {registration_day(vehicle_model.created_at): 1})
     try:
-        db.commit()
+        await maybe_await(db.commit())
     except IntegrityError:
-        db.rollback()
+        await maybe_await(db.rollback())
         raise  # Será manejado en el endpoint
 
-    db.refresh(vehicle_model)
-
     # Registrar el estado inicial en el historial
     await register_state_history_service(
         vehicle_id=vehicle_model.id,
@@ -78,47 +136,278 @@ async def create_vehicle_service(
         comment_id=None
     )
 
+    vehicle_model = await _reload_vehicle(vehicle_model.id, db)
     return _schemas.Vehicle.model_validate(vehicle_model)
 
 
-async def get_vehicle_by_id_service(db: Session, vehicle_id: int):
-    vehicle = (
-        db.query(_models.Vehicle)
-        .join(_models.State, _models.Vehicle.status_id == _models.State.id)
-        .filter(_models.Vehicle.id == vehicle_id)
-        .first()
+_ItemStatus = _schemas.VehicleBatchItemStatus
+
+
+def _batch_item(index: int, vin: str, item_status: _ItemStatus, **extra) -> _schemas.VehicleBatchItemResult:
+    return _schemas.VehicleBatchItemResult(index=index, vin=vin, status=item_status, **extra)
+
+
+async def _create_vehicles_batch(
+    vehicles: List[_schemas.VehicleCreate], db: Session, user_id: int, initial_state_id: int
+) -> List[_schemas.VehicleBatchItemResult]:
+    results: List[Optional[_schemas.VehicleBatchItemResult]] = [None] * len(vehicles)
+
+    # Validación por conjuntos: una consulta para modelos, otra para colores y otra para VINs
+    model_ids = {vehicle.vehicle_model_id for vehicle in vehicles}
+    color_ids = {vehicle.color_id for vehicle in vehicles}
+    vins = {vehicle.vin for vehicle in vehicles if vehicle.vin.strip()}
+
+    result = await maybe_await(db.execute(select(_models.Model.id).where(_models.Model.id.in_(model_ids))))
+    existing_models = set(result.scalars().all())
+    result = await maybe_await(db.execute(select(_models.Color.id).where(_models.Color.id.in_(color_ids))))
+    existing_colors = set(result.scalars().all())
+    existing_vins = {}
+    if vins:
+        result = await maybe_await(db.execute(
+            select(_models.Vehicle.vin, _models.Vehicle.id).where(_models.Vehicle.vin.in_(vins))
+        ))
+        existing_vins = dict(result.all())
+
+    now = datetime.now(timezone.utc)
+    pending = {}  # vin -> índices que lo referencian (el primero es el que se inserta)
+    rows = []
+    for index, vehicle in enumerate(vehicles):
+        if not vehicle.vin.strip():
+            results[index] = _batch_item(index, vehicle.vin, _ItemStatus.error, error=INVALID_VIN)
+        elif vehicle.vin in existing_vins:
+            results[index] = _batch_item(index, vehicle.vin, _ItemStatus.exists, id=existing_vins[vehicle.vin])
+        elif vehicle.vin in pending:
+            # VIN repetido dentro del mismo lote: se trata como ya existente
+            pending[vehicle.vin].append(index)
+        elif vehicle.vehicle_model_id not in existing_models:
+            results[index] = _batch_item(index, vehicle.vin, _ItemStatus.error, error=VEHICLE_MODEL_NOT_FOUND)
+        elif vehicle.color_id not in existing_colors:
+            results[index] = _batch_item(index, vehicle.vin, _ItemStatus.error, error=COLOR_NOT_FOUND)
+        else:
+            pending[vehicle.vin] = [index]
+            rows.append({
+                **vehicle.model_dump(),
+                "status_id": initial_state_id,
+                "created_at": now,
+                "updated_at": now,
+            })
+
+    if rows:
+        # INSERT multi-fila de vehículos y de su estado inicial en el historial
+        result = await maybe_await(db.execute(
+            insert(_models.Vehicle).returning(_models.Vehicle.id, _models.Vehicle.vin),
+            rows
+        ))
+        created_ids = {vin: vehicle_id for vehicle_id, vin in result.all()}
+        await maybe_await(db.execute(insert(_models.StateHistory), [
+            {
+                "vehicle_id": created_ids[row["vin"]],
+                "from_state_id": None,
+                "to_state_id": initial_state_id,
+                "user_id": user_id,
+                "timestamp": now,
+                "comment_id": None,
+            }
+            for row in rows
+        ]))
+        await apply_state_count_deltas(db, {initial_state_id: len(rows)})
+        await apply_registration_deltas(db, {registration_day(now): len(rows)})
+        for vin, (first, *repeated) in pending.items():
+            results[first] = _batch_item(first, vin, _ItemStatus.created, id=created_ids[vin])
+            for index in repeated:
+                results[index] = _batch_item(index, vin, _ItemStatus.exists, id=created_ids[vin])
+
+    await maybe_await(db.commit())
+    return results
+
+
+# Intentos del alta masiva si otras altas concurrentes insertan sus VINs a la vez
+VEHICLE_BATCH_MAX_ATTEMPTS = 3
+
+
+async def create_vehicles_batch_service(
+    vehicles: List[_schemas.VehicleCreate], db: Session, user_id: int
+) -> _schemas.VehicleBatchResult:
+    """
+    Alta masiva de vehículos (descarga de un camión). Valida modelos, colores y
+    VINs existentes con una consulta por conjunto e inserta los vehículos y su
+    estado inicial con INSERTs multi-fila en una sola transacción. Devuelve el
+    resultado de cada elemento: creado, ya existente o error.
+    """
+    initial_state = (await get_state_machine_service(db)).initial_state
+    if not initial_state:
+        raise InitialStateNotFound(INITIAL_STATE_NOT_FOUND)
+
+    for _attempt in range(VEHICLE_BATCH_MAX_ATTEMPTS):
+        try:
+            items = await _create_vehicles_batch(vehicles, db, user_id, initial_state.id)
+            break
+        except IntegrityError:
+            # Otro alta concurrente insertó alguno de los VINs: se repite el lote,
+            # que ahora los detectará como existentes.
+            await maybe_await(db.rollback())
+    else:
+        raise VINAlreadyExists(VEHICLE_BATCH_CONFLICT)
+
+    counts = {item_status: 0 for item_status in _ItemStatus}
+    for item in items:
+        counts[item.status] += 1
+    return _schemas.VehicleBatchResult(
+        created=counts[_ItemStatus.created],
+        existing=counts[_ItemStatus.exists],
+        errors=counts[_ItemStatus.error],
+        items=items,
     )
+
+
+async def get_vehicle_by_id_service(db: Session, vehicle_id: int):
+    result = await maybe_await(db.execute(
+        select(_models.Vehicle)
+        .options(*VEHICLE_DETAIL_LOAD_OPTIONS)
+        .where(_models.Vehicle.id == vehicle_id)
+    ))
+    vehicle = result.scalars().first()
     if not vehicle:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=VEHICLE_NOT_FOUND)
     return _schemas.Vehicle.model_validate(vehicle)
 
-async def get_vehicles_service(
-    db: Session,
-    skip: int = 0,
-    limit: int = 20,
+def encode_vehicle_cursor(last_id: int) -> str:
+    """
+    Cursor opaco para la paginación por clave: el id del último vehículo devuelto.
+    """
+    payload = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_vehicle_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))["id"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor(INVALID_CURSOR)
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise InvalidCursor(INVALID_CURSOR)
+    return last_id
+
+
+VIN_LENGTH = 17
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def vin_search_clause(vin: str, vin_match: str = "auto"):
+    """
+    Condición de búsqueda por VIN (sin distinguir mayúsculas). Cada modo está
+    pensado para usar un índice en PostgreSQL (ver migración de índices de VIN):
+    - exact / prefix: btree sobre upper(vin) con varchar_pattern_ops.
+    - suffix / contains: GIN pg_trgm sobre vin (ILIKE).
+    En modo auto, un VIN completo (17 caracteres) se busca por igualdad.
+    """
+    term = vin.strip().upper()
+    if vin_match == "auto":
+        vin_match = "exact" if len(term) == VIN_LENGTH else "contains"
+    if vin_match == "exact":
+        return func.upper(_models.Vehicle.vin) == term
+    escaped = _escape_like(term)
+    if vin_match == "prefix":
+        return func.upper(_models.Vehicle.vin).like(f"{escaped}%", escape="\\")
+    if vin_match == "suffix":
+        return _models.Vehicle.vin.ilike(f"%{escaped}", escape="\\")
+    return _models.Vehicle.vin.ilike(f"%{escaped}%", escape="\\")
+
+
+def _vehicles_query(
     in_progress: Optional[bool] = None,
-    vin: Optional[str] = None
+    vin: Optional[str] = None,
+    vin_match: str = "auto",
+    view: str = "full"
 ):
-    # Iniciamos la consulta con un join al modelo State
-    query = db.query(_models.Vehicle).join(_models.State, _models.Vehicle.status_id == _models.State.id)
+    if view == "compact":
+        # Proyección en una sola sentencia: modelo, marca y color son opcionales (LEFT JOIN)
+        query = (
+            select(*VEHICLE_LIST_ITEM_COLUMNS)
+            .select_from(_models.Vehicle)
+            .join(_models.State, _models.Vehicle.status_id == _models.State.id)
+            .outerjoin(_models.Model, _models.Vehicle.vehicle_model_id == _models.Model.id)
+            .outerjoin(_models.Brand, _models.Model.brand_id == _models.Brand.id)
+            .outerjoin(_models.Color, _models.Vehicle.color_id == _models.Color.id)
+        )
+    else:
+        # Iniciamos la consulta con un join al modelo State
+        query = (
+            select(_models.Vehicle)
+            .join(_models.State, _models.Vehicle.status_id == _models.State.id)
+            .options(*VEHICLE_LIST_LOAD_OPTIONS)
+        )
     
     if in_progress is not None:
         if in_progress:
             # Filtrar vehículos que NO están en un estado final (is_final == False)
-            query = query.filter(_models.State.is_final == False)
+            query = query.where(_models.State.is_final == False)
         else:
             # Filtrar vehículos que están en un estado final (is_final == True)
-            query = query.filter(_models.State.is_final == True)
+            query = query.where(_models.State.is_final == True)
     
     if vin:
-        query = query.filter(_models.Vehicle.vin.ilike(f"%{vin}%"))
-    
-    vehicles = query.offset(skip).limit(limit).all()
-    return list(map(_schemas.Vehicle.model_validate, vehicles))
+        query = query.where(vin_search_clause(vin, vin_match))
+
+    # Orden estable por clave primaria: la paginación es determinista
+    return query.order_by(_models.Vehicle.id)
+
+async def get_vehicles_service(
+    db: Session,
+    skip: int = 0,
+    limit: int = 20,
+    in_progress: Optional[bool] = None,
+    vin: Optional[str] = None,
+    vin_match: str = "auto",
+    view: str = "full"
+):
+    query = _vehicles_query(in_progress=in_progress, vin=vin, vin_match=vin_match, view=view)
+    result = await maybe_await(db.execute(query.offset(skip).limit(limit)))
+    if view == "compact":
+        return validate_list(_schemas.VehicleListItem, result.all())
+    vehicles = result.scalars().all()
+    return validate_list(_schemas.Vehicle, vehicles)
+
+async def get_vehicles_page_service(
+    db: Session,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    in_progress: Optional[bool] = None,
+    vin: Optional[str] = None,
+    vin_match: str = "auto",
+    view: str = "full"
+) -> Union[_schemas.VehiclePage, _schemas.VehicleListItemPage]:
+    """
+    Paginación por clave (keyset): filtra por id > último id visto en lugar de
+    usar OFFSET, así cualquier página cuesta lo mismo que la primera.
+    """
+    query = _vehicles_query(in_progress=in_progress, vin=vin, vin_match=vin_match, view=view)
+    if cursor:
+        query = query.where(_models.Vehicle.id > decode_vehicle_cursor(cursor))
+
+    # Se pide un elemento extra para saber si existe una página siguiente
+    result = await maybe_await(db.execute(query.limit(limit + 1)))
+    vehicles = result.all() if view == "compact" else result.scalars().all()
+    has_more = len(vehicles) > limit
+    vehicles = vehicles[:limit]
+    next_cursor = encode_vehicle_cursor(vehicles[-1].id) if has_more else None
+    if view == "compact":
+        return _schemas.VehicleListItemPage(
+            items=validate_list(_schemas.VehicleListItem, vehicles),
+            next_cursor=next_cursor,
+        )
+    return _schemas.VehiclePage(
+        items=validate_list(_schemas.Vehicle, vehicles),
+        next_cursor=next_cursor,
+    )
 
 async def update_vehicle_service(db: Session, vehicle_id: int, vehicle: _schemas.VehicleUpdate):
     # Fetch the vehicle to update
-    db_vehicle = db.query(_models.Vehicle).filter(_models.Vehicle.id == vehicle_id).first()
+    db_vehicle = await maybe_await(db.get(_models.Vehicle, vehicle_id))
     if not db_vehicle:
         raise VehicleNotFound(VEHICLE_NOT_FOUND)
     
@@ -128,14 +417,12 @@ async def update_vehicle_service(db: Session, vehicle_id: int, vehicle: _schemas
     
     # Check if the VIN is being changed
     if vehicle.vin != db_vehicle.vin:
-        existing_vehicle = db.query(_models.Vehicle).filter(
-            _models.Vehicle.vin == vehicle.vin
-        ).first()
+        existing_vehicle = await get_vehicle_by_vin_service(db, vehicle.vin)
         if existing_vehicle:
             raise VINAlreadyExists(VIN_ALREADY_EXISTS)
     
     # Verify if the vehicle model exists
-    existing_model = db.query(_models.Model).filter(_models.Model.id == vehicle.vehicle_model_id).first()
+    existing_model = await maybe_await(db.get(_models.Model, vehicle.vehicle_model_id))
     if not existing_model:
         raise VehicleModelNotFound(VEHICLE_MODEL_NOT_FOUND)
     
@@ -146,18 +433,18 @@ async def update_vehicle_service(db: Session, vehicle_id: int, vehicle: _schemas
     db_vehicle.is_urgent = vehicle.is_urgent
     
     try:
-        db.commit()
-        db.refresh(db_vehicle)
+        await maybe_await(db.commit())
     except IntegrityError:
-        db.rollback()
+        await maybe_await(db.rollback())
         raise VINAlreadyExists(VIN_ALREADY_EXISTS)
     
+    db_vehicle = await _reload_vehicle(vehicle_id, db)
     return _schemas.Vehicle.model_validate(db_vehicle)
 
 async def delete_vehicle_service(db: "Session", vehicle_id: int) -> Union[bool, dict]:
     try:
         # Buscar el vehículo por su ID
-        db_vehicle = db.query(_models.Vehicle).filter(_models.Vehicle.id == vehicle_id).first()
+        db_vehicle = await maybe_await(db.get(_models.Vehicle, vehicle_id))
 
         if not db_vehicle:
             # Si el vehículo no existe, lanzar una excepción HTTP 404
@@ -167,13 +454,18 @@ async def delete_vehicle_service(db: "Session", vehicle_id: int) -> Union[bool,
             )
         
         # Eliminar los registros asociados en StateHistory
-        db.query(_models.StateHistory).filter(_models.StateHistory.vehicle_id == vehicle_id).delete()
+        await maybe_await(db.execute(
+            delete(_models.StateHistory).where(_models.StateHistory.vehicle_id == vehicle_id)
+        ))
         
-        # Eliminar el vehículo
-        db.delete(db_vehicle)
+        # Eliminar el vehículo y descontarlo de su estado
+        await maybe_await(db.delete(db_vehicle))
+        await apply_state_count_deltas(db, {db_vehicle.status_id: -1})
+        if db_vehicle.created_at is not None:
+            await apply_registration_deltas(db, {registration_day(db_vehicle.created_at): -1})
         
         # Confirmar la transacción
-        db.commit()
+        await maybe_await(db.commit())
         
         return {"detail": "Vehicle successfully deleted"}
     
@@ -183,7 +475,7 @@ async def delete_vehicle_service(db: "Session", vehicle_id: int) -> Union[bool,
     
     except Exception as exc:
         # En caso de otros errores, re-levantar una excepción HTTP 500
-        db.rollback()
+        await maybe_await(db.rollback())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An error occurred while deleting the vehicle: {str(exc)}"
@@ -2,12 +2,14 @@
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from main import app
 from dependencies import get_db
-from models import Base, Brand
+from models import Base, Brand, User
+from utils import create_access_token, access_token_claims
 import uuid
 import httpx
 from fastapi import status
@@ -62,6 +64,55 @@ def client(db):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture(scope="function")
+def async_client(monkeypatch):
+    """
+    TestClient en modo DB_MODE=async: get_db y session_scope entregan AsyncSession
+    sobre la misma base de pruebas (driver aiosqlite).
+    """
+    import database
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    # Sin pool: cada conexión se abre y se cierra en el bucle de eventos del TestClient
+    async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+    monkeypatch.setattr(database, "ASYNC_DB", True)
+    monkeypatch.setattr(database, "async_engine", async_engine)
+    monkeypatch.setattr(database, "AsyncSessionLocal", async_sessionmaker(
+        bind=async_engine, autoflush=False, expire_on_commit=False
+    ))
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(scope="function")
+def sql_statements():
+    """
+    Registra las sentencias SQL ejecutadas por cualquier motor durante la prueba.
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture(scope="function")
+def local_auth_headers(db):
+    """
+    Crea un usuario en la base de datos de pruebas y devuelve sus encabezados de autorización.
+    """
+    user = User(username=f"user_{uuid.uuid4().hex}", hashed_password="x")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    token = create_access_token(data=access_token_claims(user))
+    return {"Authorization": f"Bearer {token}"}
+
+
 @pytest.fixture(scope="session")
 def httpx_client():
     """
@@ -2,6 +2,21 @@
 import pytest
 import uuid
 import httpx
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+import utils
+from main import app
+from dependencies import get_db
+from services import database_service, password_service, refresh_token_service, token_revocation_service
+from executors import ExecutorSaturated
+from constants.exceptions import REFRESH_TOKEN_REUSED
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from jose import jwt
+from sqlalchemy import update
+from models import RefreshToken, User, UserRole
+from services.auth_service import user_cache
 
 # Generar un nombre de usuario único para la prueba
 unique_username = f"user_{uuid.uuid4().hex}"
@@ -85,3 +100,347 @@ def test_register_login_refresh_logout():
         # Dependiendo de cómo manejes los access tokens, esto podría seguir funcionando hasta que expire
         response = client.get("/protected", headers=new_headers)
         assert response.status_code == 200  # Sigue siendo válido hasta que expire
+
+
+def test_single_session_and_user_lookup_per_request(db, local_auth_headers, sql_statements, monkeypatch):
+    """
+    get_current_user se declara en el router y en el endpoint: debe abrirse una
+    sola sesión y consultarse el usuario una sola vez por petición.
+    """
+    # Los routers y get_current_user deben compartir la misma dependencia de sesión
+    assert database_service.get_db is get_db
+    monkeypatch.setattr(utils, "AUTH_STATELESS", False)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+    sessions = []
+
+    def counting_get_db():
+        session = session_factory()
+        sessions.append(session)
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = counting_get_db
+    try:
+        with TestClient(app) as client:
+            sql_statements.clear()
+            response = client.get("/api/dashboard/vehicles/non-final-status", headers=local_auth_headers)
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200, response.text
+    assert len(sessions) == 1
+    assert len([s for s in sql_statements if "FROM users" in s]) == 1
+
+
+def test_login_rehashes_password_when_bcrypt_rounds_change(client, db, monkeypatch):
+    """
+    Un login correcto con un hash de otro coste lo sustituye por uno con BCRYPT_ROUNDS.
+    """
+    username = f"user_{uuid.uuid4().hex}"
+    user = User(username=username, hashed_password=password_service.hash_password("1234", rounds=4))
+    db.add(user)
+    db.commit()
+    monkeypatch.setattr(password_service, "BCRYPT_ROUNDS", 5)
+
+    response = client.post("/login", data={"username": username, "password": "wrong"})
+    assert response.status_code == 401
+    db.refresh(user)
+    assert user.hashed_password.startswith("$2b$04$")
+
+    response = client.post("/login", data={"username": username, "password": "1234"})
+    assert response.status_code == 200, response.text
+    db.refresh(user)
+    assert user.hashed_password.startswith("$2b$05$")
+
+    response = client.post("/login", data={"username": username, "password": "1234"})
+    assert response.status_code == 200, response.text
+
+
+def test_login_and_register_return_503_when_hashing_pool_is_full(client, db, monkeypatch):
+    async def saturated(*args):
+        raise ExecutorSaturated("password_hash")
+
+    username = f"user_{uuid.uuid4().hex}"
+    db.add(User(username=username, hashed_password=password_service.hash_password("1234", rounds=4)))
+    db.commit()
+    monkeypatch.setattr(password_service.hash_executor, "run", saturated)
+
+    response = client.post("/login", data={"username": username, "password": "1234"})
+    assert response.status_code == 503, response.text
+    assert response.headers["Retry-After"] == str(password_service.PASSWORD_HASH_RETRY_AFTER)
+
+    response = client.post("/register", json={"username": f"user_{uuid.uuid4().hex}", "password": "1234"})
+    assert response.status_code == 503, response.text
+
+
+def test_refresh_tokens_stored_by_jti_and_purged(client, db, monkeypatch):
+    """
+    Se guarda solo el jti de cada refresh token; /refresh y /logout lo buscan por
+    jti y la purga borra por lotes los caducados y los revocados.
+    """
+    username = f"user_{uuid.uuid4().hex}"
+    user = User(username=username, hashed_password=password_service.hash_password("1234", rounds=4))
+    db.add(user)
+    db.commit()
+
+    response = client.post("/login", data={"username": username, "password": "1234"})
+    assert response.status_code == 200, response.text
+    first = response.json()["refresh_token"]
+    stored = db.query(RefreshToken).filter(RefreshToken.user_id == user.id).one()
+    assert stored.jti == jwt.get_unverified_claims(first)["jti"]
+
+    response = client.post("/refresh", json={"refresh_token": first})
+    assert response.status_code == 200, response.text
+    second = response.json()["refresh_token"]
+    assert client.post("/logout", json={"refresh_token": second}).status_code == 200
+    assert client.post("/logout", json={"refresh_token": second}).status_code == 400
+
+    # Un tercer token vigente no se purga; los dos revocados sí, al vencer la retención
+    response = client.post("/login", data={"username": username, "password": "1234"})
+    third_jti = jwt.get_unverified_claims(response.json()["refresh_token"])["jti"]
+    db.expire_all()
+    assert asyncio.run(refresh_token_service.purge_refresh_tokens_service(db, batch_size=1)) == 0
+    monkeypatch.setattr(refresh_token_service, "REFRESH_TOKEN_REVOKED_RETENTION", 0)
+    assert asyncio.run(refresh_token_service.purge_refresh_tokens_service(db, batch_size=1)) == 2
+    remaining = db.query(RefreshToken.jti).filter(RefreshToken.user_id == user.id).all()
+    assert [jti for jti, in remaining] == [third_jti]
+
+
+def test_refresh_rotation_is_atomic_and_detects_reuse(client, db, sql_statements):
+    """
+    /refresh revoca y emite en una transacción (UPDATE ... RETURNING + INSERT); volver
+    a presentar un token ya rotado revoca todas las sesiones del usuario.
+    """
+    username = f"user_{uuid.uuid4().hex}"
+    user = User(username=username, hashed_password=password_service.hash_password("1234", rounds=4))
+    db.add(user)
+    db.commit()
+    response = client.post("/login", data={"username": username, "password": "1234"})
+    first = response.json()["refresh_token"]
+    other_session = client.post("/login", data={"username": username, "password": "1234"}).json()["refresh_token"]
+
+    sql_statements.clear()
+    response = client.post("/refresh", json={"refresh_token": first})
+    assert response.status_code == 200, response.text
+    second = response.json()["refresh_token"]
+    writes = [s for s in sql_statements if s.lstrip().upper().startswith(("UPDATE", "INSERT"))]
+    assert len(writes) == 2, sql_statements
+    assert "RETURNING" in writes[0].upper()
+
+    response = client.post("/refresh", json={"refresh_token": first})
+    assert response.status_code == 401
+    assert response.json()["detail"] == REFRESH_TOKEN_REUSED
+    for token in (second, other_session):
+        assert client.post("/refresh", json={"refresh_token": token}).status_code == 401
+    db.expire_all()
+    assert db.query(RefreshToken).filter(RefreshToken.user_id == user.id, RefreshToken.is_revoked == False).count() == 0
+
+
+def test_refresh_after_logout_is_not_reuse(client, db):
+    """
+    Un token revocado en un logout se rechaza sin tratarlo como reutilizado: las
+    demás sesiones del usuario siguen vigentes.
+    """
+    username = f"user_{uuid.uuid4().hex}"
+    db.add(User(username=username, hashed_password=password_service.hash_password("1234", rounds=4)))
+    db.commit()
+    logged_out = client.post("/login", data={"username": username, "password": "1234"}).json()["refresh_token"]
+    other_session = client.post("/login", data={"username": username, "password": "1234"}).json()["refresh_token"]
+    assert client.post("/logout", json={"refresh_token": logged_out}).status_code == 200
+
+    response = client.post("/refresh", json={"refresh_token": logged_out})
+    assert response.status_code == 401
+    assert response.json()["detail"] != REFRESH_TOKEN_REUSED
+    response = client.post("/refresh", json={"refresh_token": other_session})
+    assert response.status_code == 200, response.text
+    db.expire_all()
+    rotated = db.query(RefreshToken).filter(RefreshToken.jti == jwt.get_unverified_claims(other_session)["jti"]).one()
+    assert rotated.replaced_by == jwt.get_unverified_claims(response.json()["refresh_token"])["jti"]
+
+
+def test_logout_revokes_access_token_until_it_expires(client, db):
+    """
+    El logout con cabecera Authorization revoca el access token; get_current_user lo
+    rechaza consultando la lista en memoria. Las entradas caducadas no cuentan.
+    """
+    username = f"user_{uuid.uuid4().hex}"
+    db.add(User(username=username, hashed_password=password_service.hash_password("1234", rounds=4)))
+    db.commit()
+    tokens = client.post("/login", data={"username": username, "password": "1234"}).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/users/me", headers=headers).status_code == 200
+
+    response = client.post("/logout", json={"refresh_token": tokens["refresh_token"]}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert client.get("/users/me", headers=headers).status_code == 401
+    tokens = client.post("/login", data={"username": username, "password": "1234"}).json()
+    assert client.get("/users/me", headers={"Authorization": f"Bearer {tokens['access_token']}"}).status_code == 200
+
+    revocations = token_revocation_service.RevocationList(purge_interval=0)
+    revocations.add("caducado", time.time() - 1)
+    revocations.add("vigente", time.time() + 60)
+    assert not revocations.is_revoked("caducado") and revocations.is_revoked("vigente")
+    assert not revocations.is_revoked(None)
+    assert len(revocations) == 1
+
+
+def test_access_token_revocation_applies_on_commit_and_is_purged(db):
+    """
+    La revocación solo se aplica (en este worker y en el resto) si la transacción se
+    confirma; la tabla permite recargarla y la purga periódica borra las caducadas.
+    """
+    from models import RevokedAccessToken
+
+    service = token_revocation_service
+    rolled_back, committed, expired = (str(uuid.uuid4()) for _ in range(3))
+
+    asyncio.run(service.revoke_access_token_service(db, rolled_back, time.time() + 60))
+    db.rollback()
+    assert not service.is_access_token_revoked(rolled_back)
+
+    asyncio.run(service.revoke_access_token_service(db, committed, time.time() + 60))
+    assert not service.is_access_token_revoked(committed)
+    db.commit()
+    assert service.is_access_token_revoked(committed)
+
+    # Un worker que arranca (o reconecta) carga las revocaciones vigentes de la tabla
+    service.revocation_list.clear()
+    asyncio.run(service.load_revoked_access_tokens())
+    assert service.is_access_token_revoked(committed)
+    assert not service.is_access_token_revoked(rolled_back)
+
+    db.add(RevokedAccessToken(jti=expired, expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+    db.commit()
+    assert asyncio.run(service.purge_revoked_access_tokens_service(db)) >= 1
+    remaining = {jti for jti, in db.query(RevokedAccessToken.jti).filter(RevokedAccessToken.jti.in_([committed, expired]))}
+    assert remaining == {committed}
+
+
+def test_local_notification_backend_warns_with_several_workers(monkeypatch, caplog):
+    """Con el backend local y varios workers, las revocaciones no llegarían al resto: se avisa al arrancar."""
+    import database
+    from services.notification_service import LocalNotificationBackend
+
+    monkeypatch.setattr(database, "WEB_CONCURRENCY", 1)
+    with caplog.at_level("WARNING", logger="services.notification_service"):
+        asyncio.run(LocalNotificationBackend().start())
+    assert not caplog.records
+
+    monkeypatch.setattr(database, "WEB_CONCURRENCY", 4)
+    with caplog.at_level("WARNING", logger="services.notification_service"):
+        asyncio.run(LocalNotificationBackend().start())
+    assert "NOTIFICATION_BACKEND=postgres" in caplog.text
+
+
+@pytest.fixture
+def stateless_client(db, monkeypatch):
+    """
+    TestClient con AUTH_STATELESS activado y una sesión nueva por petición (sin el
+    identity map de `db`), para contar las consultas reales a users.
+    """
+    monkeypatch.setattr(utils, "AUTH_STATELESS", True)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+
+    def fresh_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    user_cache.clear()
+    app.dependency_overrides[get_db] = fresh_db
+    try:
+        with TestClient(app) as client:
+            yield client
+    finally:
+        app.dependency_overrides.clear()
+        user_cache.clear()
+
+
+def _stateless_user(db):
+    user = User(username=f"user_{uuid.uuid4().hex}", hashed_password="x")
+    db.add(user)
+    db.commit()
+    headers = {"Authorization": f"Bearer {utils.create_access_token(data=utils.access_token_claims(user))}"}
+    return user, headers
+
+
+def _users_queries(statements):
+    return [s for s in statements if "FROM users" in s]
+
+
+def test_stateless_auth_cache_hit_skips_users_query(stateless_client, db, sql_statements):
+    """Con el usuario en caché, una petición autenticada no consulta la tabla users."""
+    user, headers = _stateless_user(db)
+
+    sql_statements.clear()
+    assert stateless_client.get("/users/me", headers=headers).status_code == 200
+    assert len(_users_queries(sql_statements)) == 1
+
+    sql_statements.clear()
+    response = stateless_client.get("/users/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["id"] == user.id
+    assert _users_queries(sql_statements) == []
+
+
+def test_stateless_auth_role_or_active_change_evicts_cache(stateless_client, db, sql_statements):
+    """
+    Un cambio confirmado de role o is_active invalida la entrada: el token con el
+    rol anterior deja de valer, uno nuevo ve el rol nuevo y un usuario inactivo recibe 401.
+    """
+    user, headers = _stateless_user(db)
+    assert stateless_client.get("/users/me", headers=headers).json()["role"] == UserRole.client.value
+
+    user.role = UserRole.admin
+    db.commit()
+    sql_statements.clear()
+    assert stateless_client.get("/users/me", headers=headers).status_code == 401
+    assert len(_users_queries(sql_statements)) == 1
+    headers = {"Authorization": f"Bearer {utils.create_access_token(data=utils.access_token_claims(user))}"}
+    assert stateless_client.get("/users/me", headers=headers).json()["role"] == UserRole.admin.value
+
+    user.is_active = False
+    db.commit()
+    assert stateless_client.get("/users/me", headers=headers).status_code == 401
+
+
+def test_user_change_invalidates_cache_in_other_workers(db):
+    """Un cambio confirmado de role o is_active llega a la caché de los demás workers; si se deshace, no."""
+    from services.auth_service import AuthenticatedUser, USER_TOPIC, UserCache, invalidate_user
+    from services.notification_service import NotificationBus, notification_bus
+
+    other_cache = UserCache()
+    other_worker = NotificationBus(notification_bus.backend)
+    other_worker.subscribe(USER_TOPIC, lambda payload: invalidate_user(payload, other_cache))
+    user, _ = _stateless_user(db)
+    other_cache.set(AuthenticatedUser.from_user(user))
+
+    user.is_active = False
+    db.flush()
+    db.rollback()
+    assert other_cache.get(user.id) is not None
+
+    user.role = UserRole.admin
+    db.commit()
+    assert other_cache.get(user.id) is None
+
+
+def test_stateless_auth_reloads_user_after_ttl(stateless_client, db, sql_statements, monkeypatch):
+    """Un cambio hecho sin pasar por el ORM (sin invalidación) se ve al caducar la entrada."""
+    monkeypatch.setattr(user_cache, "ttl", 0.2)
+    user, headers = _stateless_user(db)
+    assert stateless_client.get("/users/me", headers=headers).status_code == 200
+
+    db.execute(update(User).where(User.id == user.id).values(role=UserRole.admin))
+    db.commit()
+    assert stateless_client.get("/users/me", headers=headers).json()["role"] == UserRole.client.value
+
+    time.sleep(0.3)
+    sql_statements.clear()
+    # La entrada caducada se recarga con el rol nuevo, que ya no es el del token
+    assert stateless_client.get("/users/me", headers=headers).status_code == 401
+    assert len(_users_queries(sql_statements)) == 1
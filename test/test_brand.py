@@ -2,6 +2,16 @@
 import pytest
 import uuid
 from fastapi import status
+import time
+import models
+from services.notification_service import NotificationBus, notification_bus
+from services.response_cache_service import (
+    CATALOG_TOPIC,
+    CachedResponse,
+    ResponseCache,
+    invalidate_tables,
+    response_cache,
+)
 
 @pytest.fixture
 def unique_brand_name():
@@ -132,3 +142,59 @@ async def test_update_brand_with_invalid_token(httpx_client, unique_brand_name):
     update_data = {"name": "Updated Name"}
     response = httpx_client.put(f"/api/brands/{brand_id}", headers=invalid_headers, json=update_data)
     assert response.status_code in [status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN]
+
+
+def test_brands_list_cached_with_etag(client, db, local_auth_headers, sql_statements, unique_brand_name):
+    """El listado de marcas se sirve desde la caché, con ETag y 304, y se invalida al crear una marca."""
+    response = client.get("/api/brands?limit=1000", headers=local_auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"].startswith("private")
+
+    sql_statements.clear()
+    response = client.get("/api/brands?limit=1000", headers=local_auth_headers)
+    assert response.headers["ETag"] == etag
+    assert not [statement for statement in sql_statements if "FROM brands" in statement]
+
+    response = client.get("/api/brands?limit=1000", headers={**local_auth_headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+    response = client.post("/api/brands", json={"name": unique_brand_name}, headers=local_auth_headers)
+    assert response.status_code == status.HTTP_201_CREATED
+    response = client.get("/api/brands?limit=1000", headers={**local_auth_headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+    assert unique_brand_name in [brand["name"] for brand in response.json()]
+
+
+def test_brand_change_invalidates_models_cache(db, unique_brand_name):
+    """Los modelos incluyen la marca: un cambio en brands invalida también la caché de modelos."""
+    versions = (response_cache.version("brands"), response_cache.version("models"), response_cache.version("colors"))
+    db.add(models.Brand(name=unique_brand_name))
+    db.commit()
+    assert response_cache.version("brands") == versions[0] + 1
+    assert response_cache.version("models") == versions[1] + 1
+    assert response_cache.version("colors") == versions[2]
+
+
+def test_catalog_change_invalidates_cache_in_other_workers(db, unique_brand_name):
+    """Un cambio confirmado en un worker invalida la caché (y el ETag) de los demás; si se deshace, no."""
+    other_cache = ResponseCache()
+    other_worker = NotificationBus(notification_bus.backend)
+    other_worker.subscribe(CATALOG_TOPIC, lambda table: invalidate_tables({table}, other_cache))
+    key = ("models", "/api/models", ())
+    other_cache.set(key, CachedResponse(b"[]", '"stale"', other_cache.version("models"), time.monotonic() + 300))
+    versions = (response_cache.version("brands"), other_cache.version("brands"))
+
+    db.add(models.Brand(name=unique_brand_name))
+    db.flush()
+    db.rollback()
+    assert other_cache.get(key) is not None
+
+    db.add(models.Brand(name=unique_brand_name))
+    db.commit()
+    assert other_cache.get(key) is None
+    assert other_cache.version("brands") == versions[1] + 1
+    # El worker que hace el cambio lo invalida una sola vez (ignora su propio aviso)
+    assert response_cache.version("brands") == versions[0] + 1
@@ -0,0 +1,54 @@
+# tests/test_metrics.py
+import pytest
+from fastapi import status
+from sqlalchemy import create_engine, text
+import database
+
+
+@pytest.mark.parametrize("max_connections,workers,expected", [
+    # Sin presupuesto se usa la configuración tal cual
+    (0, 4, (5, 10)),
+    # Presupuesto holgado: no se recorta
+    (100, 4, (5, 10)),
+    # 30 // 4 = 7 por worker: el pool se mantiene y el overflow se recorta
+    (30, 4, (5, 2)),
+    # 10 // 3 = 3 por worker (se redondea hacia abajo)
+    (10, 3, (3, 0)),
+    # 2 // 8 = 0: como mínimo una conexión por worker
+    (2, 8, (1, 0)),
+])
+def test_pool_settings_split_max_connections(monkeypatch, max_connections, workers, expected):
+    """DB_MAX_CONNECTIONS se reparte entre los WEB_CONCURRENCY workers sin superar el presupuesto."""
+    monkeypatch.setenv("DB_POOL_SIZE", "5")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "10")
+    monkeypatch.setattr(database, "DB_MAX_CONNECTIONS", max_connections)
+    monkeypatch.setattr(database, "WEB_CONCURRENCY", workers)
+
+    settings = database.get_pool_settings()
+    assert (settings["pool_size"], settings["max_overflow"]) == expected
+    if max_connections >= workers:
+        assert (settings["pool_size"] + settings["max_overflow"]) * workers <= max_connections
+
+
+def test_db_pool_metrics_shape(client, local_auth_headers, monkeypatch):
+    """/api/metrics/db-pool devuelve la configuración, el estado de cada pool y las métricas de checkout."""
+    engine = create_engine("sqlite:///./test.db", poolclass=database.InstrumentedQueuePool, pool_size=2, max_overflow=1)
+    monkeypatch.setattr(database, "engine", engine)
+    database.sync_pool_metrics.reset()
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    response = client.get("/api/metrics/db-pool", headers=local_auth_headers)
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+    body = response.json()
+    assert set(body) == {"db_mode", "web_concurrency", "max_connections", "settings", "pools"}
+    assert set(body["settings"]) == set(database.get_pool_settings())
+    pool = body["pools"]["sync"]
+    assert pool["pool_class"] == "InstrumentedQueuePool"
+    assert (pool["size"], pool["checked_in"], pool["checked_out"]) == (2, 1, 0)
+    assert {"overflow", "timeout", "wait_total_ms", "wait_max_ms", "wait_avg_ms"} <= set(pool)
+    assert pool["checkouts"] >= 1 and pool["timeouts"] == 0
+    engine.dispose()
+
+    response = client.get("/api/metrics/db-pool")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,232 @@
+# tests/test_qr_bar_codes.py
+import asyncio
+import io
+import os
+import threading
+import pytest
+from fastapi import status
+from PIL import Image
+from executors import BoundedExecutor, ExecutorSaturated
+from routers import qr_bar_codes_router
+from services import barcode_service
+from constants.exceptions import SCANNER_BUSY, UPLOAD_TOO_LARGE
+
+
+@pytest.mark.asyncio
+async def test_bounded_executor_rejects_when_saturated():
+    """Con todas las plazas ocupadas el ejecutor rechaza la tarea en lugar de encolarla."""
+    executor = BoundedExecutor("test", workers=1, max_pending=2, kind="thread")
+    release = threading.Event()
+    try:
+        running = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(release.wait)
+        assert executor.stats()["rejected"] == 1
+
+        release.set()
+        await asyncio.gather(*running)
+        assert executor.stats()["pending"] == 0
+        assert await executor.run(sum, [1, 2]) == 3
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_scan_returns_429_when_scanner_is_busy(client, local_auth_headers, monkeypatch):
+    """El endpoint responde 429 con Retry-After cuando el pool de escaneo está saturado."""
+    async def saturated(contents, content_type=None, roi=None):
+        raise ExecutorSaturated("scan")
+
+    monkeypatch.setattr(qr_bar_codes_router, "scan_file_service", saturated)
+    buffer = io.BytesIO()
+    Image.new("RGB", (10, 10)).save(buffer, "PNG")
+
+    response = client.post(
+        "/api/scan/v1",
+        files={"file": ("code.png", buffer.getvalue(), "image/png")},
+        headers=local_auth_headers,
+    )
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS, f"Respuesta: {response.text}"
+    assert response.headers["Retry-After"]
+    assert response.json()["detail"] == SCANNER_BUSY
+
+
+class _Decoded:
+    type = "CODE39"
+    data = b"1HGCM82633A004352"
+
+
+def test_scan_pipeline_stops_at_first_scale_with_results(monkeypatch):
+    """Se prueba de menor a mayor escala, en escala de grises, y se para en el primer acierto."""
+    calls = []
+
+    def fake_decode(image):
+        calls.append((image.mode, max(image.size)))
+        return [_Decoded()] if max(image.size) >= 1600 else []
+
+    monkeypatch.setattr(barcode_service, "decode", fake_decode)
+    decoded_objects, stage = barcode_service.scan_pipeline(Image.new("RGB", (4000, 3000)), scales=(800, 1600))
+
+    assert decoded_objects and stage == "full@1600"
+    assert calls == [("L", 800), ("L", 1600)]
+
+
+def test_scan_pipeline_tries_roi_first_and_falls_back_to_full_image(monkeypatch):
+    """La región sugerida se prueba antes que la imagen completa; si no hay resultado se usa la completa."""
+    sizes = []
+
+    def fake_decode(image):
+        sizes.append(image.size)
+        return []
+
+    monkeypatch.setattr(barcode_service, "decode", fake_decode)
+    decoded_objects, stage = barcode_service.scan_pipeline(
+        Image.new("RGB", (1000, 500)), roi=(0.5, 0.5, 0.25, 0.5), scales=()
+    )
+
+    assert decoded_objects == [] and stage is None
+    assert sizes == [(250, 250), (1000, 500)]
+
+
+def test_scan_pipeline_applies_exif_orientation(monkeypatch):
+    """Una foto girada según EXIF se decodifica con su orientación real."""
+    sizes = []
+    monkeypatch.setattr(barcode_service, "decode", lambda image: sizes.append(image.size) or [])
+
+    exif = Image.Exif()
+    exif[0x0112] = 6  # girada 90° en sentido horario
+    buffer = io.BytesIO()
+    Image.new("RGB", (300, 400)).save(buffer, "JPEG", exif=exif.tobytes())
+    barcode_service.scan_pipeline(Image.open(buffer), scales=())
+
+    assert sizes == [(400, 300)]
+
+
+def test_scan_rejects_invalid_region(client, local_auth_headers):
+    """Una región sugerida mal formada o fuera de la imagen devuelve 400."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (10, 10)).save(buffer, "PNG")
+    for roi in ("0.5,0.5", "0.8,0,0.5,0.5", "a,b,c,d"):
+        response = client.post(
+            "/api/scan/v1",
+            files={"file": ("code.png", buffer.getvalue(), "image/png")},
+            data={"roi": roi},
+            headers=local_auth_headers,
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST, f"Respuesta: {response.text}"
+
+
+def test_scan_raw_body_is_size_capped_while_streaming(client, local_auth_headers, monkeypatch):
+    """Un cuerpo binario sin Content-Length que supera el límite se corta con 413 sin dejar ficheros temporales."""
+    spooled = []
+    original_spool = barcode_service.spool_upload
+
+    async def tracking_spool(chunks, max_bytes=None):
+        try:
+            path = await original_spool(chunks, max_bytes)
+        except Exception:
+            spooled.append(None)
+            raise
+        spooled.append(path)
+        return path
+
+    monkeypatch.setattr(barcode_service, "SCAN_MAX_UPLOAD_BYTES", 100)
+    monkeypatch.setattr(barcode_service, "spool_upload", tracking_spool)
+
+    def body():
+        for _ in range(10):
+            yield b"x" * 64
+
+    response = client.post(
+        "/api/scan/v3",
+        content=body(),
+        headers={**local_auth_headers, "Content-Type": "application/octet-stream"},
+    )
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, f"Respuesta: {response.text}"
+    assert response.json()["detail"] == UPLOAD_TOO_LARGE
+    assert spooled == [None]
+
+
+def test_scan_raw_body_decodes_from_spooled_file(client, local_auth_headers, monkeypatch):
+    """/scan/v3 recibe la imagen sin base64 y el pool la abre desde el fichero temporal, que luego se borra."""
+    seen = {}
+
+    def fake_decode(source, content_type=None, roi=None):
+        seen["source"] = source
+        seen["exists"] = os.path.exists(source)
+        return [{"type": "CODE39", "data": "1HGCM82633A004352"}]
+
+    # Pool de hilos para que el decodificador sustituido se use también en la tarea
+    monkeypatch.setattr(barcode_service, "scan_executor", BoundedExecutor("test", workers=1, max_pending=1, kind="thread"))
+    monkeypatch.setattr(barcode_service, "decode_image", fake_decode)
+    buffer = io.BytesIO()
+    Image.new("RGB", (10, 10)).save(buffer, "PNG")
+
+    response = client.post(
+        "/api/scan/v3",
+        content=buffer.getvalue(),
+        headers={**local_auth_headers, "Content-Type": "image/png"},
+    )
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+    assert response.json()["detected_codes"][0]["data"] == "1HGCM82633A004352"
+    assert isinstance(seen["source"], str) and seen["exists"]
+    assert not os.path.exists(seen["source"])
+
+
+
+def test_scan_multipart_upload_is_size_capped_before_parsing(client, local_auth_headers, monkeypatch):
+    """/scan/v1 rechaza por Content-Length antes de leer el formulario, y corta los cuerpos sin Content-Length."""
+    parsed = []
+    monkeypatch.setattr(barcode_service, "SCAN_MAX_UPLOAD_BYTES", 100)
+    monkeypatch.setattr(qr_bar_codes_router, "SCAN_BODY_OVERHEAD", 1024)
+    monkeypatch.setattr(qr_bar_codes_router, "scan_file_service", lambda *args: parsed.append(args))
+
+    response = client.post(
+        "/api/scan/v1",
+        files={"file": ("code.png", b"x" * 4096, "image/png")},
+        headers=local_auth_headers,
+    )
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, f"Respuesta: {response.text}"
+    assert response.json()["detail"] == UPLOAD_TOO_LARGE
+
+    boundary = "limite"
+    def body():
+        yield f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="code.png"\r\n'.encode()
+        yield b"Content-Type: image/png\r\n\r\n"
+        for _ in range(64):
+            yield b"x" * 64
+
+    response = client.post(
+        "/api/scan/v1",
+        content=body(),
+        headers={**local_auth_headers, "Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, f"Respuesta: {response.text}"
+    assert parsed == []
+
+
+def test_scan_multipart_upload_decodes_uploaded_file_without_copy(client, local_auth_headers, monkeypatch):
+    """/scan/v1 pasa al decodificador el fichero de la subida, sin volcarlo a otro fichero temporal."""
+    seen = {}
+
+    def fake_decode(source, content_type=None, roi=None):
+        seen["data"] = source.read()
+        return [{"type": "CODE39", "data": "1HGCM82633A004352"}]
+
+    def no_spool(*args, **kwargs):
+        raise AssertionError("la subida no debe copiarse a otro fichero")
+
+    monkeypatch.setattr(barcode_service, "scan_executor", BoundedExecutor("test", workers=1, max_pending=1, kind="thread"))
+    monkeypatch.setattr(barcode_service, "decode_image", fake_decode)
+    monkeypatch.setattr(barcode_service.tempfile, "NamedTemporaryFile", no_spool)
+    buffer = io.BytesIO()
+    Image.new("RGB", (10, 10)).save(buffer, "PNG")
+
+    response = client.post(
+        "/api/scan/v1",
+        files={"file": ("code.png", buffer.getvalue(), "image/png")},
+        headers=local_auth_headers,
+    )
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+    assert seen["data"] == buffer.getvalue()
@@ -0,0 +1,71 @@
+# tests/test_server_config.py
+import os
+import runpy
+import subprocess
+import sys
+import pytest
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+
+@pytest.fixture
+def load_config(monkeypatch):
+    """
+    Ejecuta gunicorn.conf.py con las variables indicadas. El archivo exporta
+    variables de entorno: monkeypatch las restaura al terminar.
+    """
+    def load(cpu_count, **env):
+        for name in ("WEB_CONCURRENCY", "PASSWORD_HASH_WORKERS", "SCAN_WORKERS", "NOTIFICATION_BACKEND"):
+            monkeypatch.delenv(name, raising=False)
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(cpu_count)))
+        return runpy.run_path(CONFIG_PATH)
+
+    return load
+
+
+def test_gunicorn_config_workers_follow_cpu_count(load_config):
+    """Un worker por núcleo; WEB_CONCURRENCY y los pools de procesos se exportan antes de cargar la app."""
+    config = load_config(8)
+    assert config["workers"] == 8
+    assert config["preload_app"] is True
+    assert config["worker_class"] == "workers.UvicornWorker"
+    assert os.environ["WEB_CONCURRENCY"] == "8"
+    assert (os.environ["PASSWORD_HASH_WORKERS"], os.environ["SCAN_WORKERS"]) == ("1", "1")
+    assert os.environ["NOTIFICATION_BACKEND"] == "postgres"
+
+    config = load_config(8, WEB_CONCURRENCY="3", SCAN_WORKERS="4", NOTIFICATION_BACKEND="local")
+    assert config["workers"] == 3
+    assert os.environ["WEB_CONCURRENCY"] == "3"
+    assert (os.environ["PASSWORD_HASH_WORKERS"], os.environ["SCAN_WORKERS"]) == ("2", "4")
+    assert os.environ["NOTIFICATION_BACKEND"] == "local"
+
+
+def test_gunicorn_preload_then_post_fork():
+    """
+    Simula el maestro con preload_app en un proceso aparte: cargar la configuración
+    e importar la app no arranca los pools de procesos, y post_fork descarta las
+    conexiones heredadas sin cerrarlas.
+    """
+    script = (
+        "import runpy\n"
+        f"config = runpy.run_path({CONFIG_PATH!r})\n"
+        "import main, database\n"
+        "from services.barcode_service import scan_executor\n"
+        "from services.password_service import hash_executor\n"
+        "assert scan_executor._executor is None and hash_executor._executor is None\n"
+        "assert database.WEB_CONCURRENCY == config['workers']\n"
+        "from services.notification_service import PostgresNotificationBackend, notification_bus\n"
+        "assert isinstance(notification_bus.backend, PostgresNotificationBackend)\n"
+        "calls = []\n"
+        "database.engine.dispose = lambda close=True: calls.append(close)\n"
+        "config['post_fork'](None, None)\n"
+        "assert calls == [False], calls\n"
+    )
+    env = dict(os.environ, WEB_CONCURRENCY="2")
+    env.pop("NOTIFICATION_BACKEND", None)
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=os.path.dirname(CONFIG_PATH), env=env, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
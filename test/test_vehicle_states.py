@@ -3,6 +3,14 @@ import pytest
 import uuid
 from fastapi import status
 import pytest_asyncio
+import asyncio
+import models
+from services import password_service
+from services.state_machine_service import get_state_machine_service
+from services.exceptions import UnsupportedDatabaseDialect
+from services.vehicle_counters_service import (
+    check_counters_dialect, get_state_counts_service, reconcile_vehicle_counters_service
+)
 from constants.exceptions import (
     VEHICLE_MODEL_NOT_FOUND,
     COLOR_NOT_FOUND,
@@ -658,38 +666,341 @@ async def test_get_state_comments_state_not_found(
     assert comments_response.json()["detail"] == STATE_NOT_FOUND
 
 
+def _seed_workflow(db, vehicles=1):
+    """
+    Crea un flujo A -> B -> C con un comentario para B y vehículos en el estado A.
+    """
+    suffix = uuid.uuid4().hex[:8]
+    states = [
+        models.State(code=f"A{suffix}", name="A", description="A", is_initial=True),
+        models.State(code=f"B{suffix}", name="B", description="B"),
+        models.State(code=f"C{suffix}", name="C", description="C", is_final=True),
+    ]
+    db.add_all(states)
+    db.flush()
+    db.add_all([
+        models.Transition(from_state_id=states[0].id, to_state_id=states[1].id),
+        models.Transition(from_state_id=states[1].id, to_state_id=states[2].id),
+    ])
+    comment = models.StateComment(state_id=states[1].id, comment="Revisado")
+    other_comment = models.StateComment(state_id=states[2].id, comment="Entregado")
+    vehicle_list = [
+        models.Vehicle(vin=f"WF{suffix.upper()}{i:07d}", status_id=states[0].id) for i in range(vehicles)
+    ]
+    db.add_all([comment, other_comment, *vehicle_list])
+    db.commit()
+    return {
+        "states": [state.id for state in states],
+        "comment_id": comment.id,
+        "other_comment_id": other_comment.id,
+        "vehicle_ids": [vehicle.id for vehicle in vehicle_list],
+    }
 
 
+def test_change_vehicle_state_single_transaction(client, db, local_auth_headers, sql_statements):
+    """El cambio de estado se aplica con un INSERT del historial y un UPDATE condicional, en un único commit."""
+    workflow = _seed_workflow(db)
+    vehicle_id = workflow["vehicle_ids"][0]
+    state_a, state_b, _ = workflow["states"]
 
+    sql_statements.clear()
+    response = client.put(
+        f"/api/vehicles/{vehicle_id}/state",
+        json={"new_state_id": state_b, "comment_id": workflow["comment_id"]},
+        headers=local_auth_headers,
+    )
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+    entry = response.json()
+    assert entry["vehicle_id"] == vehicle_id
+    assert entry["from_state_id"] == state_a
+    assert entry["to_state_id"] == state_b
+    assert entry["comment"]["id"] == workflow["comment_id"]
+
+    writes = [
+        statement for statement in sql_statements
+        if statement.lstrip().startswith(("INSERT", "UPDATE")) and "vehicle_state_counters" not in statement
+    ]
+    assert len(writes) == 2, writes
+    assert len([statement for statement in sql_statements if "vehicle_state_counters" in statement]) == 1
+    assert not any(statement.lstrip().startswith("SELECT") and "FROM vehicles" in statement for statement in sql_statements)
+
+    db.expire_all()
+    assert db.get(models.Vehicle, vehicle_id).status_id == state_b
+    assert db.query(models.StateHistory).filter_by(vehicle_id=vehicle_id).count() == 1
+
+
+def test_async_session_mode(async_client, db):
+    """Login, listado de vehículos y cambio de estado con DB_MODE=async (AsyncSession sobre aiosqlite)."""
+    workflow = _seed_workflow(db, vehicles=2)
+    vehicle_id = workflow["vehicle_ids"][0]
+    state_a, state_b, _ = workflow["states"]
+    # El listado serializa modelo, marca y color
+    suffix = uuid.uuid4().hex
+    model = models.Model(
+        name=f"Test Model {suffix}", brand=models.Brand(name=f"Test Brand {suffix}"),
+        vehicle_type=models.VehicleType(type_name=f"Test Vehicle Type {suffix}"),
+    )
+    color = models.Color(name=f"C{suffix[:20]}", hex_code=f"#{suffix[:6]}")
+    for vehicle in db.query(models.Vehicle).filter(models.Vehicle.id.in_(workflow["vehicle_ids"])):
+        vehicle.model, vehicle.color = model, color
+    username = f"user_{uuid.uuid4().hex}"
+    db.add(models.User(username=username, hashed_password=password_service.hash_password("1234", rounds=4)))
+    db.commit()
+
+    response = async_client.post("/login", data={"username": username, "password": "1234"})
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
 
+    vin_prefix = db.get(models.Vehicle, vehicle_id).vin[:-7]
+    response = async_client.get("/api/vehicles", params={"vin": vin_prefix, "limit": 100}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+    assert [v["id"] for v in response.json()] == workflow["vehicle_ids"]
+    assert all(v["status"]["id"] == state_a for v in response.json())
+
+    response = async_client.put(
+        f"/api/vehicles/{vehicle_id}/state",
+        json={"new_state_id": state_b, "comment_id": workflow["comment_id"]},
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+    assert response.json()["comment"]["id"] == workflow["comment_id"]
+    response = async_client.put(f"/api/vehicles/{vehicle_id}/state", json={"new_state_id": state_b}, headers=headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, f"Respuesta: {response.text}"
+
+    db.expire_all()
+    assert db.get(models.Vehicle, vehicle_id).status_id == state_b
+    assert db.query(models.StateHistory).filter_by(vehicle_id=vehicle_id).count() == 1
+
+
+@pytest.mark.parametrize("case", ["invalid_transition", "invalid_comment", "missing_vehicle", "missing_state"])
+def test_change_vehicle_state_rejected_leaves_no_trace(client, db, local_auth_headers, case):
+    """Un cambio rechazado no modifica el vehículo ni deja filas en el historial."""
+    workflow = _seed_workflow(db)
+    vehicle_id = workflow["vehicle_ids"][0]
+    state_a, state_b, state_c = workflow["states"]
+    payload = {
+        "invalid_transition": {"new_state_id": state_c},
+        "invalid_comment": {"new_state_id": state_b, "comment_id": workflow["other_comment_id"]},
+        "missing_vehicle": {"new_state_id": state_b},
+        "missing_state": {"new_state_id": 999999},
+    }[case]
+    target_id = 999999 if case == "missing_vehicle" else vehicle_id
+    expected_detail = {
+        "invalid_transition": "La transición al nuevo estado no es válida.",
+        "invalid_comment": "El comentario proporcionado no es válido para el estado seleccionado.",
+        "missing_vehicle": "El vehículo no existe.",
+        "missing_state": "El nuevo estado no existe.",
+    }[case]
+
+    response = client.put(f"/api/vehicles/{target_id}/state", json=payload, headers=local_auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, f"Respuesta: {response.text}"
+    assert response.json()["detail"] == expected_detail
+
+    db.expire_all()
+    assert db.get(models.Vehicle, vehicle_id).status_id == state_a
+    assert db.query(models.StateHistory).filter_by(vehicle_id=vehicle_id).count() == 0
+
+
+def test_state_machine_compiles_workflow(client, db, local_auth_headers):
+    """La máquina de estados en memoria refleja transiciones, estados finales y comentarios."""
+    workflow = _seed_workflow(db)
+    state_a, state_b, state_c = workflow["states"]
+
+    response = client.get("/api/states", headers=local_auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert {state_a, state_b, state_c} <= {state["id"] for state in response.json()}
+
+    machine = asyncio.run(get_state_machine_service(db))
+    assert machine.can_transition(state_a, state_b)
+    assert not machine.can_transition(state_a, state_c)
+    assert machine.sources_for(state_c) == {state_b}
+    assert state_c in machine.final_state_ids
+    assert machine.is_valid_comment(state_b, workflow["comment_id"])
+    assert not machine.is_valid_comment(state_b, workflow["other_comment_id"])
+
+
+def test_state_change_uses_cached_workflow(client, db, local_auth_headers, sql_statements):
+    """Con la máquina de estados cargada, el cambio de estado no consulta estados, transiciones ni comentarios."""
+    workflow = _seed_workflow(db, vehicles=2)
+    state_b = workflow["states"][1]
+    first, second = workflow["vehicle_ids"]
+    payload = {"new_state_id": state_b, "comment_id": workflow["comment_id"]}
+
+    response = client.put(f"/api/vehicles/{first}/state", json=payload, headers=local_auth_headers)
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
 
+    sql_statements.clear()
+    response = client.put(f"/api/vehicles/{second}/state", json=payload, headers=local_auth_headers)
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+    assert response.json()["comment"]["id"] == workflow["comment_id"]
+    workflow_queries = [
+        statement for statement in sql_statements
+        if statement.lstrip().startswith("SELECT")
+        and any(table in statement for table in ("FROM states", "FROM transitions", "FROM states_comments"))
+    ]
+    assert workflow_queries == []
+
+
+def test_state_machine_reloads_after_workflow_change(client, db, local_auth_headers):
+    """Al confirmar cambios en las transiciones se recompila la máquina de estados."""
+    workflow = _seed_workflow(db)
+    vehicle_id = workflow["vehicle_ids"][0]
+    state_a, state_b, state_c = workflow["states"]
+
+    response = client.get(f"/api/vehicles/{vehicle_id}/allowed_transitions", headers=local_auth_headers)
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+    assert [transition["to_state_id"] for transition in response.json()] == [state_b]
+
+    db.add(models.Transition(from_state_id=state_a, to_state_id=state_c))
+    db.commit()
+
+    response = client.get(f"/api/vehicles/{vehicle_id}/allowed_transitions", headers=local_auth_headers)
+    assert sorted(transition["to_state_id"] for transition in response.json()) == [state_b, state_c]
+
+
+def test_workflow_change_reloads_state_machine_in_other_workers(db):
+    """Un cambio confirmado en el flujo se avisa al resto de workers, que suben la versión; si se deshace, no."""
+    import dataclasses
+    import time
+    from services import state_machine_service
+    from services.notification_service import NotificationBus, notification_bus
+
+    workflow = _seed_workflow(db)
+    state_a, _, state_c = workflow["states"]
+    received = []
+    other_worker = NotificationBus(notification_bus.backend)
+    other_worker.subscribe(state_machine_service.WORKFLOW_TOPIC, received.append)
+
+    db.add(models.Transition(from_state_id=state_a, to_state_id=state_c))
+    db.flush()
+    db.rollback()
+    assert received == []
+
+    db.add(models.Transition(from_state_id=state_a, to_state_id=state_c))
+    db.commit()
+    assert received == ["transitions"]
+
+    # Aviso de otro worker: la versión sube y la siguiente consulta recompila
+    machine = asyncio.run(get_state_machine_service(db))
+    assert machine.can_transition(state_a, state_c)
+    db.query(models.Transition).filter_by(from_state_id=state_a, to_state_id=state_c).delete()
+    db.commit()
+    # Máquina al día según este worker, como en uno que no hizo el cambio
+    state_machine_service._current = dataclasses.replace(
+        machine, version=state_machine_service._version, loaded_at=time.monotonic()
+    )
+    assert asyncio.run(get_state_machine_service(db)).can_transition(state_a, state_c)
+    notification_bus.receive(f"otro-worker {state_machine_service.WORKFLOW_TOPIC} transitions")
+    assert not asyncio.run(get_state_machine_service(db)).can_transition(state_a, state_c)
+
+
+def test_change_vehicles_state_batch(client, db, local_auth_headers, sql_statements):
+    """El cambio masivo valida en memoria, actualiza en bloque y devuelve el resultado de cada vehículo."""
+    workflow = _seed_workflow(db, vehicles=4)
+    state_a, state_b, _ = workflow["states"]
+    moved, *vehicle_ids = workflow["vehicle_ids"]
+    db.get(models.Vehicle, moved).status_id = state_b
+    db.commit()
+
+    payload = {
+        "vehicle_ids": [moved, *vehicle_ids, 999999, vehicle_ids[0]],
+        "new_state_id": state_b,
+        "comment_id": workflow["comment_id"],
+    }
+    sql_statements.clear()
+    response = client.post("/api/vehicles/state/batch", json=payload, headers=local_auth_headers)
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+    result = response.json()
+    assert (result["to_state_id"], result["changed"], result["errors"]) == (state_b, 3, 2)
+
+    items = {item["vehicle_id"]: item for item in result["items"]}
+    assert [item["vehicle_id"] for item in result["items"]] == [moved, *vehicle_ids, 999999]
+    assert items[moved]["error"] == "La transición al nuevo estado no es válida."
+    assert items[999999]["error"] == "El vehículo no existe."
+    assert all(items[vehicle_id]["status"] == "changed" for vehicle_id in vehicle_ids)
+    assert all(items[vehicle_id]["from_state_id"] == state_a for vehicle_id in vehicle_ids)
+
+    # Un SELECT de vehículos, un UPDATE y un INSERT multi-fila en el historial
+    writes = [
+        statement for statement in sql_statements
+        if statement.lstrip().startswith(("INSERT", "UPDATE")) and "vehicle_state_counters" not in statement
+    ]
+    assert len(writes) == 2, writes
+    assert len([statement for statement in sql_statements if "vehicle_state_counters" in statement]) == 1
+
+    db.expire_all()
+    assert {db.get(models.Vehicle, vehicle_id).status_id for vehicle_id in vehicle_ids} == {state_b}
+    history = db.query(models.StateHistory).filter(models.StateHistory.vehicle_id.in_(vehicle_ids)).all()
+    assert sorted(entry.id for entry in history) == sorted(items[vehicle_id]["history_id"] for vehicle_id in vehicle_ids)
+    assert {entry.comment_id for entry in history} == {workflow["comment_id"]}
+
+
+def test_change_vehicles_state_batch_invalid_comment(client, db, local_auth_headers):
+    """Un comentario que no pertenece al estado destino rechaza todo el lote."""
+    workflow = _seed_workflow(db, vehicles=2)
+    state_a, state_b, _ = workflow["states"]
+    payload = {
+        "vehicle_ids": workflow["vehicle_ids"],
+        "new_state_id": state_b,
+        "comment_id": workflow["other_comment_id"],
+    }
+    response = client.post("/api/vehicles/state/batch", json=payload, headers=local_auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "El comentario proporcionado no es válido para el estado seleccionado."
 
+    db.expire_all()
+    assert {db.get(models.Vehicle, vehicle_id).status_id for vehicle_id in workflow["vehicle_ids"]} == {state_a}
 
 
+def test_state_counters_follow_vehicle_changes(client, db, local_auth_headers):
+    """Los contadores por estado se actualizan con cada cambio y coinciden con un recuento completo."""
+    workflow = _seed_workflow(db, vehicles=3)
+    state_a, state_b, _ = workflow["states"]
+    first, second, third = workflow["vehicle_ids"]
+    # Los vehículos sembrados directamente no pasan por los servicios: se reconcilia
+    drift = asyncio.run(reconcile_vehicle_counters_service(db))
+    assert drift[state_a] == 3
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+    response = client.put(f"/api/vehicles/{first}/state", json={"new_state_id": state_b}, headers=local_auth_headers)
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+    response = client.post(
+        "/api/vehicles/state/batch",
+        json={"vehicle_ids": [second, third], "new_state_id": state_b},
+        headers=local_auth_headers,
+    )
+    assert response.json()["changed"] == 2
+    response = client.delete(f"/api/vehicles/{third}", headers=local_auth_headers)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    counts = asyncio.run(get_state_counts_service(db))
+    assert (counts.get(state_a, 0), counts.get(state_b, 0)) == (0, 2)
+    response = client.get("/api/dashboard/vehicles/count-by-state", headers=local_auth_headers)
+    assert {"state_id": state_b, "count": 2} in response.json()
+    response = client.get("/api/dashboard/vehicles/count", headers=local_auth_headers)
+    assert response.json() == {"count": db.query(models.Vehicle).count()}
+    assert asyncio.run(reconcile_vehicle_counters_service(db)) == {}
+
+
+def test_reconcile_counters_applies_drift_as_deltas(db, sql_statements):
+    """La reconciliación mide la desviación en una sentencia y la suma como incremento, sin bloquear ni borrar filas."""
+    workflow = _seed_workflow(db, vehicles=2)
+    state_a, _, state_c = workflow["states"]
+    asyncio.run(reconcile_vehicle_counters_service(db))
+    counters = models.VehicleStateCounter.__table__
+    db.execute(counters.update().where(counters.c.state_id == state_a).values(count=10))
+    db.execute(counters.insert().values(state_id=state_c, count=4))
+    db.commit()
+
+    sql_statements.clear()
+    assert asyncio.run(reconcile_vehicle_counters_service(db)) == {state_a: -8, state_c: -4}
+    assert not [s for s in sql_statements if s.lstrip().upper().startswith(("DELETE", "LOCK"))], sql_statements
+    counts = asyncio.run(get_state_counts_service(db))
+    assert (counts.get(state_a), counts.get(state_c)) == (2, None)
+
+
+def test_counters_reject_unsupported_dialect():
+    """Los contadores usan INSERT ... ON CONFLICT: otro motor se rechaza al arrancar con un mensaje claro."""
+    check_counters_dialect("postgresql")
+    check_counters_dialect("sqlite")
+    with pytest.raises(UnsupportedDatabaseDialect, match="mysql"):
+        check_counters_dialect("mysql")
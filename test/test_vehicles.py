@@ -3,13 +3,19 @@ import pytest
 import uuid
 from fastapi import status
 import pytest_asyncio
+import models
+import schemas
+import asyncio
+from datetime import datetime, timezone
+from services.vehicle_counters_service import reconcile_vehicle_counters_service
 from constants.exceptions import (
     VEHICLE_MODEL_NOT_FOUND,
     COLOR_NOT_FOUND,
     INITIAL_STATE_NOT_FOUND,
     VIN_ALREADY_EXISTS,
     INVALID_VIN,
-    VEHICLE_NOT_FOUND
+    VEHICLE_NOT_FOUND,
+    INVALID_CURSOR
 )
 
 @pytest.fixture
@@ -1067,5 +1073,271 @@ async def test_delete_vehicle_not_found(httpx_client, headers):
     assert response.json()["detail"] == VEHICLE_NOT_FOUND
 
 
+def _seed_vehicles(db, count, vin_prefix):
+    """
+    Crea `count` vehículos, cada uno con su propia marca, modelo y color, para
+    que una carga perezosa no pueda resolverse desde el identity map.
+    """
+    state = models.State(code=uuid.uuid4().hex[:10], name="Test", description="Test", is_initial=True)
+    vehicle_type = models.VehicleType(type_name=f"Test Vehicle Type {uuid.uuid4().hex}")
+    db.add_all([state, vehicle_type])
+    db.flush()
+    for i in range(count):
+        suffix = uuid.uuid4().hex
+        brand = models.Brand(name=f"Test Brand {suffix}")
+        model = models.Model(name=f"Test Model {suffix}", brand=brand, vehicle_type=vehicle_type)
+        color = models.Color(name=f"C{suffix[:20]}", hex_code=f"#{suffix[:6]}")
+        db.add(models.Vehicle(vin=f"{vin_prefix}{i:04d}", model=model, color=color, status_id=state.id))
+    db.commit()
+    db.expunge_all()
+
+
+@pytest.mark.parametrize("count", [2, 12])
+def test_list_vehicles_query_count_is_constant(client, db, local_auth_headers, sql_statements, count):
+    """El listado carga modelo, marca, color y estado sin N+1: el número de sentencias no depende de N."""
+    vin_prefix = f"QC{uuid.uuid4().hex[:10].upper()}"
+    _seed_vehicles(db, count, vin_prefix)
+
+    sql_statements.clear()
+    response = client.get(f"/api/vehicles?vin={vin_prefix}&limit=100", headers=local_auth_headers)
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+    vehicles = response.json()
+    assert len(vehicles) == count
+    assert all(v["model"]["brand"]["name"] and v["color"]["hex_code"] and v["status"]["code"] for v in vehicles)
+
+    # Usuario + vehículos (con estado) + modelos/marcas + colores
+    assert len(sql_statements) <= 4, sql_statements
+
+
+def test_get_vehicle_detail_single_statement(client, db, local_auth_headers, sql_statements):
+    """El detalle carga todo el grafo de la respuesta en una sola sentencia."""
+    vin_prefix = f"QD{uuid.uuid4().hex[:10].upper()}"
+    _seed_vehicles(db, 1, vin_prefix)
+    vehicle_id = db.query(models.Vehicle.id).filter(models.Vehicle.vin == f"{vin_prefix}0000").scalar()
+
+    sql_statements.clear()
+    response = client.get(f"/api/vehicles/{vehicle_id}", headers=local_auth_headers)
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+    assert response.json()["model"]["brand"]["name"].startswith("Test Brand")
+
+    # Usuario + vehículo
+    assert len(sql_statements) <= 2, sql_statements
+
+
+def test_list_vehicles_cursor_pagination(client, db, local_auth_headers, sql_statements):
+    """La paginación por cursor recorre todos los vehículos una sola vez y cada página cuesta lo mismo."""
+    vin_prefix = f"CP{uuid.uuid4().hex[:10].upper()}"
+    _seed_vehicles(db, 5, vin_prefix)
+
+    seen = []
+    cursor = None
+    statements_per_page = []
+    while True:
+        params = {"vin": vin_prefix, "limit": 2, "pagination": "cursor"}
+        if cursor:
+            params["cursor"] = cursor
+        sql_statements.clear()
+        response = client.get("/api/vehicles", params=params, headers=local_auth_headers)
+        assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+        page = response.json()
+        statements_per_page.append(len(sql_statements))
+        seen.extend(v["vin"] for v in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(statements_per_page) == 3
+    assert len(set(statements_per_page)) == 1
+    assert seen == [f"{vin_prefix}{i:04d}" for i in range(5)]
+
+    # El modo offset sigue disponible y devuelve una lista ordenada
+    response = client.get(f"/api/vehicles?vin={vin_prefix}&skip=2&limit=2", headers=local_auth_headers)
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+    assert [v["vin"] for v in response.json()] == seen[2:4]
+
+
+def test_list_vehicles_invalid_cursor(client, local_auth_headers):
+    """Un cursor manipulado se rechaza con 400."""
+    response = client.get("/api/vehicles?cursor=not-a-cursor", headers=local_auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, f"Respuesta: {response.text}"
+    assert response.json()["detail"] == INVALID_CURSOR
+
+
+def test_list_vehicles_vin_match_modes(client, db, local_auth_headers):
+    """Búsqueda de VIN por igualdad, prefijo, sufijo y subcadena, sin tratar % y _ como comodines."""
+    vin_prefix = f"VM{uuid.uuid4().hex[:11].upper()}"
+    _seed_vehicles(db, 3, vin_prefix)
+    full_vin = f"{vin_prefix}0001"
 
+    def search(vin, vin_match="auto"):
+        response = client.get("/api/vehicles", params={"vin": vin, "vin_match": vin_match, "limit": 100}, headers=local_auth_headers)
+        assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+        return [v["vin"] for v in response.json()]
 
+    assert search(full_vin) == [full_vin]
+    assert search(full_vin.lower(), "exact") == [full_vin]
+    assert search(vin_prefix, "prefix") == [f"{vin_prefix}{i:04d}" for i in range(3)]
+    assert search(full_vin[-8:], "suffix") == [full_vin]
+    assert search(vin_prefix[2:], "contains") == [f"{vin_prefix}{i:04d}" for i in range(3)]
+    assert search(vin_prefix[2:], "prefix") == []
+    assert search(f"{vin_prefix}%", "contains") == []
+    assert search(f"{vin_prefix[:-1]}_", "prefix") == []
+
+
+def test_list_vehicles_compact_view(client, db, local_auth_headers, sql_statements):
+    """view=compact devuelve una fila plana por vehículo, leída en una sola sentencia."""
+    vin_prefix = f"CV{uuid.uuid4().hex[:10].upper()}"
+    _seed_vehicles(db, 3, vin_prefix)
+    full = client.get(f"/api/vehicles?vin={vin_prefix}&limit=100", headers=local_auth_headers).json()
+
+    sql_statements.clear()
+    response = client.get(f"/api/vehicles?vin={vin_prefix}&limit=100&view=compact", headers=local_auth_headers)
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+    assert response.json() == [
+        {
+            "id": v["id"],
+            "vin": v["vin"],
+            "brand_name": v["model"]["brand"]["name"],
+            "model_name": v["model"]["name"],
+            "color_hex": v["color"]["hex_code"],
+            "state_code": v["status"]["code"],
+            "is_urgent": v["is_urgent"],
+        }
+        for v in full
+    ]
+    # Usuario + vehículos
+    assert len(sql_statements) <= 2, sql_statements
+
+    response = client.get(
+        "/api/vehicles", params={"vin": vin_prefix, "limit": 2, "pagination": "cursor", "view": "compact"},
+        headers=local_auth_headers,
+    )
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+    page = response.json()
+    assert [v["vin"] for v in page["items"]] == [v["vin"] for v in full[:2]]
+    assert set(page["items"][0]) == set(schemas.VehicleListItem.model_fields)
+    assert page["next_cursor"]
+
+
+def test_create_vehicles_batch(client, db, local_auth_headers, sql_statements):
+    """El alta masiva valida por conjuntos, inserta en bloque y devuelve el resultado de cada elemento."""
+    vin_prefix = f"QB{uuid.uuid4().hex[:10].upper()}"
+    _seed_vehicles(db, 1, vin_prefix)
+    existing = db.query(models.Vehicle).filter(models.Vehicle.vin == f"{vin_prefix}0000").one()
+    base = {"vehicle_model_id": existing.vehicle_model_id, "color_id": existing.color_id, "is_urgent": False}
+    new_vins = [f"{vin_prefix}N{i:03d}" for i in range(20)]
+    payload = {"vehicles": [
+        *({**base, "vin": vin} for vin in new_vins),
+        {**base, "vin": existing.vin},
+        {**base, "vin": new_vins[0]},
+        {**base, "vin": f"{vin_prefix}BADM", "vehicle_model_id": 999999},
+        {**base, "vin": f"{vin_prefix}BADC", "color_id": 999999},
+        {**base, "vin": " "},
+    ]}
+
+    sql_statements.clear()
+    response = client.post("/api/vehicles/batch", json=payload, headers=local_auth_headers)
+    assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+    result = response.json()
+    assert (result["created"], result["existing"], result["errors"]) == (20, 2, 3)
+
+    items = result["items"]
+    assert [item["index"] for item in items] == list(range(len(payload["vehicles"])))
+    assert all(item["status"] == "created" and item["id"] for item in items[:20])
+    assert items[20] == {"index": 20, "vin": existing.vin, "status": "exists", "id": existing.id, "error": None}
+    assert items[21]["status"] == "exists" and items[21]["id"] == items[0]["id"]
+    assert items[22]["error"] == VEHICLE_MODEL_NOT_FOUND
+    assert items[23]["error"] == COLOR_NOT_FOUND
+    assert items[24]["error"] == INVALID_VIN
+
+    # Vehículos e historial con un INSERT multi-fila cada uno
+    inserts = [
+        statement for statement in sql_statements
+        if statement.lstrip().startswith("INSERT")
+        and "vehicle_state_counters" not in statement
+        and "vehicle_registrations_daily" not in statement
+    ]
+    assert len(inserts) == 2, inserts
+    assert len([statement for statement in sql_statements if "vehicle_state_counters" in statement]) == 1
+    created_ids = [item["id"] for item in items[:20]]
+    assert db.query(models.StateHistory).filter(
+        models.StateHistory.vehicle_id.in_(created_ids),
+        models.StateHistory.from_state_id.is_(None),
+    ).count() == 20
+
+
+@pytest.mark.parametrize("conflicts", [2, 3])
+def test_create_vehicles_batch_retries_concurrent_conflicts(client, db, local_auth_headers, monkeypatch, conflicts):
+    """
+    Si otras altas insertan los mismos VINs durante el lote, se deshace y se repite
+    hasta VEHICLE_BATCH_MAX_ATTEMPTS veces; agotados los intentos se responde 409.
+    """
+    from sqlalchemy import insert
+    from services import vehicles_service
+    from constants.exceptions import VEHICLE_BATCH_CONFLICT
+
+    vin_prefix = f"QX{uuid.uuid4().hex[:10].upper()}"
+    _seed_vehicles(db, 1, vin_prefix)
+    existing = db.query(models.Vehicle).filter(models.Vehicle.vin == f"{vin_prefix}0000").one()
+    create_batch = vehicles_service._create_vehicles_batch
+    calls = []
+
+    async def conflicting_batch(vehicles, session, user_id, initial_state_id):
+        calls.append(len(calls))
+        if len(calls) <= conflicts:
+            # Violación real del índice único de VIN, como la de un alta concurrente
+            session.execute(insert(models.Vehicle).values(vin=existing.vin, status_id=existing.status_id))
+        return await create_batch(vehicles, session, user_id, initial_state_id)
+
+    monkeypatch.setattr(vehicles_service, "_create_vehicles_batch", conflicting_batch)
+    payload = {"vehicles": [{
+        "vehicle_model_id": existing.vehicle_model_id, "color_id": existing.color_id, "is_urgent": False,
+        "vin": f"{vin_prefix}N001",
+    }]}
+    response = client.post("/api/vehicles/batch", json=payload, headers=local_auth_headers)
+
+    if conflicts < vehicles_service.VEHICLE_BATCH_MAX_ATTEMPTS:
+        assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+        assert response.json()["created"] == 1
+    else:
+        assert response.status_code == status.HTTP_409_CONFLICT, f"Respuesta: {response.text}"
+        assert response.json()["detail"] == VEHICLE_BATCH_CONFLICT
+    assert len(calls) == min(conflicts + 1, vehicles_service.VEHICLE_BATCH_MAX_ATTEMPTS)
+    # La transacción fallida se deshizo: la sesión sigue utilizable
+    created = db.query(models.Vehicle).filter(models.Vehicle.vin == f"{vin_prefix}N001").count()
+    assert created == (1 if conflicts < vehicles_service.VEHICLE_BATCH_MAX_ATTEMPTS else 0)
+
+
+def test_registrations_by_date_from_rollup(client, db, local_auth_headers):
+    """Los registros por fecha salen del resumen diario, que siguen las altas y bajas."""
+    vin_prefix = f"QR{uuid.uuid4().hex[:10].upper()}"
+    _seed_vehicles(db, 1, vin_prefix)
+    existing = db.query(models.Vehicle).filter(models.Vehicle.vin == f"{vin_prefix}0000").one()
+    asyncio.run(reconcile_vehicle_counters_service(db))
+    today = datetime.now(timezone.utc).date()
+
+    def registrations(granularity):
+        response = client.get(
+            "/api/dashboard/vehicles/registrations-by-date",
+            params={"granularity": granularity, "date_from": today.isoformat(), "date_to": today.isoformat()},
+            headers=local_auth_headers,
+        )
+        assert response.status_code == status.HTTP_200_OK, f"Respuesta: {response.text}"
+        return response.json()
+
+    before = registrations("day")
+    assert len(before) == 1 and before[0]["day"] == today.day
+    payload = {"vehicles": [
+        {"vehicle_model_id": existing.vehicle_model_id, "color_id": existing.color_id, "is_urgent": False, "vin": f"{vin_prefix}N{i}"}
+        for i in range(3)
+    ]}
+    response = client.post("/api/vehicles/batch", json=payload, headers=local_auth_headers)
+    assert response.json()["created"] == 3
+    response = client.delete(f"/api/vehicles/{response.json()['items'][0]['id']}", headers=local_auth_headers)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    after = registrations("day")
+    assert after[0]["value"] == before[0]["value"] + 2
+    assert registrations("week") == [{"year": today.isocalendar().year, "week": today.isocalendar().week, "value": after[0]["value"]}]
+    assert registrations("month") == [{"year": today.year, "month": today.month, "value": after[0]["value"]}]
+    assert asyncio.run(reconcile_vehicle_counters_service(db)) == {}
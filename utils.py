@@ -1,21 +1,20 @@
 # utils.py
-from passlib.context import CryptContext
+import uuid
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from typing import Optional
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from database import SessionLocal
 import models
+from services.password_service import password_context, verify_password_service
 from dotenv import load_dotenv
 import os
 
 # Cargar el archivo .env
 load_dotenv()
 
-# Configuración para el hashing de contraseñas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Configuración para el hashing de contraseñas (coste en BCRYPT_ROUNDS)
+pwd_context = password_context()
 
 # Configuración para JWT
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -23,8 +22,12 @@ ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+# Autenticación sin estado: el access token incluye id, rol y estado del usuario
+# y get_current_user lo resuelve desde una caché en memoria en lugar de consultar la tabla users.
+AUTH_STATELESS = os.getenv("AUTH_STATELESS", "false").lower() in ("1", "true", "yes", "on")
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+
 
 
 def verify_password(plain_password, hashed_password):
@@ -33,32 +36,40 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
-# Dependencia para obtener la sesión de la base de datos
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# Función para obtener un usuario por nombre
-def get_user(db: Session, username: str):
-    return db.query(models.User).filter(models.User.username == username).first()
+# Función para obtener un usuario por nombre (funciona con Session y AsyncSession)
+async def get_user(db: Session, username: str):
+    from services.database_service import maybe_await
+    result = await maybe_await(db.execute(
+        select(models.User).where(models.User.username == username).limit(1)
+    ))
+    return result.scalars().first()
 
 # Función para autenticar al usuario
-def authenticate_user(db: Session, username: str, password: str):
-    user = get_user(db, username)
+async def authenticate_user(db: Session, username: str, password: str):
+    user = await get_user(db, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # bcrypt es costoso en CPU: se ejecuta en el pool de hashing (ExecutorSaturated si está lleno)
+    valid, new_hash = await verify_password_service(password, user.hashed_password)
+    if not valid:
         return False
+    if new_hash:
+        # Cambió BCRYPT_ROUNDS: se guarda el hash con el coste actual en el commit del login
+        user.hashed_password = new_hash
     return user
 
+# Claims del access token: además del nombre de usuario, se firman id, rol y estado
+def access_token_claims(user) -> dict:
+    role = getattr(user.role, "value", user.role)
+    return {"sub": user.username, "uid": user.id, "role": role, "active": bool(user.is_active)}
+
 # Función para crear un token JWT
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
+    # jti: identifica el token para poder revocarlo antes de que caduque
+    to_encode.setdefault("jti", str(uuid.uuid4()))
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -68,32 +79,3 @@ def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
-
-# Función para obtener el usuario actual con su rol
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """
-    Obtiene el usuario autenticado a partir del token de acceso.
-    """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-
-    user = get_user(db, username=username)
-    if user is None:
-        raise credentials_exception
-
-    # Asegurar que el usuario tiene el atributo 'role'
-    if not hasattr(user, "role"):
-        raise HTTPException(status_code=500, detail="User model does not include role field")
-
-    return user  # Devuelve el usuario completo con su rol
-
@@ -0,0 +1,16 @@
+# workers.py
+import os
+from uvicorn.workers import UvicornWorker as _UvicornWorker
+
+# Implementación del event loop y del parser HTTP de cada worker. Con "auto"
+# uvicorn usa uvloop y httptools si están instalados y, si no, asyncio y h11.
+UVICORN_LOOP = os.getenv("UVICORN_LOOP", "auto")
+UVICORN_HTTP = os.getenv("UVICORN_HTTP", "auto")
+
+
+class UvicornWorker(_UvicornWorker):
+    """
+    Worker de gunicorn usado en gunicorn.conf.py. Gunicorn no permite pasar
+    opciones a uvicorn, así que se fijan aquí.
+    """
+    CONFIG_KWARGS = {"loop": UVICORN_LOOP, "http": UVICORN_HTTP}